@@ -0,0 +1,53 @@
+"""Gunicorn settings (picked up automatically from the working directory).
+
+Each worker loads BGE + CLIP on a background thread right after it forks, so
+the ~10s model load happens at boot instead of on the first /analyze request.
+Loading in the master and sharing via `preload_app` copy-on-write is avoided:
+torch's thread pools don't survive fork reliably, and refcount writes unshare
+most of the weight pages anyway.
+
+/listing/api/v1/health/?ready=1 answers 503 until the worker's models are in.
+
+Once the app is loaded, each worker also re-queues /jobs submissions left
+queued or running by the previous deploy (jobs.resume_pending_jobs); a job is
+claimed atomically, so several workers re-queuing it run it once.
+
+Workers are gthread: each handles GUNICORN_THREADS requests at once, so a
+long NDJSON batch (/analyze/batch/) or SSE stream doesn't block every other
+request on a single sync worker. With threaded workers `timeout` is the
+worker heartbeat, not a per-request limit, so a large batch isn't killed
+mid-stream. The models are shared by the threads of a worker (the embedding
+micro-batcher is thread-safe), so threads cost little memory.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "180"))
+accesslog = "-"
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    if os.getenv("LISTING_PRELOAD_MODELS", "1") == "0":
+        return
+    from oracle_frontend.embeddings import preload_models
+
+    server.log.info(f"[boot] worker {worker.pid}: preloading embedding models in background")
+    preload_models(background=True)
+
+
+def post_worker_init(worker):
+    # After the app (and so Django) is loaded; post_fork runs before that.
+    try:
+        from listing_api.jobs import resume_pending_jobs
+
+        resumed = resume_pending_jobs()
+    except Exception as e:
+        worker.log.warning(f"[boot] worker {worker.pid}: resuming jobs failed: {e}")
+        return
+    if resumed:
+        worker.log.info(f"[boot] worker {worker.pid}: re-queued {resumed} pending jobs")
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import APIKey, AnalysisRequest
+from .models import APIKey, AnalysisJob, AnalysisRequest
 
 
 @admin.register(APIKey)
@@ -8,7 +8,7 @@ class APIKeyAdmin(admin.ModelAdmin):
     list_display = ("organization", "contact_email", "is_active", "rate_limit_per_minute", "rate_limit_per_day", "created_at", "last_used_at")
     list_filter = ("is_active",)
     search_fields = ("organization", "contact_email", "key")
-    readonly_fields = ("key", "created_at", "last_used_at")
+    readonly_fields = ("key", "webhook_secret", "created_at", "last_used_at")
 
 
 @admin.register(AnalysisRequest)
@@ -18,7 +18,20 @@ class AnalysisRequestAdmin(admin.ModelAdmin):
     search_fields = ("api_key__organization", "error_message")
     readonly_fields = (
         "api_key", "source", "image_count", "processing_time_ms", "model_used",
-        "input_tokens", "output_tokens", "embeddings_included", "success",
+        "input_tokens", "cached_input_tokens", "output_tokens", "embeddings_included", "success",
         "error_message", "created_at",
     )
     date_hierarchy = "created_at"
+
+
+@admin.register(AnalysisJob)
+class AnalysisJobAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "api_key", "status", "webhook_attempts", "started_at", "finished_at")
+    list_filter = ("status",)
+    search_fields = ("id", "api_key__organization", "error_message")
+    readonly_fields = (
+        "id", "api_key", "status", "hint", "include_embeddings", "include_copy",
+        "webhook_url", "webhook_attempts", "webhook_delivered_at", "result",
+        "error_code", "error_message", "created_at", "started_at", "finished_at",
+    )
+    date_hierarchy = "created_at"
@@ -27,31 +27,35 @@ Output schema (returned by `analyze_garment`):
   "style_tags":         list[str] (3-5 from STYLE_TAGS_CANONICAL),
   "style_descriptors":  list[str] (3-7 free-text aesthetic descriptors),
   "key_details":        list[str] (notable construction/design features),
-  "model": str, "input_tokens": int, "output_tokens": int
+  "model": str, "input_tokens": int, "cached_input_tokens": int, "output_tokens": int
 }
 
+Each image is sized, cropped and given an image_url `detail` level for its
+role by the image policy (see image_policy.py); `_meta.image_tokens` has the
+estimated image tokens and preprocess time per role.
+
+With `single_pass=True` the same call also writes the listing copy (see
+ANALYZER_INSTRUCTIONS_SINGLE_PASS), returned normalized under `_listing` —
+one vision call per garment instead of a vision call plus a copy call that
+re-sends the metadata.
+
 Failures raise `AnalyzerError` (caller should map to HTTP 422 / 500).
 """
 
 from __future__ import annotations
 
 import base64
-import io
 import json
 import time
 from dataclasses import dataclass
+from typing import Callable, Mapping
 
-from PIL import Image
-
-from oracle_frontend.ai_config import get_openai_client, OPENAI_MODEL
-
-from . import taxonomy
+from oracle_frontend.ai_config import get_openai_client, last_call_metrics, OPENAI_MODEL, usage_counts
 
-try:
-    from pillow_heif import register_heif_opener
-    register_heif_opener()
-except ImportError:
-    pass
+from . import metrics, taxonomy
+from .copy_generator import LISTING_JSON_SHAPE, normalize_listing
+from .image_policy import estimate_tokens, for_role, get_policy, tokens_by_role
+from .preprocess import PreparedImage, prepare_image
 
 
 # ---------------------------------------------------------------------------
@@ -64,32 +68,14 @@ class AnalyzerError(Exception):
 @dataclass
 class ImageInput:
     """One image plus an optional role hint."""
-    bytes_data: bytes
+    bytes_data: bytes | memoryview  # any bytes-like object (see uploads.py)
     role: str = "front"  # one of taxonomy.IMAGE_ROLES
     filename: str = ""
 
 
 # ---------------------------------------------------------------------------
-# Image preprocessing
+# Image preprocessing (decode/resize/encode lives in preprocess.py)
 # ---------------------------------------------------------------------------
-def _prepare_image_for_vision(raw: bytes, max_side: int = 1024, quality: int = 85) -> bytes:
-    """Convert any input (HEIC/PNG/etc) to a reasonably sized JPEG for the vision model."""
-    img = Image.open(io.BytesIO(raw))
-    if img.mode in ("RGBA", "P", "LA"):
-        img = img.convert("RGB")
-    elif img.mode != "RGB":
-        img = img.convert("RGB")
-
-    w, h = img.size
-    if max(w, h) > max_side:
-        scale = max_side / max(w, h)
-        img = img.resize((int(w * scale), int(h * scale)), Image.Resampling.LANCZOS)
-
-    buf = io.BytesIO()
-    img.save(buf, format="JPEG", quality=quality, optimize=True)
-    return buf.getvalue()
-
-
 def _to_data_url(jpg_bytes: bytes) -> str:
     b64 = base64.b64encode(jpg_bytes).decode("ascii")
     return f"data:image/jpeg;base64,{b64}"
@@ -107,18 +93,14 @@ SYSTEM_PROMPT = (
 )
 
 
-def _build_user_prompt(images: list[ImageInput], hint: str | None) -> str:
-    role_lines = []
-    for i, img in enumerate(images, start=1):
-        role_lines.append(f"  Image {i}: role={img.role}")
-    role_block = "\n".join(role_lines) if role_lines else "  (no role hints provided)"
-
-    hint_block = f"\nUSER HINT (optional, may be wrong): {hint}\n" if hint else ""
-
-    return f"""You are analyzing photos of a SINGLE garment for a resale listing.
-
-You will receive {len(images)} image(s). Each image has a role:
-{role_block}
+# Message layout is tuned for provider-side prompt prefix caching: everything
+# that is identical across requests (persona, role guide, taxonomy, output
+# schema) lives in the system message, built once at import; the user message
+# carries only the per-request image count, role lines, hint and the images.
+# Keep per-request values out of ANALYZER_INSTRUCTIONS or the cache misses.
+_PROMPT_ROLE_GUIDE = """
+Each request contains photos of a SINGLE garment for a resale listing. The
+user message lists every image's role.
 
 How to use the roles:
 - "front" / "back": overall silhouette, color, length, drape, neckline
@@ -126,44 +108,13 @@ How to use the roles:
 - "detail": fabric texture, hardware, stitching, prints, embellishments
 - "worn": fit and proportions on a body
 - "damage": condition flaws (use to downgrade condition grade)
-{hint_block}
+"""
+
+_PROMPT_BODY = """
 You MUST return ONLY valid JSON matching this exact schema. Use the controlled
 vocabularies — do NOT invent new values for enum fields.
 
-# CONTROLLED VOCABULARIES
-
-category (pick exactly one):
-  {taxonomy.enum_for_prompt(taxonomy.CATEGORIES)}
-
-subcategory (pick exactly one, scoped to your chosen category):
-{taxonomy.subcategories_for_prompt()}
-
-silhouette (pick 1-4 that best apply):
-  {taxonomy.enum_for_prompt(taxonomy.SILHOUETTES)}
-
-primary_color (pick exactly one):
-  {taxonomy.enum_for_prompt(taxonomy.COLORS_PRIMARY)}
-
-secondary_colors (pick 0-3, from the same primary_color list, excluding the primary)
-
-color_palette (pick exactly one):
-  {taxonomy.enum_for_prompt(taxonomy.COLOR_PALETTES)}
-
-pattern (pick exactly one):
-  {taxonomy.enum_for_prompt(taxonomy.PATTERNS)}
-
-primary_material (pick exactly one — your best inference of the dominant fabric):
-  {taxonomy.enum_for_prompt(taxonomy.MATERIAL_PRIMARY)}
-
-condition (pick exactly one grade key):
-{taxonomy.condition_grades_for_prompt()}
-
-era_estimate (pick exactly one or null):
-  {taxonomy.enum_for_prompt(taxonomy.ERA_ESTIMATES)}
-
-style_tags (pick 3-5 that best apply, from this canonical list ONLY):
-  {taxonomy.enum_for_prompt(taxonomy.STYLE_TAGS_CANONICAL)}
-
+""" + taxonomy.COMPILED.prompt_vocabulary + """
 # FREE-TEXT FIELDS (do not guess wildly — keep concise and visually grounded)
 
 material_raw: short free-text fabric description IF you can see/read it
@@ -184,7 +135,7 @@ key_details: 3-6 short notable design/construction observations
 
 # REQUIRED JSON SHAPE — return EXACTLY this structure, no extra keys:
 
-{{
+{
   "category": "<one of CATEGORIES>",
   "subcategory": "<one of SUBCATEGORIES[category]>",
   "silhouette": ["<...>", "<...>"],
@@ -204,29 +155,67 @@ key_details: 3-6 short notable design/construction observations
   "style_tags": ["<...>", "<...>", "<...>"],
   "style_descriptors": ["<...>", "<...>", "<...>"],
   "key_details": ["<...>", "<...>", "<...>"]
-}}
+}
 
 Return ONLY the JSON object — no prose, no markdown, no commentary.
 """
 
+ANALYZER_INSTRUCTIONS = SYSTEM_PROMPT + "\n" + _PROMPT_ROLE_GUIDE + _PROMPT_BODY
+
+# Single-pass variant: the metadata schema plus a trailing "listing" object
+# in the copy generator's shape. Also static, so it gets its own cached prefix.
+_PROMPT_LISTING_GUIDE = """
+# LISTING COPY
+Also write resale listing copy for the garment, in the "listing" key. House
+style: confident, understated, factual, search-optimized; no fluff, no
+exclamation marks, no emojis. Use ONLY facts you record in the metadata
+fields of the same response — never invent details that aren't there.
+"""
+
+_LAST_SCHEMA_LINE = '  "key_details": ["<...>", "<...>", "<...>"]\n}'
+_LISTING_SCHEMA_LINE = (
+    '  "key_details": ["<...>", "<...>", "<...>"],\n'
+    '  "listing": ' + LISTING_JSON_SHAPE.replace("\n", "\n  ") + "\n}"
+)
+# Not an assert: under `python -O` that check would vanish and the
+# single-pass prompt would silently lose its "listing" key.
+if _LAST_SCHEMA_LINE not in _PROMPT_BODY:
+    raise RuntimeError("analyzer prompt schema changed; update _LAST_SCHEMA_LINE for single-pass mode")
+
+ANALYZER_INSTRUCTIONS_SINGLE_PASS = (
+    SYSTEM_PROMPT + "\n" + _PROMPT_ROLE_GUIDE + _PROMPT_LISTING_GUIDE
+    + _PROMPT_BODY.replace(_LAST_SCHEMA_LINE, _LISTING_SCHEMA_LINE)
+)
+
+
+def _build_user_prompt(images: list[ImageInput], hint: str | None) -> str:
+    """The per-request part of the prompt (goes after ANALYZER_INSTRUCTIONS)."""
+    role_lines = []
+    for i, img in enumerate(images, start=1):
+        role_lines.append(f"  Image {i}: role={img.role}")
+    role_block = "\n".join(role_lines) if role_lines else "  (no role hints provided)"
+
+    hint_block = f"\nUSER HINT (optional, may be wrong): {hint}\n" if hint else ""
+
+    return (
+        f"You will receive {len(images)} image(s) of a SINGLE garment. Each image has a role:\n"
+        f"{role_block}\n"
+        + hint_block
+        + "\nReturn the JSON object described in the instructions."
+    )
+
 
 # ---------------------------------------------------------------------------
 # Response normalization
 # ---------------------------------------------------------------------------
-def _coerce_to_enum(value: str | None, allowed: list[str], fallback: str = "") -> str:
+def _coerce_to_enum(value: str | None, allowed: Mapping[str, str], fallback: str = "") -> str:
+    """Map `value` to its canonical spelling via a compiled {lower: canonical} table."""
     if not value:
         return fallback
-    v = value.strip()
-    if v in allowed:
-        return v
-    v_lower = v.lower()
-    for a in allowed:
-        if a.lower() == v_lower:
-            return a
-    return fallback
+    return allowed.get(value.strip().lower(), fallback)
 
 
-def _coerce_list_to_enum(values, allowed: list[str], min_len: int = 0, max_len: int = 99) -> list[str]:
+def _coerce_list_to_enum(values, allowed: Mapping[str, str], min_len: int = 0, max_len: int = 99) -> list[str]:
     if not isinstance(values, list):
         return []
     out: list[str] = []
@@ -271,55 +260,55 @@ def _parse_json_response(raw: str) -> dict:
 
 def _normalize(parsed: dict) -> dict:
     """Coerce a raw model response into the validated output schema."""
-    category = _coerce_to_enum(parsed.get("category"), taxonomy.CATEGORIES, fallback="Other")
-    sub_options = taxonomy.SUBCATEGORIES.get(category, ["Other"])
-    subcategory = _coerce_to_enum(parsed.get("subcategory"), sub_options, fallback=sub_options[0])
+    enums = taxonomy.COMPILED.enums
+    category = _coerce_to_enum(parsed.get("category"), enums["category"], fallback="Other")
+    sub_options = taxonomy.COMPILED.subcategories.get(category) or taxonomy.COMPILED.subcategories["Other"]
+    subcategory = _coerce_to_enum(parsed.get("subcategory"), sub_options, fallback=next(iter(sub_options.values())))
 
     silhouette = _coerce_list_to_enum(
-        parsed.get("silhouette"), taxonomy.SILHOUETTES, max_len=4
+        parsed.get("silhouette"), enums["silhouette"], max_len=4
     )
 
-    primary_color = _coerce_to_enum(parsed.get("primary_color"), taxonomy.COLORS_PRIMARY, fallback="multi")
+    primary_color = _coerce_to_enum(parsed.get("primary_color"), enums["color"], fallback="multi")
     secondary_colors = _coerce_list_to_enum(
-        parsed.get("secondary_colors"), taxonomy.COLORS_PRIMARY, max_len=3
+        parsed.get("secondary_colors"), enums["color"], max_len=3
     )
     secondary_colors = [c for c in secondary_colors if c != primary_color]
 
-    color_palette = _coerce_to_enum(parsed.get("color_palette"), taxonomy.COLOR_PALETTES, fallback="neutral")
-    pattern = _coerce_to_enum(parsed.get("pattern"), taxonomy.PATTERNS, fallback="solid")
+    color_palette = _coerce_to_enum(parsed.get("color_palette"), enums["color_palette"], fallback="neutral")
+    pattern = _coerce_to_enum(parsed.get("pattern"), enums["pattern"], fallback="solid")
 
     material_raw = (parsed.get("material_raw") or "").strip()
     primary_material_input = (parsed.get("primary_material") or "").strip().lower()
-    if primary_material_input in taxonomy.MATERIAL_PRIMARY:
+    if primary_material_input in taxonomy.COMPILED.material_primary:
         primary_material = primary_material_input
     else:
         primary_material, _ = taxonomy.normalize_material(material_raw or primary_material_input)
 
     material_confidence = _coerce_to_enum(
-        parsed.get("material_confidence"), ["high", "medium", "low"], fallback="low"
+        parsed.get("material_confidence"), enums["confidence"], fallback="low"
     )
 
     brand_raw = (parsed.get("brand") or "").strip()
     brand_canonical, brand_known = taxonomy.normalize_brand(brand_raw)
     brand_confidence = _coerce_to_enum(
-        parsed.get("brand_confidence"), ["high", "medium", "low"], fallback="low"
+        parsed.get("brand_confidence"), enums["confidence"], fallback="low"
     )
 
     size_label_val = parsed.get("size_label")
     size_label = size_label_val.strip() if isinstance(size_label_val, str) and size_label_val.strip() else None
 
-    condition_keys = [k for k, _ in taxonomy.CONDITION_GRADES]
-    condition = _coerce_to_enum(parsed.get("condition"), condition_keys, fallback="good")
+    condition = _coerce_to_enum(parsed.get("condition"), enums["condition"], fallback="good")
     condition_notes = (parsed.get("condition_notes") or "").strip()
 
     era_val = parsed.get("era_estimate")
     if isinstance(era_val, str) and era_val.strip():
-        era_estimate = _coerce_to_enum(era_val, taxonomy.ERA_ESTIMATES, fallback="") or None
+        era_estimate = _coerce_to_enum(era_val, enums["era_estimate"], fallback="") or None
     else:
         era_estimate = None
 
     style_tags = _coerce_list_to_enum(
-        parsed.get("style_tags"), taxonomy.STYLE_TAGS_CANONICAL, max_len=5
+        parsed.get("style_tags"), enums["style_tag"], max_len=5
     )
 
     style_descriptors = _clean_string_list(parsed.get("style_descriptors"), max_len=7)
@@ -352,10 +341,63 @@ def _normalize(parsed: dict) -> dict:
 # ---------------------------------------------------------------------------
 # Public entry point
 # ---------------------------------------------------------------------------
+def validate_images(images: list[ImageInput]) -> None:
+    """Check image count and roles; raises AnalyzerError with a client-facing message."""
+    if not images:
+        raise AnalyzerError("at least one image is required")
+    if len(images) > 6:
+        raise AnalyzerError("maximum 6 images per request")
+
+    for img in images:
+        if img.role and img.role not in taxonomy.COMPILED.image_roles:
+            raise AnalyzerError(
+                f"invalid role '{img.role}' (allowed: {taxonomy.IMAGE_ROLES})"
+            )
+
+
+def prepare_image_at(
+    images: list[ImageInput],
+    index: int,
+    with_clip: bool = False,
+    with_hash: bool = False,
+    policy: str | None = None,
+) -> PreparedImage:
+    """Decode images[index] once (see preprocess.py), sized and cropped for
+    its role under image policy `policy`; AnalyzerError if it can't be read."""
+    img = images[index]
+    role_policy = for_role(policy, img.role)
+    try:
+        with metrics.trace("preprocess"):
+            prepared = prepare_image(
+                img.bytes_data,
+                role=img.role,
+                max_side=role_policy.max_side,
+                with_clip=with_clip,
+                with_hash=with_hash,
+                crop_label=role_policy.crop_label,
+            )
+    except Exception as e:
+        raise AnalyzerError(f"could not decode image '{img.filename}': {e}") from e
+    prepared.detail = role_policy.detail
+    prepared.tokens = estimate_tokens(prepared.vision_size, role_policy.detail)
+    for step in ("decode", "resize", "encode"):
+        metrics.observe(f"image_{step}", prepared.timings.get(f"{step}_ms", 0) / 1000)
+    return prepared
+
+
+def prepare_images(images: list[ImageInput], policy: str | None = None) -> list[PreparedImage]:
+    """Decode every image once, in order."""
+    return [prepare_image_at(images, i, policy=policy) for i in range(len(images))]
+
+
 def analyze_garment(
     images: list[ImageInput],
     hint: str | None = None,
     model: str | None = None,
+    prepared: list[PreparedImage] | None = None,
+    on_field: Callable[[str, object], None] | None = None,
+    single_pass: bool = False,
+    image_policy: str | None = None,
 ) -> dict:
     """Run vision analysis on 1-6 images of a single garment.
 
@@ -363,62 +405,141 @@ def analyze_garment(
         images: list of ImageInput, ordered by relevance (front first).
         hint: optional free-text user hint about the item.
         model: override OPENAI_MODEL.
+        prepared: the images already run through `prepare_images` (the
+            pipeline does this so CLIP can share the decode), under
+            `image_policy`.
+        on_field: if given, the model response is streamed and this is
+            called with (field, normalized value) as each output field is
+            complete. The return value is unchanged.
+        single_pass: also ask for the listing copy in the same response. It
+            is returned under `_listing` ({"title", "description", "tags",
+            "source": "llm"}), or None if the model left any of it out.
+        image_policy: per-role size, detail and label cropping (see
+            image_policy.py); default LISTING_IMAGE_POLICY.
 
     Returns the normalized output schema (see module docstring) plus
     `_meta` with model/timing/token info.
     """
-    if not images:
-        raise AnalyzerError("at least one image is required")
-    if len(images) > 6:
-        raise AnalyzerError("maximum 6 images per request")
-
-    for img in images:
-        if img.role and img.role not in taxonomy.IMAGE_ROLES:
-            raise AnalyzerError(
-                f"invalid role '{img.role}' (allowed: {taxonomy.IMAGE_ROLES})"
-            )
-
-    prepared: list[bytes] = []
-    for img in images:
-        try:
-            prepared.append(_prepare_image_for_vision(img.bytes_data))
-        except Exception as e:
-            raise AnalyzerError(f"could not decode image '{img.filename}': {e}") from e
+    validate_images(images)
+    policy_name, _ = get_policy(image_policy)
+    if prepared is None:
+        prepared = prepare_images(images, policy=policy_name)
 
     chosen_model = model or OPENAI_MODEL
     user_text = _build_user_prompt(images, hint)
+    instructions = ANALYZER_INSTRUCTIONS_SINGLE_PASS if single_pass else ANALYZER_INSTRUCTIONS
 
     user_content: list[dict] = [{"type": "text", "text": user_text}]
-    for jpg in prepared:
-        user_content.append(
-            {"type": "image_url", "image_url": {"url": _to_data_url(jpg)}}
-        )
+    for p in prepared:
+        image_url = {"url": _to_data_url(p.vision_jpeg)}
+        if p.detail != "auto":
+            image_url["detail"] = p.detail
+        user_content.append({"type": "image_url", "image_url": image_url})
+
+    request = {
+        "model": chosen_model,
+        "messages": [
+            {"role": "system", "content": instructions},
+            {"role": "user", "content": user_content},
+        ],
+        "response_format": {"type": "json_object"},
+        "temperature": 0.2,
+    }
 
     started = time.time()
+    first_field_ms = None
     try:
-        resp = get_openai_client().chat.completions.create(
-            model=chosen_model,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_content},
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.2,
-        )
+        with metrics.trace("analyzer_call", model=chosen_model):
+            if on_field is None:
+                resp = get_openai_client().chat.completions.create(**request)
+                raw_text = resp.choices[0].message.content or ""
+            else:
+                raw_text, resp, first_field_ms = _stream_completion(request, on_field, started)
     except Exception as e:
         raise AnalyzerError(f"vision model call failed: {e}") from e
+    call_metrics = last_call_metrics()
+    metrics.observe_client_call("analyzer", call_metrics, model=chosen_model)
 
-    raw_text = resp.choices[0].message.content or ""
     parsed = _parse_json_response(raw_text)
-    normalized = _normalize(parsed)
+    with metrics.trace("normalize"):
+        normalized = _normalize(parsed)
+        if single_pass:
+            listing = normalize_listing(parsed.get("listing"))
+            normalized["_listing"] = {**listing, "source": "llm"} if listing else None
 
     elapsed_ms = int((time.time() - started) * 1000)
-    usage = getattr(resp, "usage", None)
     normalized["_meta"] = {
         "model": chosen_model,
         "elapsed_ms": elapsed_ms,
-        "input_tokens": getattr(usage, "prompt_tokens", 0) if usage else 0,
-        "output_tokens": getattr(usage, "completion_tokens", 0) if usage else 0,
+        **usage_counts(resp),
+        # queue_ms / model_ms / retry_wait_ms / retries from the shared client
+        **call_metrics,
         "image_count": len(images),
+        "taxonomy_version": taxonomy.TAXONOMY_VERSION,
+        "preprocess": [p.meta() for p in prepared],
+        "image_policy": policy_name,
+        # Estimated image tokens and preprocess time per role.
+        "image_tokens": tokens_by_role(prepared),
+        "single_pass": single_pass,
     }
+    if on_field is not None:
+        normalized["_meta"]["streamed"] = True
+        normalized["_meta"]["first_field_ms"] = first_field_ms
     return normalized
+
+
+# ---------------------------------------------------------------------------
+# Streaming
+# ---------------------------------------------------------------------------
+
+# Output fields decided by each raw model key; anything not listed maps to
+# itself.
+_STREAM_FIELDS: dict[str, tuple[str, ...]] = {
+    "brand": ("brand", "brand_known"),
+}
+
+
+def _stream_completion(request: dict, on_field, started: float):
+    """Stream a chat completion, reporting output fields as they complete.
+
+    Each finished top-level member is normalized against everything received
+    so far, so a field that depends on an earlier one (subcategory on
+    category, secondary_colors on primary_color) gets the same value it will
+    have in the final result as long as the model keeps the prompt's order.
+    Returns (raw_text, final_chunk, first_field_ms); the final chunk carries
+    `usage`.
+    """
+    from .streaming import IncrementalJSONParser
+
+    stream = get_openai_client().chat.completions.create(
+        **request, stream=True, stream_options={"include_usage": True}
+    )
+    parser = IncrementalJSONParser()
+    parts: list[str] = []
+    last_chunk = None
+    first_field_ms = None
+    emitted: set[str] = set()
+    for chunk in stream:
+        last_chunk = chunk
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+        parts.append(delta)
+        completed = parser.feed(delta)
+        if not completed:
+            continue
+        normalized = _normalize(parser.members)
+        for key, _ in completed:
+            for field in _STREAM_FIELDS.get(key, (key,)):
+                if field not in normalized or field in emitted:
+                    continue
+                emitted.add(field)
+                if first_field_ms is None:
+                    first_field_ms = int((time.time() - started) * 1000)
+                try:
+                    on_field(field, normalized[field])
+                except Exception as e:
+                    print(f"[analyzer] on_field callback failed for {field}: {e}")
+    return "".join(parts), last_chunk, first_field_ms
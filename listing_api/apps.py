@@ -1,3 +1,5 @@
+import os
+
 from django.apps import AppConfig
 
 
@@ -5,3 +7,15 @@ class ListingApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "listing_api"
     verbose_name = "Listing Intelligence API"
+
+    def ready(self):
+        # Connects the APIKey cache-invalidation receivers.
+        from . import auth  # noqa: F401
+
+        # Servers without a post_fork hook (runserver, uvicorn/ASGI) opt in to
+        # a background model preload here. Off by default so management
+        # commands don't load ~1GB of weights. Under gunicorn, gunicorn.conf.py
+        # handles it per worker.
+        if os.getenv("LISTING_PRELOAD_MODELS_ON_READY", "0") == "1":
+            from oracle_frontend.embeddings import preload_models
+            preload_models(background=True)
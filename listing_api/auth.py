@@ -11,15 +11,135 @@ Usage from a view:
 
 Clients send the key in the `Authorization: Bearer <key>` header, or as
 `X-API-Key: <key>`.
+
+Lookups are served from the cache in `settings.LISTING_API_KEY_CACHE` for up
+to TTL seconds (unknown keys for a few seconds), so the hot path makes no
+database round-trip. Saving or deleting an APIKey (admin revocation included)
+drops its entry via the signal receivers below. That only reaches the cache
+of the process that saved the key: with the default per-process cache, other
+workers keep serving a revoked key for up to TTL seconds, as the API docs
+say. A shared alias (LISTING_API_KEY_CACHE_ALIAS) makes revocation immediate.
+
+`last_used_at` is not written per request. Touches are collected in memory
+and flushed by a background thread every TOUCH_INTERVAL seconds, one UPDATE
+per key that was used.
 """
 
 from __future__ import annotations
 
+import atexit
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
 from rest_framework import authentication, exceptions
 
 from .models import APIKey
 
+# Unknown keys are remembered briefly so a client retrying a bad key doesn't
+# reach the DB every time, but a key created moments later still works.
+NEGATIVE_TTL = 5
+_MISSING = "missing"
+
+
+def _conf() -> dict:
+    return getattr(settings, "LISTING_API_KEY_CACHE", {}) or {}
+
+
+def _cache():
+    return caches[_conf().get("ALIAS", "default")]
+
+
+def _cache_key(key: str) -> str:
+    # Hash so raw keys never appear in cache keys (shared backends, logs).
+    return "listing_apikey:" + hashlib.sha256(key.encode()).hexdigest()[:40]
+
+
+def get_api_key(key: str) -> APIKey | None:
+    """The APIKey for `key` (active or not), or None; cached."""
+    cache = _cache()
+    ck = _cache_key(key)
+    cached = cache.get(ck)
+    if cached == _MISSING:
+        return None
+    if cached is not None:
+        return cached
+    try:
+        api_key = APIKey.objects.get(key=key)
+    except APIKey.DoesNotExist:
+        cache.set(ck, _MISSING, NEGATIVE_TTL)
+        return None
+    cache.set(ck, api_key, int(_conf().get("TTL", 60)))
+    return api_key
+
+
+@receiver(post_save, sender=APIKey)
+@receiver(post_delete, sender=APIKey)
+def _invalidate_cached_key(sender, instance, **kwargs):
+    _cache().delete(_cache_key(instance.key))
+
+
+# ---------------------------------------------------------------------------
+# Coalesced last_used_at
+# ---------------------------------------------------------------------------
+_touch_lock = threading.Lock()
+_pending_touches: dict = {}  # APIKey pk -> latest use
+_flusher: threading.Thread | None = None
+
+
+def touch(api_key: APIKey) -> None:
+    """Record a use of `api_key`; written by the next flush."""
+    global _flusher
+    with _touch_lock:
+        _pending_touches[api_key.pk] = timezone.now()
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="listing-apikey-touch", daemon=True)
+            _flusher.start()
+
+
+def flush_last_used() -> int:
+    """Write pending last_used_at values; returns how many keys were updated."""
+    with _touch_lock:
+        pending = dict(_pending_touches)
+        _pending_touches.clear()
+    written = 0
+    for pk, used_at in pending.items():
+        try:
+            APIKey.objects.filter(pk=pk).update(last_used_at=used_at)
+            written += 1
+        except Exception as e:
+            print(f"[listing_api.auth] last_used_at flush failed for key {pk}: {e}")
+            with _touch_lock:
+                # Keep it for the next flush unless a newer use replaced it.
+                _pending_touches.setdefault(pk, used_at)
+    return written
+
+
+def _flush_loop() -> None:
+    interval = max(1, int(_conf().get("TOUCH_INTERVAL", 60)))
+    while True:
+        time.sleep(interval)
+        close_old_connections()
+        try:
+            flush_last_used()
+        finally:
+            close_old_connections()
+
+
+@atexit.register
+def _flush_at_exit() -> None:
+    if _pending_touches:
+        try:
+            flush_last_used()
+        except Exception as e:
+            print(f"[listing_api.auth] last_used_at flush at exit failed: {e}")
+
 
 class APIKeyUser:
     """A minimal user-like object representing an authenticated API client."""
@@ -45,17 +165,14 @@ class APIKeyAuthentication(authentication.BaseAuthentication):
         if not key:
             return None  # let other auth classes try; view will 401 if none succeed
 
-        try:
-            api_key_obj = APIKey.objects.get(key=key)
-        except APIKey.DoesNotExist:
+        api_key_obj = get_api_key(key)
+        if api_key_obj is None:
             raise exceptions.AuthenticationFailed("Invalid API key.")
 
         if not api_key_obj.is_active:
             raise exceptions.AuthenticationFailed("This API key has been revoked.")
 
-        # Touch last_used_at — cheap update, fine to do every request.
-        APIKey.objects.filter(pk=api_key_obj.pk).update(last_used_at=timezone.now())
-
+        touch(api_key_obj)
         return (APIKeyUser(api_key_obj), api_key_obj)
 
     def authenticate_header(self, request):
@@ -0,0 +1,274 @@
+"""Batch analysis: many garments per HTTP request, streamed back as NDJSON.
+
+The manifest (a JSON form field) lists garments; each references 1-6 uploaded
+files by multipart field name:
+
+  {
+    "include_copy": true,
+    "include_embeddings": true,
+    "items": [
+      {"ref": "sku-001", "images": ["sku-001-front", "sku-001-label"],
+       "roles": ["front", "label"], "hint": "Saint Laurent coat"},
+      ...
+    ]
+  }
+
+Garments fan out over a bounded pool of `run_pipeline` workers (embeddings
+disabled per garment); each worker waits for a per-minute rate-limit slot
+before starting a garment (throttling.pace). As garments finish they are buffered and embedded
+together — one batched BGE call and one batched CLIP call per flush — then
+written out one JSON line each, followed by a final summary line.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+
+from django.db import close_old_connections
+
+from oracle_frontend.embeddings import BGE_MODEL_NAME, CLIP_MODEL_NAME, embed_images, embed_texts
+
+from . import metrics
+from .analyzer import AnalyzerError, ImageInput
+from .pipeline import build_text_embedding_input, embeddings_block, front_image
+from .responses import analysis_body
+from .result_cache import run_pipeline_cached
+from .taxonomy import IMAGE_ROLES
+from .throttling import pace
+from .uploads import read_image
+from .usage import build_usage_row, log_requests
+from .vector_index import index_result
+
+# Garments per manifest; bigger consignments are split into several batches
+# (see views.analyze_batch for why). Each one is also charged against the
+# key's daily limit (throttling.charge), so this only bounds a single
+# request's size. Raising it past 500 needs DATA_UPLOAD_MAX_NUMBER_FILES
+# raised to 6x the new value.
+MAX_BATCH_ITEMS = int(os.getenv("LISTING_MAX_BATCH_ITEMS", "500"))
+MAX_IMAGES_PER_ITEM = 6
+BATCH_WORKERS = int(os.getenv("LISTING_BATCH_WORKERS", "4"))
+# Finished garments are embedded in groups of this size, trading a little
+# latency on the stream for far fewer model calls.
+EMBED_FLUSH_SIZE = 16
+
+
+@dataclass
+class BatchItem:
+    index: int
+    ref: str
+    files: list = field(default_factory=list)  # UploadedFile
+    roles: list[str] = field(default_factory=list)
+    hint: str | None = None
+
+
+def parse_manifest(raw: str, files_by_field, max_image_bytes: int) -> tuple[list[BatchItem], bool, bool]:
+    """Validate the manifest against the uploaded files.
+
+    Returns (items, include_copy, include_embeddings). Raises AnalyzerError
+    with a client-facing message on any problem, before any work starts.
+    """
+    try:
+        manifest = json.loads(raw or "")
+    except json.JSONDecodeError as e:
+        raise AnalyzerError(f"manifest is not valid JSON: {e}") from e
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("items"), list):
+        raise AnalyzerError("manifest must be an object with an 'items' list")
+
+    raw_items = manifest["items"]
+    if not raw_items:
+        raise AnalyzerError("manifest.items is empty")
+    if len(raw_items) > MAX_BATCH_ITEMS:
+        raise AnalyzerError(f"maximum {MAX_BATCH_ITEMS} items per batch")
+
+    items: list[BatchItem] = []
+    for i, entry in enumerate(raw_items):
+        if not isinstance(entry, dict):
+            raise AnalyzerError(f"items[{i}] must be an object")
+        ref = str(entry.get("ref") or i)
+        names = entry.get("images")
+        if not isinstance(names, list) or not names:
+            raise AnalyzerError(f"items[{i}] ({ref}): 'images' must list 1-{MAX_IMAGES_PER_ITEM} file fields")
+        if len(names) > MAX_IMAGES_PER_ITEM:
+            raise AnalyzerError(f"items[{i}] ({ref}): maximum {MAX_IMAGES_PER_ITEM} images per item")
+
+        roles = entry.get("roles") or []
+        if not isinstance(roles, list):
+            raise AnalyzerError(f"items[{i}] ({ref}): 'roles' must be a list")
+        roles = [str(r).strip() for r in roles]
+        while len(roles) < len(names):
+            roles.append("front" if not roles else "detail")
+
+        item_files = []
+        for name in names:
+            f = files_by_field.get(str(name))
+            if f is None:
+                raise AnalyzerError(f"items[{i}] ({ref}): no uploaded file in field '{name}'")
+            if f.size > max_image_bytes:
+                raise AnalyzerError(
+                    f"items[{i}] ({ref}): image '{f.name}' exceeds {max_image_bytes // (1024 * 1024)}MB limit"
+                )
+            item_files.append(f)
+        for r in roles[: len(names)]:
+            if r not in IMAGE_ROLES:
+                raise AnalyzerError(f"items[{i}] ({ref}): invalid role '{r}' (allowed: {IMAGE_ROLES})")
+
+        hint = (entry.get("hint") or "").strip() or None
+        items.append(BatchItem(index=i, ref=ref, files=item_files, roles=roles[: len(names)], hint=hint))
+
+    include_copy = _manifest_flag(manifest, "include_copy")
+    include_embeddings = _manifest_flag(manifest, "include_embeddings")
+    return items, include_copy, include_embeddings
+
+
+def _manifest_flag(manifest: dict, name: str, default: bool = True) -> bool:
+    # JSON has real booleans; "false" (a string) would otherwise read as true.
+    value = manifest.get(name, default)
+    if not isinstance(value, bool):
+        raise AnalyzerError(f"manifest.{name} must be true or false")
+    return value
+
+
+def _run_item(item: BatchItem, include_copy: bool, api_key=None) -> dict:
+    """Run one garment through the pipeline (no embeddings). Never raises."""
+    if api_key is not None and item.index > 0:
+        # The first garment was counted by the view's throttle.
+        pace(SimpleNamespace(auth=api_key))
+    close_old_connections()
+    images: list[ImageInput] = []
+    try:
+        for f, role in zip(item.files, item.roles):
+            images.append(ImageInput(bytes_data=read_image(f), role=role, filename=f.name))
+        with metrics.bind(api_key):
+            result = run_pipeline_cached(
+                images,
+                hint=item.hint,
+                include_embeddings=False,
+                include_copy=include_copy,
+            )
+        return {"item": item, "images": images, "result": result, "error": None}
+    except AnalyzerError as e:
+        return {"item": item, "images": images, "result": None,
+                "error": {"code": "analysis_failed", "message": str(e)}}
+    except Exception as e:
+        print(f"[listing_api.batch] item {item.ref} failed: {e}")
+        return {"item": item, "images": images, "result": None,
+                "error": {"code": "internal_error", "message": "internal error"}}
+    finally:
+        close_old_connections()
+
+
+def _embed_finished(done: list[dict], api_key=None) -> None:
+    """Attach embeddings to finished garments with one BGE + one CLIP call.
+
+    Never raises: if the models fail (load error, OOM), the garments go out
+    with their metadata, no embeddings and an `embedding_error`, since their
+    analyses have already run and been billed.
+    """
+    try:
+        with metrics.bind(api_key):
+            _embed_batch(done)
+    except Exception as e:
+        print(f"[listing_api.batch] embedding {len(done)} items failed: {e}")
+        for d in done:
+            d["result"]["embeddings"] = None
+            d["result"].setdefault("_meta", {})["embeddings_included"] = False
+            d["embedding_error"] = {"code": "embedding_failed", "message": "embeddings could not be computed"}
+
+
+def _embed_batch(done: list[dict]) -> None:
+    started = time.time()
+    texts = [
+        build_text_embedding_input(d["result"]["metadata"], d["result"].get("listing") or {})
+        for d in done
+    ]
+    # embed_texts drops empty strings, so only send (and map back) non-empty ones.
+    text_positions = [i for i, t in enumerate(texts) if t]
+    text_vecs: list[list[float]] = [[] for _ in done]
+    with metrics.trace("batch_embed_text", model=BGE_MODEL_NAME):
+        batch_vecs = embed_texts([texts[i] for i in text_positions])
+    if len(batch_vecs) == len(text_positions):
+        for i, vec in zip(text_positions, batch_vecs):
+            text_vecs[i] = vec
+
+    fronts = [front_image(d["images"]) for d in done]
+    with metrics.trace("batch_embed_image", model=CLIP_MODEL_NAME):
+        image_vecs = embed_images([f.bytes_data if f else b"" for f in fronts])
+
+    elapsed_ms = int((time.time() - started) * 1000)
+    for d, text, text_vec, image_vec, front in zip(done, texts, text_vecs, image_vecs, fronts):
+        d["result"]["embeddings"] = embeddings_block(text, text_vec, image_vec, front.role if front else None)
+        meta = d["result"].setdefault("_meta", {})
+        meta["embeddings_included"] = True
+        meta["batch_embedding_ms"] = elapsed_ms
+
+
+def _line(d: dict) -> str:
+    item: BatchItem = d["item"]
+    if d["error"]:
+        body = {"index": item.index, "ref": item.ref, "status": "failed", "error": d["error"]}
+    else:
+        body = {"index": item.index, "ref": item.ref, "status": "succeeded"}
+        body.update(analysis_body(d["result"], image_count=len(d["images"]), analysis_id=d.get("analysis_id")))
+        if d.get("embedding_error"):
+            body["embedding_error"] = d["embedding_error"]
+    return json.dumps(body) + "\n"
+
+
+def stream_batch(api_key, items: list[BatchItem], include_copy: bool, include_embeddings: bool):
+    """Generator of NDJSON lines: one per garment as it finishes, then a summary."""
+    started = time.time()
+    usage_rows = []
+    pending: list[dict] = []
+    n_ok = n_failed = 0
+
+    def _flush():
+        nonlocal n_ok
+        if include_embeddings and pending:
+            _embed_finished(pending, api_key)
+        for d in pending:
+            n_ok += 1
+            d["analysis_id"] = uuid.uuid4()
+            usage_rows.append(build_usage_row(
+                api_key, source="api", images=d["images"], success=True,
+                include_embeddings=include_embeddings, result=d["result"], analysis_id=d["analysis_id"],
+            ))
+            index_result(d["analysis_id"], api_key, d["result"])
+            yield _line(d)
+        pending.clear()
+
+    pool = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="listing-batch")
+    try:
+        futures = [pool.submit(_run_item, item, include_copy, api_key) for item in items]
+        for fut in as_completed(futures):
+            d = fut.result()
+            if d["error"]:
+                n_failed += 1
+                usage_rows.append(build_usage_row(
+                    api_key, source="api", images=d["images"], success=False,
+                    error=d["error"]["message"],
+                ))
+                yield _line(d)
+                continue
+            pending.append(d)
+            if not include_embeddings or len(pending) >= EMBED_FLUSH_SIZE:
+                yield from _flush()
+        yield from _flush()
+    finally:
+        # If the client disconnects mid-stream, don't keep analyzing.
+        pool.shutdown(wait=False, cancel_futures=True)
+        log_requests(usage_rows)
+
+    yield json.dumps({
+        "summary": {
+            "items": len(items),
+            "succeeded": n_ok,
+            "failed": n_failed,
+            "elapsed_ms": int((time.time() - started) * 1000),
+        }
+    }) + "\n"
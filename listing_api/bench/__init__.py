@@ -0,0 +1,6 @@
+"""Micro/macro benchmarks for the listing pipeline.
+
+Each module is runnable with `python -m listing_api.bench.<name>`; see its
+docstring for flags. Benchmarks print a table to stdout and don't touch the
+database.
+"""
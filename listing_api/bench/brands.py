@@ -0,0 +1,141 @@
+"""Brand normalizer microbenchmark.
+
+Usage (from repo root):
+
+  python -m listing_api.bench.brands                      # 100 / 1k / 5k brands
+  python -m listing_api.bench.brands --sizes 76 20000 --queries 2000
+
+BRAND_ALIASES is padded with synthetic brands (made-up multi-word names with
+0-3 aliases each) up to every size, then both the index-backed matcher and
+the previous linear-scan implementation are timed on the same query mix:
+
+  exact    canonical names and aliases, random case
+  word     a brand name inside a longer string ("vintage <brand> coat")
+  fuzzy    one-edit misspellings of brand names
+  unknown  strings that match nothing (the worst case for the old scan)
+
+Reports build time and mean microseconds per lookup for each query kind.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import string
+import time
+
+from listing_api.brand_index import BrandIndex
+from listing_api.taxonomy import BRAND_ALIASES
+
+SYLLABLES = ["ba", "ve", "lo", "ri", "mon", "ta", "sel", "do", "nar", "qui", "zen", "fo", "ga", "pel", "tor"]
+GARMENTS = ["coat", "blazer", "trousers", "bag", "loafers", "dress", "knit"]
+
+
+def legacy_normalize_brand(aliases: dict[str, list[str]], raw: str | None) -> tuple[str, bool]:
+    """The pre-index implementation: two linear passes over every brand."""
+    if not raw:
+        return "", False
+    raw_norm = raw.strip()
+    if not raw_norm:
+        return "", False
+    raw_lower = raw_norm.lower()
+    for canonical, alias_list in aliases.items():
+        if raw_lower == canonical.lower():
+            return canonical, True
+        for a in alias_list:
+            if raw_lower == a.lower():
+                return canonical, True
+    best_canonical = None
+    best_len = 0
+    for canonical in aliases.keys():
+        c_lower = canonical.lower()
+        if f" {c_lower} " in f" {raw_lower} " or raw_lower.startswith(c_lower + " ") \
+                or raw_lower.endswith(" " + c_lower):
+            if len(c_lower) > best_len:
+                best_canonical = canonical
+                best_len = len(c_lower)
+    if best_canonical:
+        return best_canonical, True
+    return raw_norm, False
+
+
+def synthetic_aliases(size: int, seed: int = 11) -> dict[str, list[str]]:
+    rng = random.Random(seed)
+    aliases = dict(BRAND_ALIASES)
+    while len(aliases) < size:
+        words = [
+            "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+            for _ in range(rng.randint(1, 3))
+        ]
+        name = " ".join(words)
+        if name in aliases:
+            continue
+        extra = []
+        for _ in range(rng.randint(0, 3)):
+            extra.append(rng.choice([name.upper()[:3], words[0], f"{name} Paris", f"{name} Studio"]))
+        aliases[name] = extra
+    return aliases
+
+
+def _misspell(rng: random.Random, name: str) -> str:
+    i = rng.randrange(len(name))
+    op = rng.choice(["sub", "del", "dup"])
+    if op == "sub":
+        return name[:i] + rng.choice(string.ascii_lowercase) + name[i + 1:]
+    if op == "del":
+        return name[:i] + name[i + 1:]
+    return name[:i] + name[i] + name[i:]
+
+
+def build_queries(aliases: dict[str, list[str]], n: int, seed: int = 5) -> dict[str, list[str]]:
+    rng = random.Random(seed)
+    names = list(aliases)
+    every = names + [a for al in aliases.values() for a in al]
+    long_names = [nm for nm in names if len(nm) >= 9]
+    return {
+        "exact": [rng.choice([str.lower, str.upper, str.title])(rng.choice(every)) for _ in range(n)],
+        "word": [f"vintage {rng.choice(names)} {rng.choice(GARMENTS)}" for _ in range(n)],
+        "fuzzy": [_misspell(rng, rng.choice(long_names)) for _ in range(n)],
+        "unknown": [f"Unbranded {rng.choice(GARMENTS)} no. {rng.randint(1, 999)}" for _ in range(n)],
+    }
+
+
+def _time_per_call(fn, queries: list[str]) -> float:
+    started = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - started) / len(queries) * 1e6
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    kinds = ["exact", "word", "fuzzy", "unknown"]
+    header = f"{'brands':>7} {'impl':<7} {'build ms':>9} " + " ".join(f"{k + ' µs':>11}" for k in kinds)
+    print(header)
+    print("-" * len(header))
+    for size in args.sizes:
+        aliases = synthetic_aliases(size)
+        queries = build_queries(aliases, args.queries)
+
+        started = time.perf_counter()
+        index = BrandIndex(aliases)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        rows = [
+            ("index", build_ms, index.match),
+            ("legacy", 0.0, lambda q, a=aliases: legacy_normalize_brand(a, q)),
+        ]
+        for impl, build, fn in rows:
+            timings = " ".join(f"{_time_per_call(fn, queries[k]):>11.1f}" for k in kinds)
+            print(f"{len(aliases):>7} {impl:<7} {build:>9.1f} {timings}")
+
+        hit_rate = sum(1 for q in queries["fuzzy"] if index.match(q)[0]) / len(queries["fuzzy"])
+        print(f"{'':>7} fuzzy recall (one edit, names >= 9 chars): {hit_rate:.0%}")
+
+
+if __name__ == "__main__":
+    main()
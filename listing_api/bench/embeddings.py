@@ -0,0 +1,190 @@
+"""Embedding backend benchmark: parity, throughput and memory per backend.
+
+Usage (from repo root):
+
+  python -m listing_api.bench.embeddings                         # every backend
+  python -m listing_api.bench.embeddings --backends torch torch-int8
+  python -m listing_api.bench.embeddings --texts 512 --images 64 --min-cosine 0.98
+
+Each backend runs in its own subprocess so load time and RSS aren't polluted
+by the others. Vectors from every backend are compared row-by-row against the
+fp32 `torch` backend; the run exits non-zero if any backend's worst-case
+cosine similarity falls below --min-cosine.
+
+Texts are synthesized from the taxonomy; images are the eval set's front
+photos (listing_api/eval/items/*/front.jpg), topped up with synthetic images
+when there are fewer than --images.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ITEMS_DIR = Path(__file__).resolve().parent.parent / "eval" / "items"
+REFERENCE = "torch"
+
+
+# ---------------------------------------------------------------------------
+# Corpus
+# ---------------------------------------------------------------------------
+def build_texts(n: int, seed: int = 7) -> list[str]:
+    from listing_api import taxonomy
+
+    rng = random.Random(seed)
+    subcategories = list(itertools.chain.from_iterable(taxonomy.SUBCATEGORIES.values()))
+    texts = []
+    for _ in range(n):
+        tags = rng.sample(taxonomy.STYLE_TAGS_CANONICAL, 3)
+        texts.append(
+            f"{' '.join(tags)} {rng.choice(taxonomy.COLORS_PRIMARY)} "
+            f"{rng.choice(taxonomy.MATERIAL_PRIMARY)} {rng.choice(subcategories).lower()}. "
+            f"A {rng.choice(taxonomy.SILHOUETTES)} piece with "
+            f"{rng.choice(taxonomy.PATTERNS)} detailing, in {rng.choice(list(dict(taxonomy.CONDITION_GRADES)))} condition."
+        )
+    return texts
+
+
+def build_images(n: int, seed: int = 7) -> list:
+    from PIL import Image
+
+    images = []
+    for path in sorted(ITEMS_DIR.glob("*/front.jpg"))[:n]:
+        images.append(Image.open(path).convert("RGB"))
+    rng = np.random.default_rng(seed)
+    while len(images) < n:
+        # Smooth random colour fields: closer to photos than white noise.
+        small = rng.integers(0, 256, size=(8, 8, 3), dtype=np.uint8)
+        images.append(Image.fromarray(small).resize((448, 448), Image.Resampling.BICUBIC))
+    return images
+
+
+# ---------------------------------------------------------------------------
+# Worker (one backend, own process)
+# ---------------------------------------------------------------------------
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _encode(model, items: list, batch_size: int) -> tuple[np.ndarray, float]:
+    model.encode(items[:batch_size], normalize_embeddings=True, batch_size=batch_size)  # warm-up
+    started = time.perf_counter()
+    vecs = model.encode(items, normalize_embeddings=True, batch_size=batch_size)
+    return np.asarray(vecs, dtype=np.float32), time.perf_counter() - started
+
+
+def run_worker(backend: str, n_texts: int, n_images: int, batch_size: int, out_dir: Path) -> dict:
+    from oracle_frontend.embeddings import build_model
+
+    texts = build_texts(n_texts)
+    images = build_images(n_images)
+    stats: dict = {"backend": backend, "rss_start_mb": round(_rss_mb(), 1)}
+
+    for name, items in (("bge", texts), ("clip", images)):
+        started = time.perf_counter()
+        model, used = build_model(name, backend)
+        stats[f"{name}_backend"] = used
+        stats[f"{name}_load_s"] = round(time.perf_counter() - started, 2)
+        vecs, elapsed = _encode(model, items, batch_size)
+        stats[f"{name}_per_s"] = round(len(items) / elapsed, 1)
+        np.save(out_dir / f"{backend}.{name}.npy", vecs)
+
+    stats["rss_end_mb"] = round(_rss_mb(), 1)
+    stats["peak_rss_mb"] = round(_peak_rss_mb(), 1)
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+def _parity(out_dir: Path, backend: str, name: str) -> tuple[float, float]:
+    ref = np.load(out_dir / f"{REFERENCE}.{name}.npy")
+    vecs = np.load(out_dir / f"{backend}.{name}.npy")
+    cos = np.sum(ref * vecs, axis=1) / (np.linalg.norm(ref, axis=1) * np.linalg.norm(vecs, axis=1))
+    return float(cos.min()), float(cos.mean())
+
+
+def main(argv: list[str] | None = None) -> int:
+    from oracle_frontend.embeddings import EMBEDDING_BACKENDS
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", choices=EMBEDDING_BACKENDS, default=list(EMBEDDING_BACKENDS))
+    parser.add_argument("--texts", type=int, default=256)
+    parser.add_argument("--images", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--min-cosine", type=float, default=0.98,
+                        help="fail if any vector's cosine to fp32 torch is below this")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--out-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        stats = run_worker(args.worker, args.texts, args.images, args.batch_size, Path(args.out_dir))
+        print(json.dumps(stats))
+        return 0
+
+    backends = [REFERENCE] + [b for b in args.backends if b != REFERENCE]
+    rows = []
+    failed = False
+    with tempfile.TemporaryDirectory(prefix="embed-bench-") as tmp:
+        for backend in backends:
+            print(f"[bench] {backend} ...", flush=True)
+            proc = subprocess.run(
+                [sys.executable, "-m", "listing_api.bench.embeddings",
+                 "--worker", backend, "--out-dir", tmp,
+                 "--texts", str(args.texts), "--images", str(args.images),
+                 "--batch-size", str(args.batch_size)],
+                capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                print(f"[bench] {backend} failed:\n{proc.stderr[-2000:]}")
+                failed = True
+                continue
+            stats = json.loads(proc.stdout.strip().splitlines()[-1])
+            for name in ("bge", "clip"):
+                stats[f"{name}_cos_min"], stats[f"{name}_cos_mean"] = _parity(Path(tmp), backend, name)
+                if stats[f"{name}_cos_min"] < args.min_cosine:
+                    failed = True
+            rows.append(stats)
+
+    header = (f"{'backend':<11} {'bge':<11} {'texts/s':>8} {'cos min':>8} "
+              f"{'clip':<11} {'imgs/s':>7} {'cos min':>8} {'load s':>7} {'RSS MB':>7} {'peak MB':>8}")
+    print()
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(
+            f"{r['backend']:<11} {r['bge_backend']:<11} {r['bge_per_s']:>8} {r['bge_cos_min']:>8.4f} "
+            f"{r['clip_backend']:<11} {r['clip_per_s']:>7} {r['clip_cos_min']:>8.4f} "
+            f"{r['bge_load_s'] + r['clip_load_s']:>7.1f} {r['rss_end_mb']:>7} {r['peak_rss_mb']:>8}"
+        )
+    if failed:
+        print(f"\n[bench] FAIL: a backend errored or fell below cosine {args.min_cosine}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,352 @@
+"""Listing pipeline benchmark with a stubbed vision model.
+
+Usage (from repo root):
+
+  python -m listing_api.bench.pipeline                          # run_pipeline, 1 thread
+  python -m listing_api.bench.pipeline --concurrency 1 4 8 --requests 64
+  python -m listing_api.bench.pipeline --target view --concurrency 4
+  python -m listing_api.bench.pipeline --model-latency-ms 3000  # model time on top of CPU work
+  python -m listing_api.bench.pipeline --stream --no-embeddings
+
+OpenAI is replaced by a fake client that answers instantly (or after
+--model-latency-ms) with recorded responses. Everything else runs for real:
+image decode/resize/encode, prompt building, response parsing and
+normalization, the shared client's semaphore, BGE + CLIP embeddings. That
+makes CPU regressions show up on any box, with no API key and no spend.
+
+Fixtures come from listing_api/eval/items: each item's photos are the input
+and its ground truth doubles as the recorded vision answer. With no eval
+items, synthetic phone-sized photos and canned answers are used instead.
+
+Targets:
+  pipeline  calls run_pipeline directly
+  view      posts multipart uploads through the DRF /analyze view (auth,
+            throttling, upload parsing, response encoding). Result caching is
+            turned off, and usage logging and search indexing are skipped, so
+            the database is never touched.
+
+For every concurrency level it reports throughput and p50/p95/p99/max per
+stage, from each run's `_meta` plus the end-to-end latency seen by the
+caller. Peak RSS is reported after warm-up (models loaded) and after each
+level.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import random
+import resource
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+
+import numpy as np
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+CANNED_COPY = {
+    "title": "Max Mara Charcoal Wool Long Single-Breasted Coat",
+    "description": (
+        "A long, single-breasted Max Mara coat in charcoal wool with a structured shoulder "
+        "and clean, minimalist lines. Very good condition with light wear at the cuffs."
+    ),
+    "tags": ["max-mara", "wool-coat", "charcoal", "minimalist", "investment", "long-coat", "outerwear"],
+}
+
+CANNED_ANSWERS = [
+    {
+        "category": "Outerwear", "subcategory": "Wool Coat", "silhouette": ["long", "single-breasted"],
+        "primary_color": "charcoal", "secondary_colors": [], "color_palette": "neutral",
+        "pattern": "solid", "primary_material": "wool", "material_raw": "100% virgin wool",
+        "material_confidence": "high", "brand": "Max Mara", "brand_confidence": "high",
+        "size_label": "US 6", "condition": "very_good", "condition_notes": "light wear at cuffs",
+        "era_estimate": "current-season", "style_tags": ["classic", "minimalist", "investment"],
+        "style_descriptors": ["tailored", "understated", "sharp shoulder"],
+        "key_details": ["horn buttons", "welt pockets"],
+    },
+    {
+        "category": "Tops", "subcategory": "Shirt", "silhouette": ["relaxed"],
+        "primary_color": "white", "secondary_colors": ["navy"], "color_palette": "neutral",
+        "pattern": "striped", "primary_material": "cotton", "material_raw": "cotton poplin",
+        "material_confidence": "medium", "brand": "COMME des GARCONS", "brand_confidence": "medium",
+        "size_label": None, "condition": "excellent", "condition_notes": "",
+        "era_estimate": None, "style_tags": ["minimalist"],
+        "style_descriptors": ["crisp", "oversized cuffs"], "key_details": ["mother-of-pearl buttons"],
+    },
+]
+
+SYNTHETIC_ROLES = ("front", "back", "label")
+
+
+@dataclass
+class Fixture:
+    name: str
+    images: list = field(default_factory=list)  # ImageInput
+    answer: dict = field(default_factory=dict)
+
+
+def _synthetic_jpeg(seed: int, size: tuple[int, int] = (3024, 4032)) -> bytes:
+    """A phone-sized JPEG of smooth colour noise (decodes like a photo)."""
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, size=(12, 9, 3), dtype=np.uint8)
+    img = Image.fromarray(small).resize(size, Image.Resampling.BICUBIC)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def load_fixtures(limit: int) -> list[Fixture]:
+    from listing_api.analyzer import ImageInput
+    from listing_api.eval.dataset import load_items
+
+    fixtures = []
+    try:
+        items = load_items()
+    except Exception as e:
+        print(f"[bench] eval items unavailable ({e}); using synthetic fixtures")
+        items = []
+    for item in items[:limit]:
+        images = item.load_images()
+        if images:
+            fixtures.append(Fixture(item.item_id, images, {**CANNED_ANSWERS[0], **item.ground_truth}))
+    if fixtures:
+        return fixtures
+
+    for i in range(min(limit, len(CANNED_ANSWERS) * 2)):
+        images = [
+            ImageInput(bytes_data=_synthetic_jpeg(i * 10 + j), role=role, filename=f"{role}.jpg")
+            for j, role in enumerate(SYNTHETIC_ROLES)
+        ]
+        fixtures.append(Fixture(f"synthetic-{i}", images, CANNED_ANSWERS[i % len(CANNED_ANSWERS)]))
+    return fixtures
+
+
+# ---------------------------------------------------------------------------
+# Fake OpenAI
+# ---------------------------------------------------------------------------
+_current = threading.local()
+
+
+def _usage(prompt_tokens: int, completion_tokens: int):
+    return SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=0),
+    )
+
+
+class FakeCompletions:
+    """Answers chat.completions.create from the fixture bound to the calling thread."""
+
+    def __init__(self, model_latency_ms: int, copy_latency_ms: int):
+        self.model_latency = model_latency_ms / 1000
+        self.copy_latency = copy_latency_ms / 1000
+
+    def create(self, messages, stream=False, **kwargs):
+        from listing_api.copy_generator import COPY_INSTRUCTIONS
+
+        is_copy = messages[0]["content"] == COPY_INSTRUCTIONS
+        answer = CANNED_COPY if is_copy else getattr(_current, "answer", CANNED_ANSWERS[0])
+        text = json.dumps(answer)
+        time.sleep(self.copy_latency if is_copy else self.model_latency)
+        if stream:
+            return self._chunks(text)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+            usage=_usage(1500, len(text) // 4),
+        )
+
+    def _chunks(self, text: str):
+        for i in range(0, len(text), 12):
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text[i:i + 12]))], usage=None)
+        yield SimpleNamespace(choices=[], usage=_usage(1500, len(text) // 4))
+
+
+def install_fake_client(model_latency_ms: int, copy_latency_ms: int) -> None:
+    """Point ai_config's shared client at the fake, keeping the real gate."""
+    from oracle_frontend import ai_config
+
+    fake = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(model_latency_ms, copy_latency_ms)))
+    ai_config._client = ai_config._PacedClient(fake)
+
+
+# ---------------------------------------------------------------------------
+# Targets
+# ---------------------------------------------------------------------------
+def _stages(result: dict) -> dict:
+    """Per-stage ms from a pipeline result's _meta."""
+    meta = result.get("_meta") or {}
+    stages = {k.removesuffix("_ms"): v for k, v in (meta.get("stages") or {}).items() if v is not None}
+    analyzer = meta.get("analyzer") or {}
+    for step in ("decode", "resize", "encode"):
+        stages[f"image_{step}"] = sum(p.get(f"{step}_ms", 0) for p in analyzer.get("preprocess") or [])
+    if "queue_ms" in analyzer:
+        stages["openai_queue"] = analyzer["queue_ms"]
+    return stages
+
+
+class PipelineTarget:
+    def __init__(self, args):
+        self.args = args
+
+    def __call__(self, fixture: Fixture) -> dict:
+        from listing_api.pipeline import run_pipeline
+
+        on_field = (lambda name, value: None) if self.args.stream else None
+        result = run_pipeline(
+            fixture.images,
+            include_embeddings=not self.args.no_embeddings,
+            include_copy=not self.args.no_copy,
+            on_field=on_field,
+        )
+        return _stages(result)
+
+
+class ViewTarget:
+    """POSTs through the DRF view with a forced, unsaved APIKey."""
+
+    def __init__(self, args):
+        import django
+
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "oracle_backend.settings")
+        django.setup()
+
+        from django.conf import settings
+        from rest_framework.test import APIRequestFactory
+
+        from listing_api import result_cache, views
+        from listing_api.auth import APIKeyUser
+        from listing_api.models import APIKey
+
+        settings.LISTING_RESULT_CACHE = {**settings.LISTING_RESULT_CACHE, "BACKEND": "off"}
+        result_cache._backend = None
+        views.log_request = lambda *a, **k: None
+        views.index_result = lambda *a, **k: None
+
+        # Capture each run's _meta on its way through the view.
+        self._local = threading.local()
+        real_run = result_cache.run_pipeline
+
+        def _recording_run(*a, **k):
+            result = real_run(*a, **k)
+            self._local.stages = _stages(result)
+            return result
+
+        result_cache.run_pipeline = _recording_run
+
+        self.args = args
+        self.views = views
+        self.factory = APIRequestFactory()
+        self.key = APIKey(id=0, organization="bench", rate_limit_per_minute=10**9, rate_limit_per_day=10**9)
+        self.user = APIKeyUser(self.key)
+
+    def __call__(self, fixture: Fixture) -> dict:
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from rest_framework.test import force_authenticate
+
+        data = {
+            "images": [SimpleUploadedFile(img.filename, img.bytes_data, content_type="image/jpeg") for img in fixture.images],
+            "roles": ",".join(img.role for img in fixture.images),
+            "include_embeddings": "false" if self.args.no_embeddings else "true",
+            "include_copy": "false" if self.args.no_copy else "true",
+            "embedding_format": self.args.embedding_format,
+        }
+        request = self.factory.post("/listing/api/v1/analyze/", data, format="multipart")
+        force_authenticate(request, user=self.user, token=self.key)
+        self._local.stages = {}
+        response = self.views.analyze(request)
+        if response.status_code != 200:
+            raise RuntimeError(f"view returned {response.status_code}: {getattr(response, 'data', '')}")
+        response.render()
+        stages = dict(self._local.stages)
+        stages["response_kb"] = len(response.content) / 1024
+        return stages
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _pct(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run_level(target, fixtures: list[Fixture], requests: int, concurrency: int) -> tuple[dict, float]:
+    samples: dict[str, list[float]] = {}
+    lock = threading.Lock()
+
+    def _one(i: int) -> None:
+        fixture = fixtures[i % len(fixtures)]
+        _current.answer = fixture.answer
+        started = time.perf_counter()
+        stages = target(fixture)
+        stages["total"] = (time.perf_counter() - started) * 1000
+        with lock:
+            for k, v in stages.items():
+                samples.setdefault(k, []).append(v)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench") as pool:
+        list(pool.map(_one, range(requests)))
+    return samples, time.perf_counter() - started
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=["pipeline", "view"], default="pipeline")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1])
+    parser.add_argument("--requests", type=int, default=32, help="requests per concurrency level")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed requests first (model loading)")
+    parser.add_argument("--fixtures", type=int, default=8, help="max distinct garments to cycle through")
+    parser.add_argument("--model-latency-ms", type=int, default=0, help="fake vision-call latency")
+    parser.add_argument("--copy-latency-ms", type=int, default=0, help="fake copy-call latency")
+    parser.add_argument("--stream", action="store_true", help="exercise the streamed analyzer path")
+    parser.add_argument("--no-embeddings", action="store_true")
+    parser.add_argument("--no-copy", action="store_true")
+    parser.add_argument("--embedding-format", default="float", help="view target only")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    install_fake_client(args.model_latency_ms, args.copy_latency_ms)
+    target = ViewTarget(args) if args.target == "view" else PipelineTarget(args)
+    fixtures = load_fixtures(args.fixtures)
+    print(f"target={args.target} fixtures={len(fixtures)} "
+          f"images/request={statistics.mean(len(f.images) for f in fixtures):.1f} "
+          f"model_latency={args.model_latency_ms}ms embeddings={not args.no_embeddings}")
+
+    if args.warmup:
+        run_level(target, fixtures, args.warmup, 1)
+    print(f"peak RSS after warm-up: {_peak_rss_mb():.0f} MB\n")
+
+    for concurrency in args.concurrency:
+        samples, wall = run_level(target, fixtures, args.requests, concurrency)
+        print(f"concurrency={concurrency}  requests={args.requests}  "
+              f"throughput={args.requests / wall:.2f} req/s  peak RSS={_peak_rss_mb():.0f} MB")
+        header = f"  {'stage (ms)':<20} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}"
+        print(header)
+        print("  " + "-" * (len(header) - 2))
+        order = ["total"] + sorted(k for k in samples if k != "total")
+        for stage in order:
+            values = samples[stage]
+            print(f"  {stage:<20} " + " ".join(
+                f"{_pct(values, q):>9.1f}" for q in (0.5, 0.95, 0.99)
+            ) + f" {max(values):>9.1f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""Precomputed brand matcher behind `taxonomy.normalize_brand`.
+
+Built once from BRAND_ALIASES ({canonical: [aliases]}) and queried per
+analysis. Match tiers, cheapest first:
+
+  1. exact   — hash lookup of the whole string against every canonical name
+               and alias (case- and accent-insensitive)
+  2. word    — longest whole-word occurrence of a canonical name (or an
+               unambiguous alias) inside the string, via a token trie:
+               "Christian Dior Monsieur jacket" -> "Christian Dior"
+  3. fuzzy   — a small edit (insert/delete/substitute, or an adjacent swap)
+               from a canonical name or alias, for OCR-style misreads:
+               "Maison Margiella" -> "Maison Margiela". The budget grows
+               with length (see fuzzy_budget) and the closest key must be
+               unambiguous.
+
+Fuzzy matching uses a symmetric-delete index: every key is stored under
+itself and each single-character deletion of it, and a query looks up its
+own single deletions. Any key within one edit shares at least one entry, so
+candidates come from a handful of dict lookups and only those few are
+verified with Levenshtein. Keys long enough to be two edits from a
+two-edit-budget query also store their two-character deletions, and such
+queries look up theirs, so two substitutions still meet on a shared entry.
+
+Cost per lookup grows with the length of the input, not the number of brands,
+so BRAND_ALIASES can grow to thousands of entries. See
+`python -m listing_api.bench.brands`.
+"""
+
+from __future__ import annotations
+
+import unicodedata
+from typing import Mapping
+
+# Punctuation trimmed from the ends of tokens ("Prada," -> "prada");
+# inner punctuation is kept ("a.p.c", "levi's", "re/done").
+_TOKEN_STRIP = ".,;:!?()[]{}\"'`*"
+
+# Strings shorter than this never fuzzy-match: short names sit too close to
+# ordinary words ("Vince" is one edit from "since").
+FUZZY_MIN_LEN = 6
+# Below this, only an adjacent swap is accepted: a single insert or
+# substitution turns real words and other labels into brands ("Salmon" ->
+# "Salomon", "Sandra" -> "Sandro"). From here up to FUZZY_TWO_EDIT_LEN one
+# edit is allowed, and two beyond that.
+FUZZY_ONE_EDIT_LEN = 8
+FUZZY_TWO_EDIT_LEN = 12
+
+
+def fold(text: str) -> str:
+    """Lowercase, strip accents and collapse whitespace: "Hermès " -> "hermes"."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.split())
+
+
+def tokens(text: str) -> list[str]:
+    out = []
+    for tok in fold(text).split(" "):
+        tok = tok.strip(_TOKEN_STRIP)
+        if tok:
+            out.append(tok)
+    return out
+
+
+def _deletes(key: str, depth: int = 1) -> set[str]:
+    """`key` plus every string up to `depth` deletions away from it."""
+    out, frontier = {key}, {key}
+    for _ in range(depth):
+        frontier = {k[:i] + k[i + 1:] for k in frontier for i in range(len(k))}
+        out |= frontier
+    return out
+
+
+def levenshtein(a: str, b: str) -> int:
+    """Edit distance, counting a swap of adjacent characters as one edit."""
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    before, prev = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            d = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                d = min(d, before[j - 2] + 1)
+            cur.append(d)
+        before, prev = prev, cur
+    return prev[-1]
+
+
+def _is_swap(a: str, b: str) -> bool:
+    """True if `b` is `a` with two adjacent characters exchanged."""
+    if len(a) != len(b):
+        return False
+    diff = [i for i in range(len(a)) if a[i] != b[i]]
+    return len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+
+
+def fuzzy_budget(candidate: str) -> int:
+    """Edits a candidate of this length may be away from a key (swaps aside)."""
+    if len(candidate) < FUZZY_ONE_EDIT_LEN:
+        return 0
+    if len(candidate) < FUZZY_TWO_EDIT_LEN:
+        return 1
+    return 2
+
+
+class BrandIndex:
+    """Immutable brand matcher; see module docstring for the match tiers."""
+
+    _END = object()  # trie terminal marker
+
+    def __init__(self, aliases: Mapping[str, list[str]]):
+        self._exact: dict[str, str] = {}
+        # Canonical names win over aliases that happen to collide with them.
+        for canonical in aliases:
+            self._exact.setdefault(fold(canonical), canonical)
+        for canonical, alias_list in aliases.items():
+            for alias in alias_list:
+                self._exact.setdefault(fold(alias), canonical)
+
+        # Whole-word matching covers canonical names, multi-word aliases and
+        # long single-word aliases. Short ones ("Polo", "Docs", "BB") are too
+        # ambiguous inside a longer string and only match exactly.
+        self._trie: dict = {}
+        for canonical, alias_list in aliases.items():
+            names = [canonical] + [
+                a for a in alias_list if len(tokens(a)) > 1 or len(fold(a)) >= FUZZY_MIN_LEN
+            ]
+            for name in names:
+                toks = tokens(name)
+                if not toks:
+                    continue
+                node = self._trie
+                for tok in toks:
+                    node = node.setdefault(tok, {})
+                node.setdefault(self._END, (canonical, len(" ".join(toks))))
+
+        self._fuzzy: dict[str, list[str]] = {}
+        for key in self._exact:
+            if len(key) >= FUZZY_MIN_LEN:
+                # A query of FUZZY_TWO_EDIT_LEN or more can be two edits
+                # from a key two characters shorter.
+                depth = 2 if len(key) >= FUZZY_TWO_EDIT_LEN - 2 else 1
+                for d in _deletes(key, depth):
+                    self._fuzzy.setdefault(d, []).append(key)
+        self._max_tokens = max((len(k.split(" ")) for k in self._exact), default=1)
+        self._max_len = max((len(k) for k in self._exact), default=0)
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    def match(self, raw: str | None) -> tuple[str | None, str | None]:
+        """Return (canonical, tier) with tier in exact|word|fuzzy, or (None, None)."""
+        if not raw:
+            return None, None
+        key = fold(raw)
+        if not key:
+            return None, None
+
+        canonical = self._exact.get(key)
+        if canonical:
+            return canonical, "exact"
+
+        toks = tokens(raw)
+        canonical = self._longest_word_match(toks)
+        if canonical:
+            return canonical, "word"
+
+        canonical = self._fuzzy_match(key, toks)
+        if canonical:
+            return canonical, "fuzzy"
+        return None, None
+
+    def _longest_word_match(self, toks: list[str]) -> str | None:
+        best, best_len = None, 0
+        for start in range(len(toks)):
+            node = self._trie
+            for tok in toks[start:]:
+                node = node.get(tok)
+                if node is None:
+                    break
+                hit = node.get(self._END)
+                if hit and hit[1] > best_len:
+                    best, best_len = hit
+        return best
+
+    def _fuzzy_match(self, key: str, toks: list[str]) -> str | None:
+        # The whole string first, then word windows (longest first) so a
+        # misspelt brand followed by a garment type still resolves.
+        candidates = [key]
+        for size in range(min(len(toks), self._max_tokens), 0, -1):
+            for start in range(len(toks) - size + 1):
+                window = " ".join(toks[start:start + size])
+                if window != key:
+                    candidates.append(window)
+        for candidate in candidates:
+            if len(candidate) < FUZZY_MIN_LEN:
+                continue
+            budget = fuzzy_budget(candidate)
+            if len(candidate) > self._max_len + max(budget, 1):
+                continue  # longer than any key by more than the budget
+            keys = {k for d in _deletes(candidate, max(budget, 1)) for k in self._fuzzy.get(d, ())}
+            if not keys:
+                continue
+            scored = [
+                (levenshtein(candidate, k), k) for k in keys
+                if budget or _is_swap(candidate, k)
+            ]
+            scored = [(dist, k) for dist, k in scored if dist <= max(budget, 1)]
+            if not scored:
+                continue
+            best = min(dist for dist, _ in scored)
+            winners = {self._exact[k] for dist, k in scored if dist == best}
+            # Two brands equally close: guessing would be worse than no match.
+            if len(winners) == 1:
+                return winners.pop()
+        return None
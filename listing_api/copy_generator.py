@@ -9,15 +9,34 @@ Strategy:
 - Use a single GPT call with a tightly scoped prompt (cheap, deterministic).
 - Provide a deterministic fallback (template-based) if the LLM call fails — so
   the API always returns valid copy even on partial outage.
+
+`mode` (LISTING_COPY_MODE by default; an unknown value fails at import) picks
+the path:
+- "llm":      always the GPT call (template only as the outage fallback)
+- "template": always the deterministic template — no network call
+- "auto":     the template when the metadata is confident enough for it to
+              be as good as the LLM (see `template_eligible`), else the LLM.
+              `python -m listing_api.eval.run_eval --copy-modes llm template auto`
+              scores the three against each other.
 """
 
 from __future__ import annotations
 
 import json
+import os
 import re
 import time
 
-from oracle_frontend.ai_config import get_openai_client, OPENAI_MODEL
+from oracle_frontend.ai_config import get_openai_client, last_call_metrics, OPENAI_MODEL, usage_counts
+
+from . import metrics
+
+COPY_MODES = ("llm", "template", "auto")
+COPY_MODE = os.getenv("LISTING_COPY_MODE", "llm")
+# Checked at import, like image_policy.IMAGE_POLICY: a typo would otherwise
+# run as "llm" while splitting the result cache under a key of its own.
+if COPY_MODE not in COPY_MODES:
+    raise RuntimeError(f"LISTING_COPY_MODE='{COPY_MODE}' is not a copy mode (allowed: {', '.join(COPY_MODES)})")
 
 
 SYSTEM_PROMPT = (
@@ -30,23 +49,33 @@ SYSTEM_PROMPT = (
 )
 
 
-def _build_prompt(meta: dict) -> str:
-    return f"""Write listing copy for the garment described by this structured metadata.
-
-METADATA (do NOT invent additional facts):
-{json.dumps(meta, indent=2)}
-
-Output a single JSON object with EXACTLY these three keys:
-
-{{
+# The listing object; also embedded in the analyzer's single-pass prompt.
+LISTING_JSON_SHAPE = """{
   "title": "<80 chars max — Brand + Key Descriptor + Subcategory + (Color or Material). E.g. 'Saint Laurent Oversized Black Wool Coat'. If brand is unknown, lead with the most specific descriptor.>",
   "description": "<3-5 sentences. Sentence 1: brand + item type + headline silhouette/material. Sentence 2: construction details (key_details, pattern, color story). Sentence 3: condition (use the condition + condition_notes). Sentence 4 (optional): styling suggestion grounded in style_tags. No marketing fluff, no superlatives like 'stunning' or 'gorgeous'.>",
   "tags": ["<15-25 lowercase tokens, hyphenated where appropriate. Include: brand (canonical + aliases if relevant), category, subcategory, primary_color, pattern, primary_material, all silhouettes, all style_tags, era_estimate if present. Deduplicated.>"]
-}}
+}"""
+
+# Static output spec, appended to the system message so the shared prefix is
+# as long as possible for provider-side prompt caching; the per-item metadata
+# goes last, in the user message.
+_OUTPUT_SPEC = """Output a single JSON object with EXACTLY these three keys:
+
+""" + LISTING_JSON_SHAPE + """
 
 Return ONLY the JSON object. No prose, no markdown.
 """
 
+COPY_INSTRUCTIONS = SYSTEM_PROMPT + "\n\n" + _OUTPUT_SPEC
+
+
+def _build_prompt(meta: dict) -> str:
+    return f"""Write listing copy for the garment described by this structured metadata.
+
+METADATA (do NOT invent additional facts):
+{json.dumps(meta, indent=2)}
+"""
+
 
 def _parse_json_response(raw: str) -> dict:
     text = raw.strip()
@@ -83,16 +112,32 @@ def _normalize_tags(raw_tags) -> list[str]:
     return out[:25]
 
 
-def _fallback_copy(meta: dict) -> dict:
-    """Deterministic template fallback if the LLM call fails."""
+def template_eligible(meta: dict) -> bool:
+    """Whether the template can stand in for the LLM in "auto" mode.
+
+    The template only restates the metadata, so it is as good as the facts
+    behind it: a confidently identified brand and material, plus the
+    subcategory and colour the title is built from.
+    """
+    return (
+        meta.get("brand_confidence") == "high"
+        and bool(meta.get("brand_known"))
+        and meta.get("material_confidence") == "high"
+        and bool((meta.get("subcategory") or "").strip())
+        and bool((meta.get("primary_color") or "").strip())
+    )
+
+
+def template_copy(meta: dict, source: str = "template") -> dict:
+    """Deterministic title/description/tags built from the metadata alone."""
     brand = (meta.get("brand") or "").strip()
-    sub = meta.get("subcategory", "").strip()
-    color = meta.get("primary_color", "").strip()
-    material = meta.get("primary_material", "").strip()
+    sub = (meta.get("subcategory") or "").strip()
+    color = (meta.get("primary_color") or "").strip()
+    material = (meta.get("primary_material") or "").strip()
     silhouette = meta.get("silhouette") or []
-    pattern = meta.get("pattern", "")
-    condition = meta.get("condition", "good").replace("_", " ")
-    condition_notes = meta.get("condition_notes", "")
+    pattern = meta.get("pattern") or ""
+    condition = (meta.get("condition") or "good").replace("_", " ")
+    condition_notes = (meta.get("condition_notes") or "").strip()
     style_tags = meta.get("style_tags") or []
     key_details = meta.get("key_details") or []
     era = meta.get("era_estimate")
@@ -110,9 +155,8 @@ def _fallback_copy(meta: dict) -> dict:
     sentences = []
     lead_brand = brand or "Designer"
     lead_silhouette = silhouette[0] if silhouette else ""
-    sentences.append(
-        f"{lead_brand} {sub.lower()} in {color} {material}".strip() + "."
-    )
+    fabric = " ".join(b for b in [color, material if material.lower() not in sub_lower else ""] if b)
+    sentences.append(f"{lead_brand} {sub_lower}" + (f" in {fabric}" if fabric else "") + ".")
     if lead_silhouette or pattern != "solid" or key_details:
         details_str = ", ".join(filter(None, [
             lead_silhouette,
@@ -123,7 +167,7 @@ def _fallback_copy(meta: dict) -> dict:
             sentences.append(f"Features {details_str}.")
     cond_sentence = f"Condition: {condition}."
     if condition_notes:
-        cond_sentence = f"Condition: {condition} — {condition_notes.rstrip('.')}"
+        cond_sentence = f"Condition: {condition} — {condition_notes.rstrip('.')}."
     sentences.append(cond_sentence)
     if style_tags:
         sentences.append(f"Pairs well with {', '.join(style_tags[:3])} pieces.")
@@ -138,55 +182,92 @@ def _fallback_copy(meta: dict) -> dict:
     raw_tags += style_tags
     if era:
         raw_tags.append(era)
+    # Searchable extras, after the core facts so truncation drops these first.
+    raw_tags += meta.get("secondary_colors") or []
+    raw_tags.append(meta.get("color_palette"))
+    if brand and sub:
+        raw_tags.append(f"{brand} {sub}")
+    raw_tags += key_details
     tags = _normalize_tags(raw_tags)
 
     return {
         "title": title,
         "description": description,
         "tags": tags,
-        "source": "template_fallback",
+        "source": source,
     }
 
 
-def generate_listing_copy(meta: dict, model: str | None = None) -> dict:
+def normalize_listing(parsed) -> dict | None:
+    """Title/description/tags from a model's listing object, or None if any is missing."""
+    if not isinstance(parsed, dict):
+        return None
+    title = _normalize_title(parsed.get("title", ""))
+    description = (parsed.get("description") or "").strip()
+    tags = _normalize_tags(parsed.get("tags"))
+    if not title or not description or not tags:
+        return None
+    return {"title": title, "description": description, "tags": tags}
+
+
+def _fallback_copy(meta: dict) -> dict:
+    """Deterministic template fallback if the LLM call fails."""
+    return template_copy(meta, source="template_fallback")
+
+
+def generate_listing_copy(meta: dict, model: str | None = None, mode: str | None = None) -> dict:
     """Generate title, description, tags from analyzer metadata.
 
     Returns:
-        {"title": str, "description": str, "tags": list[str], "source": "llm"|"template_fallback",
-         "_meta": {"model": str, "elapsed_ms": int, "input_tokens": int, "output_tokens": int}}
+        {"title": str, "description": str, "tags": list[str],
+         "source": "llm"|"template"|"template_fallback",
+         "_meta": {"model": str, "mode": str, "elapsed_ms": int, "input_tokens": int,
+                   "cached_input_tokens": int, "output_tokens": int,
+                   "queue_ms": int, "model_ms": int, "retry_wait_ms": int, "retries": int}}
     """
     chosen_model = model or OPENAI_MODEL
+    mode = mode or COPY_MODE
     started = time.time()
 
+    if mode == "template" or (mode == "auto" and template_eligible(meta)):
+        with metrics.trace("copy_template"):
+            copy = template_copy(meta)
+        copy["_meta"] = {
+            "model": "template",
+            "mode": mode,
+            "elapsed_ms": int((time.time() - started) * 1000),
+            "input_tokens": 0,
+            "cached_input_tokens": 0,
+            "output_tokens": 0,
+        }
+        return copy
+
     try:
-        resp = get_openai_client().chat.completions.create(
-            model=chosen_model,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": _build_prompt(meta)},
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.4,
-        )
+        with metrics.trace("copy_generator_call", model=chosen_model):
+            resp = get_openai_client().chat.completions.create(
+                model=chosen_model,
+                messages=[
+                    {"role": "system", "content": COPY_INSTRUCTIONS},
+                    {"role": "user", "content": _build_prompt(meta)},
+                ],
+                response_format={"type": "json_object"},
+                temperature=0.4,
+            )
+        metrics.observe_client_call("copy_generator", last_call_metrics(), model=chosen_model)
         raw = resp.choices[0].message.content or ""
-        parsed = _parse_json_response(raw)
-        title = _normalize_title(parsed.get("title", ""))
-        description = (parsed.get("description") or "").strip()
-        tags = _normalize_tags(parsed.get("tags"))
-        if not title or not description or not tags:
+        listing = normalize_listing(_parse_json_response(raw))
+        if listing is None:
             raise ValueError("missing required field in LLM output")
 
-        usage = getattr(resp, "usage", None)
         return {
-            "title": title,
-            "description": description,
-            "tags": tags,
+            **listing,
             "source": "llm",
             "_meta": {
                 "model": chosen_model,
+                "mode": mode,
                 "elapsed_ms": int((time.time() - started) * 1000),
-                "input_tokens": getattr(usage, "prompt_tokens", 0) if usage else 0,
-                "output_tokens": getattr(usage, "completion_tokens", 0) if usage else 0,
+                **usage_counts(resp),
+                **last_call_metrics(),
             },
         }
     except Exception as e:
@@ -194,9 +275,12 @@ def generate_listing_copy(meta: dict, model: str | None = None) -> dict:
         fallback = _fallback_copy(meta)
         fallback["_meta"] = {
             "model": "template",
+            "mode": mode,
             "elapsed_ms": int((time.time() - started) * 1000),
             "input_tokens": 0,
+            "cached_input_tokens": 0,
             "output_tokens": 0,
+            **last_call_metrics(),
             "fallback_reason": str(e),
         }
         return fallback
@@ -10,6 +10,7 @@ import json
 import sys
 from pathlib import Path
 
+from .scoring import COPY_FIELDS
 
 # Field display order + grouping
 FIELD_GROUPS = [
@@ -26,6 +27,19 @@ def _bar(value: float, width: int = 20) -> str:
     return "█" * filled + "░" * (width - filled)
 
 
+def _macro(per_field: dict) -> float:
+    scores = [v["mean"] for v in per_field.values() if v["n"] > 0]
+    return sum(scores) / len(scores) if scores else 0.0
+
+
+def _usage_line(usage: dict) -> str:
+    return (
+        f"- **Per item:** {usage['mean_elapsed_ms']:.0f}ms, {usage['mean_calls']:.2f} model calls, "
+        f"{usage['mean_input_tokens']:.0f} input tokens ({usage['mean_cached_input_tokens']:.0f} cached, "
+        f"~{usage['mean_image_tokens']:.0f} image), {usage['mean_output_tokens']:.0f} output tokens"
+    )
+
+
 def write_report(summary: dict, path: Path) -> None:
     lines: list[str] = []
     mode = summary["mode"]
@@ -38,8 +52,7 @@ def write_report(summary: dict, path: Path) -> None:
 
     # Top-line accuracy
     per_field = summary.get("per_field", {})
-    macro_scores = [v["mean"] for v in per_field.values() if v["n"] > 0]
-    macro = sum(macro_scores) / len(macro_scores) if macro_scores else 0.0
+    macro = _macro(per_field)
     lines.append(f"- **Macro accuracy** (mean of per-field means): **{macro:.1%}**")
     lines.append("")
 
@@ -60,6 +73,53 @@ def write_report(summary: dict, path: Path) -> None:
             )
         lines.append("")
 
+    # Listing copy, one column per copy mode (run_eval --copy-modes)
+    copy = summary.get("copy") or {}
+    if copy:
+        modes = list(copy)
+        lines.append("## Listing copy")
+        lines.append("")
+        lines.append("Copy generated from the same predicted metadata in each mode; "
+                     "facts are checked against ground truth.")
+        lines.append("")
+        lines.append("| Metric | " + " | ".join(f"`{m}`" for m in modes) + " |")
+        lines.append("|---|" + "---:|" * len(modes))
+        for f in COPY_FIELDS:
+            cells = []
+            for m in modes:
+                stats = copy[m]["per_field"].get(f)
+                cells.append(f"{stats['mean']:.1%}" if stats and stats["n"] else "—")
+            lines.append(f"| `{f}` | " + " | ".join(cells) + " |")
+        lines.append("| mean latency | " + " | ".join(f"{copy[m]['mean_elapsed_ms']:.0f}ms" for m in modes) + " |")
+        lines.append("| template used | " + " | ".join(f"{copy[m]['template_share']:.0%}" for m in modes) + " |")
+        lines.append("| tag agreement with `llm` | " + " | ".join(
+            f"{copy[m]['agreement_with_llm']:.1%}" if copy[m]["agreement_with_llm"] is not None else "—"
+            for m in modes
+        ) + " |")
+        lines.append("")
+
+    # Cost, and pipeline copy with run_eval --passes
+    usage = summary.get("usage")
+    if usage:
+        variant = summary.get("variant")
+        lines.append("## Cost" + (f" — `{variant}`" if variant else ""))
+        lines.append("")
+        lines.append(_usage_line(usage))
+        by_role = usage.get("mean_image_tokens_by_role") or {}
+        if by_role:
+            lines.append("- **Image tokens by role** (estimated, per item): "
+                         + ", ".join(f"{role} {n:.0f}" for role, n in by_role.items()))
+        lines.append("")
+        listing = usage.get("listing") or {}
+        if listing:
+            lines.append("| Metric | Score | n |")
+            lines.append("|---|---:|---:|")
+            for f in COPY_FIELDS:
+                stats = listing.get(f)
+                if stats and stats["n"]:
+                    lines.append(f"| `{f}` | {stats['mean']:.1%} | {stats['n']} |")
+            lines.append("")
+
     # Per-item details (collapsible)
     lines.append("## Per-item breakdown")
     lines.append("")
@@ -97,6 +157,51 @@ def write_report(summary: dict, path: Path) -> None:
     path.write_text("\n".join(lines))
 
 
+def write_comparison(summaries: list[dict], path: Path, title: str = "") -> None:
+    """Side-by-side report for the same items run once per variant
+    (run_eval --passes / --image-policies): metadata accuracy, copy scores,
+    latency, tokens."""
+    names = [f"`{s.get('variant') or s['mode']}`" for s in summaries]
+    lines: list[str] = []
+    lines.append(f"# Variant comparison — `{title}`" if title else "# Variant comparison")
+    lines.append("")
+    lines.append(f"_Generated {summaries[0].get('generated_at', '')}_")
+    lines.append("")
+    lines.append("Same items, same images. `two pass` = analyzer call then copy call; "
+                 "`single pass` = one call returning metadata and copy. Image policies "
+                 "are defined in `listing_api/image_policy.py`; image tokens are estimates.")
+    lines.append("")
+    lines.append("| Metric | " + " | ".join(names) + " |")
+    lines.append("|---|" + "---:|" * len(names))
+
+    def row(label: str, cells: list[str]) -> None:
+        lines.append(f"| {label} | " + " | ".join(cells) + " |")
+
+    def pct(stats: dict | None) -> str:
+        return f"{stats['mean']:.1%}" if stats and stats["n"] else "—"
+
+    usage = [s.get("usage") or {} for s in summaries]
+    row("items ok", [f"{s['n_ok']}/{s['n_total']}" for s in summaries])
+    row("**metadata macro accuracy**", [f"**{_macro(s.get('per_field', {})):.1%}**" for s in summaries])
+    for f in [f for grp in FIELD_GROUPS for f in grp[1]]:
+        if any(f in s.get("per_field", {}) for s in summaries):
+            row(f"`{f}`", [pct(s.get("per_field", {}).get(f)) for s in summaries])
+    if any(u.get("listing") for u in usage):
+        for f in COPY_FIELDS:
+            row(f"`{f}`", [pct(u.get("listing", {}).get(f)) for u in usage])
+    row("mean latency", [f"{u['mean_elapsed_ms']:.0f}ms" if u else "—" for u in usage])
+    row("model calls / item", [f"{u['mean_calls']:.2f}" if u else "—" for u in usage])
+    for k in ("input_tokens", "cached_input_tokens", "output_tokens", "image_tokens"):
+        row(f"{k.replace('_', ' ')} / item", [f"{u[f'mean_{k}']:.0f}" if u else "—" for u in usage])
+    roles = sorted({role for u in usage for role in u.get("mean_image_tokens_by_role") or {}})
+    for role in roles:
+        row(f"image tokens / item — `{role}`",
+            [f"{(u.get('mean_image_tokens_by_role') or {}).get(role, 0):.0f}" if u else "—" for u in usage])
+    lines.append("")
+
+    path.write_text("\n".join(lines))
+
+
 def main():
     if len(sys.argv) != 2:
         print("Usage: python -m listing_api.eval.report <results.json>")
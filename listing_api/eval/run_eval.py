@@ -7,12 +7,35 @@ Usage (from repo root, with Django env loaded):
   python -m listing_api.eval.run_eval --no-label         # exclude label.jpg from input
   python -m listing_api.eval.run_eval --limit 5          # first 5 items only
   python -m listing_api.eval.run_eval --items 001 003    # specific item IDs
+  python -m listing_api.eval.run_eval --copy-modes llm template auto
+                                                         # also score listing copy per copy_mode
+  python -m listing_api.eval.run_eval --passes two single
+                                                         # single- vs two-pass: accuracy, latency, tokens
+  python -m listing_api.eval.run_eval --image-policies uniform role_aware economy
+                                                         # per-role image encoding: accuracy vs tokens
 
 Each item is run through `listing_api.pipeline.run_pipeline` with embeddings
-disabled (we only score metadata). Results are written to:
+disabled (we only score metadata). With --copy-modes, listing copy is then
+generated from that same metadata once per mode and scored (see
+scoring.score_copy), so the template and LLM paths are compared on identical
+input.
+
+With --passes, each item is instead run through the full pipeline with copy
+on, once per pass: "two" is the analyzer call followed by the copy call,
+"single" asks the analyzer for both (pipeline single_pass). Metadata and copy
+are scored as usual.
+
+With --image-policies, each item is run once per image policy (see
+listing_api/image_policy.py: per-role image size, detail and label cropping).
+Combined with --passes, every pass runs under every policy.
+
+Every run records its latency, model calls and token usage (including the
+estimated image tokens per role), so variants are compared on accuracy and
+cost. Results are written to:
 
   listing_api/eval/results/{timestamp}_{mode}.json
   listing_api/eval/results/{timestamp}_{mode}.md   (via report.py)
+  listing_api/eval/results/{timestamp}_{mode}_compare.md   (with more than one variant)
 """
 
 from __future__ import annotations
@@ -32,17 +55,73 @@ import django  # noqa: E402
 django.setup()
 
 from listing_api.eval.dataset import EVAL_DIR, EvalItem, load_items  # noqa: E402
-from listing_api.eval.scoring import aggregate, score_item  # noqa: E402
+from listing_api.copy_generator import COPY_MODES, generate_listing_copy  # noqa: E402
+from listing_api.image_policy import POLICIES  # noqa: E402
+from listing_api.eval.scoring import aggregate, copy_agreement, score_copy, score_item  # noqa: E402
 from listing_api.pipeline import run_pipeline  # noqa: E402
 
 
 RESULTS_DIR = EVAL_DIR / "results"
 RESULTS_DIR.mkdir(exist_ok=True)
 
+PASSES = ("two", "single")
+
+
+def run_copy(predicted: dict, truth: dict, copy_modes: list[str]) -> dict:
+    """Generate and score listing copy for one item in each copy mode.
+
+    Returns {mode: {"listing", "source", "elapsed_ms", "scores", "agreement_with_llm"}}.
+    """
+    out: dict[str, dict] = {}
+    for mode in copy_modes:
+        t0 = time.time()
+        copy = generate_listing_copy(predicted, mode=mode)
+        copy.pop("_meta", None)
+        out[mode] = {
+            "listing": copy,
+            "source": copy.get("source"),
+            "elapsed_ms": int((time.time() - t0) * 1000),
+            "scores": score_copy(copy, truth),
+        }
+    llm = out.get("llm", {}).get("listing")
+    for mode, r in out.items():
+        r["agreement_with_llm"] = copy_agreement(r["listing"], llm) if mode != "llm" else None
+    return out
+
+
+def pipeline_usage(meta: dict) -> dict:
+    """Latency, model calls and tokens for one pipeline run, from its `_meta`."""
+    analyzer = meta.get("analyzer") or {}
+    copy = meta.get("copy_generator") or {}
+    copy_call = bool(copy) and copy.get("mode") != "single_pass" and copy.get("model") != "template"
+    image_tokens = analyzer.get("image_tokens") or {}
+    return {
+        "elapsed_ms": meta.get("elapsed_ms", 0),
+        "calls": 1 + int(copy_call),
+        "copy_mode": copy.get("mode"),
+        "image_tokens": image_tokens.get("total_tokens", 0),
+        "image_tokens_by_role": {
+            role: r["tokens"] for role, r in (image_tokens.get("by_role") or {}).items()
+        },
+        **{
+            k: analyzer.get(k, 0) + copy.get(k, 0)
+            for k in ("input_tokens", "cached_input_tokens", "output_tokens")
+        },
+    }
+
 
-def run_one(item: EvalItem, exclude_roles: set[str] | None = None) -> dict:
+def run_one(
+    item: EvalItem,
+    exclude_roles: set[str] | None = None,
+    copy_modes: list[str] | None = None,
+    single_pass: bool | None = None,
+    image_policy: str | None = None,
+) -> dict:
     """Run the pipeline on a single item and score it.
 
+    With `single_pass` set (True or False) copy is generated inside the
+    pipeline run and scored.
+
     Returns:
       {
         "item_id": ...,
@@ -50,6 +129,9 @@ def run_one(item: EvalItem, exclude_roles: set[str] | None = None) -> dict:
         "elapsed_ms": int,
         "predicted": <pipeline metadata>,
         "scores": {field: 0.0-1.0 | None},
+        "copy": {mode: {...}} (with copy_modes, see run_copy),
+        "listing": <pipeline listing>, "listing_scores": {...} (with single_pass set),
+        "usage": {...} (see pipeline_usage),
         "error": str (if not ok)
       }
     """
@@ -70,18 +152,31 @@ def run_one(item: EvalItem, exclude_roles: set[str] | None = None) -> dict:
         result = run_pipeline(
             images=images,
             include_embeddings=False,  # eval scores metadata only
-            include_copy=False,        # skip copy gen (saves ~5s/item)
+            # Copy gen is skipped (saves ~5s/item) unless comparing passes,
+            # where the copy call is part of what's measured.
+            include_copy=single_pass is not None,
+            single_pass=bool(single_pass),
+            image_policy=image_policy,
         )
         predicted = result.get("metadata", {})
         image_roles = {img.role for img in images}
         scores = score_item(predicted, item.ground_truth, image_roles=image_roles)
-        return {
+        elapsed_ms = int((time.time() - t0) * 1000)
+        out = {
             "item_id": item.item_id,
             "ok": True,
-            "elapsed_ms": int((time.time() - t0) * 1000),
+            "elapsed_ms": elapsed_ms,
             "predicted": predicted,
             "scores": scores,
         }
+        out["usage"] = pipeline_usage(result.get("_meta", {}))
+        if single_pass is not None:
+            listing = result.get("listing") or {}
+            out["listing"] = listing
+            out["listing_scores"] = score_copy(listing, item.ground_truth)
+        if copy_modes:
+            out["copy"] = run_copy(predicted, item.ground_truth, copy_modes)
+        return out
     except Exception as e:
         return {
             "item_id": item.item_id,
@@ -93,13 +188,67 @@ def run_one(item: EvalItem, exclude_roles: set[str] | None = None) -> dict:
         }
 
 
-def run(items: list[EvalItem], mode: str, exclude_roles: set[str] | None = None) -> dict:
+def summarize_copy(per_item: list[dict], copy_modes: list[str]) -> dict:
+    """Per copy mode: field means, latency, how often the template was used,
+    and tag agreement with the LLM copy."""
+    out: dict[str, dict] = {}
+    for mode in copy_modes:
+        runs = [r["copy"][mode] for r in per_item if r["ok"] and mode in r.get("copy", {})]
+        if not runs:
+            continue
+        agreement = [r["agreement_with_llm"] for r in runs if r["agreement_with_llm"] is not None]
+        out[mode] = {
+            "per_field": aggregate([r["scores"] for r in runs]),
+            "n": len(runs),
+            "mean_elapsed_ms": sum(r["elapsed_ms"] for r in runs) / len(runs),
+            "template_share": sum(1 for r in runs if r["source"] == "template") / len(runs),
+            "fallback_share": sum(1 for r in runs if r["source"] == "template_fallback") / len(runs),
+            "agreement_with_llm": (sum(agreement) / len(agreement)) if agreement else None,
+        }
+    return out
+
+
+def summarize_usage(per_item: list[dict]) -> dict | None:
+    """Per-item means of pipeline latency, model calls and tokens (image
+    tokens also per role), plus copy scores when copy was generated."""
+    runs = [r for r in per_item if r["ok"] and "usage" in r]
+    if not runs:
+        return None
+    usage = [r["usage"] for r in runs]
+    out = {
+        f"mean_{k}": sum(u[k] for u in usage) / len(usage)
+        for k in ("elapsed_ms", "calls", "input_tokens", "cached_input_tokens", "output_tokens", "image_tokens")
+    }
+    out["n"] = len(runs)
+    roles = sorted({role for u in usage for role in u["image_tokens_by_role"]})
+    out["mean_image_tokens_by_role"] = {
+        role: sum(u["image_tokens_by_role"].get(role, 0) for u in usage) / len(usage) for role in roles
+    }
+    # Single-pass runs where the copy had to come from the copy call after all.
+    out["copy_call_share"] = sum(1 for u in usage if u["calls"] > 1) / len(usage)
+    scored = [r["listing_scores"] for r in runs if "listing_scores" in r]
+    out["listing"] = aggregate(scored) if scored else {}
+    return out
+
+
+def run(
+    items: list[EvalItem],
+    mode: str,
+    exclude_roles: set[str] | None = None,
+    copy_modes: list[str] | None = None,
+    single_pass: bool | None = None,
+    image_policy: str | None = None,
+    variant: str | None = None,
+) -> dict:
     """Run all items, aggregate, and persist results."""
     print(f"\n=== eval mode={mode} | {len(items)} items ===")
     per_item: list[dict] = []
     for i, item in enumerate(items, 1):
         print(f"  [{i}/{len(items)}] {item.item_id} ... ", end="", flush=True)
-        r = run_one(item, exclude_roles=exclude_roles)
+        r = run_one(
+            item, exclude_roles=exclude_roles, copy_modes=copy_modes,
+            single_pass=single_pass, image_policy=image_policy,
+        )
         per_item.append(r)
         if r["ok"]:
             mean = [v for v in r["scores"].values() if v is not None]
@@ -118,6 +267,11 @@ def run(items: list[EvalItem], mode: str, exclude_roles: set[str] | None = None)
         "n_ok": n_ok,
         "n_fail": n_fail,
         "per_field": agg,
+        "copy": summarize_copy(per_item, copy_modes) if copy_modes else None,
+        "variant": variant,
+        "passes": None if single_pass is None else ("single" if single_pass else "two"),
+        "image_policy": image_policy,
+        "usage": summarize_usage(per_item),
         "items": per_item,
         "ground_truth_by_id": {it.item_id: it.ground_truth for it in items},
         "generated_at": datetime.now().isoformat(timespec="seconds"),
@@ -137,6 +291,35 @@ def run(items: list[EvalItem], mode: str, exclude_roles: set[str] | None = None)
     return summary
 
 
+def run_variants(
+    items: list[EvalItem],
+    mode: str,
+    passes: list[str] | None = None,
+    policies: list[str] | None = None,
+    exclude_roles: set[str] | None = None,
+    copy_modes: list[str] | None = None,
+) -> list[dict]:
+    """`run` once per pass x image policy (once, as before, with neither);
+    with more than one variant, also write a side-by-side comparison."""
+    summaries = []
+    for p in passes or [None]:
+        for policy in policies or [None]:
+            parts = ([f"{p} pass"] if p else []) + ([policy] if policy else [])
+            suffix = "".join(f"_{part.replace(' ', '_')}" for part in parts)
+            summaries.append(run(
+                items, mode=f"{mode}{suffix}", exclude_roles=exclude_roles, copy_modes=copy_modes,
+                single_pass=None if p is None else p == "single", image_policy=policy,
+                variant=" / ".join(parts) or None,
+            ))
+    if len(summaries) > 1:
+        from listing_api.eval.report import write_comparison
+        ts = datetime.now().strftime("%Y%m%d-%H%M%S")
+        md_path = RESULTS_DIR / f"{ts}_{mode}_compare.md"
+        write_comparison(summaries, md_path, title=mode)
+        print(f"→ wrote {md_path}")
+    return summaries
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--limit", type=int, default=None, help="Run only first N items")
@@ -144,6 +327,13 @@ def main():
     ap.add_argument("--no-label", action="store_true", help="Exclude care-label photos from input")
     ap.add_argument("--dual", action="store_true",
                     help="Run twice: with-label AND without-label, output both reports")
+    ap.add_argument("--copy-modes", nargs="+", default=None, choices=COPY_MODES,
+                    help="Also generate and score listing copy in these copy modes")
+    ap.add_argument("--passes", nargs="+", default=None, choices=PASSES,
+                    help="Run with copy on, once per pass (two = analyzer + copy call, "
+                         "single = one call), and compare accuracy, latency and tokens")
+    ap.add_argument("--image-policies", nargs="+", default=None, choices=list(POLICIES),
+                    help="Run once per image policy and compare accuracy, image tokens and latency")
     args = ap.parse_args()
 
     items = load_items()
@@ -159,13 +349,14 @@ def main():
     if args.limit:
         items = items[: args.limit]
 
+    variants = {"passes": args.passes, "policies": args.image_policies, "copy_modes": args.copy_modes}
     if args.dual:
-        run(items, mode="with_label")
-        run(items, mode="without_label", exclude_roles={"label"})
+        run_variants(items, "with_label", **variants)
+        run_variants(items, "without_label", exclude_roles={"label"}, **variants)
     elif args.no_label:
-        run(items, mode="without_label", exclude_roles={"label"})
+        run_variants(items, "without_label", exclude_roles={"label"}, **variants)
     else:
-        run(items, mode="with_all")
+        run_variants(items, "with_all", **variants)
 
 
 if __name__ == "__main__":
@@ -274,3 +274,94 @@ def aggregate(per_item_scores: list[dict[str, float | None]]) -> dict[str, dict]
             "missing": missing,
         }
     return out
+
+
+# ---------------------------------------------------------------------------
+# Listing copy
+#
+# There is no ground-truth prose, so copy is scored on what can be checked:
+# does it state the item's known facts, are the tags searchable for them,
+# and does it follow the house format. Both copy paths see the same
+# predicted metadata (run_eval generates every mode from one analyzer run),
+# so differences come from the copy writer alone.
+# ---------------------------------------------------------------------------
+COPY_FIELDS = ["copy_title_facts", "copy_description_facts", "copy_tag_recall", "copy_format"]
+
+
+def _words(text: Any) -> str:
+    """Lowercase, punctuation and hyphens to spaces, padded for whole-word search."""
+    cleaned = "".join(c if c.isalnum() else " " for c in _norm(text))
+    return f" {' '.join(cleaned.split())} "
+
+
+def _mentions(text: str, value: Any) -> bool:
+    phrase = _words(value).strip()
+    return bool(phrase) and f" {phrase} " in _words(text)
+
+
+def _tag_token(value: Any) -> str:
+    return "-".join(_words(value).split())
+
+
+def _copy_facts(truth: dict, keys: list[str]) -> list[str]:
+    facts = []
+    for key in keys:
+        value = truth.get(key)
+        if not value or not str(value).strip():
+            continue
+        if key == "brand":
+            value, _ = taxonomy.normalize_brand(str(value))
+        elif key == "subcategory" and _norm(value).startswith("other "):
+            continue  # a bucket, not something the copy should say
+        elif key == "condition":
+            value = str(value).replace("_", " ")
+        if _norm(value):
+            facts.append(str(value))
+    return facts
+
+
+def _fact_recall(text: str, facts: list[str]) -> float | None:
+    if not facts:
+        return None
+    return sum(1 for f in facts if _mentions(text, f)) / len(facts)
+
+
+def score_copy(listing: dict | None, truth: dict) -> dict[str, float | None]:
+    """Score generated listing copy against an item's ground truth."""
+    listing = listing or {}
+    title = listing.get("title") or ""
+    description = listing.get("description") or ""
+    tags = {_tag_token(t) for t in listing.get("tags") or []}
+
+    tag_truth = set()
+    for key in ("brand", "category", "subcategory", "primary_color", "pattern", "primary_material"):
+        tag_truth.update(_tag_token(f) for f in _copy_facts(truth, [key]))
+    for key in ("silhouette", "style_tags"):
+        tag_truth.update(_tag_token(v) for v in truth.get(key) or [] if str(v).strip())
+    tag_truth.discard("")
+
+    sentences = [x for x in description.replace("!", ".").replace("?", ".").split(".") if x.strip()]
+    return {
+        "copy_title_facts": _fact_recall(
+            title, _copy_facts(truth, ["brand", "subcategory", "primary_color", "primary_material"])
+        ),
+        "copy_description_facts": _fact_recall(
+            description, _copy_facts(truth, ["brand", "subcategory", "primary_color", "primary_material", "condition"])
+        ),
+        "copy_tag_recall": (len(tags & tag_truth) / len(tag_truth)) if tag_truth else None,
+        "copy_format": (
+            (1.0 if 0 < len(title) <= 80 else 0.0)
+            + (1.0 if 15 <= len(tags) <= 25 else 0.0)
+            + (1.0 if 3 <= len(sentences) <= 5 else 0.0)
+        ) / 3,
+    }
+
+
+def copy_agreement(listing: dict | None, reference: dict | None) -> float | None:
+    """Tag-set Jaccard between two copies of the same item (e.g. template vs LLM)."""
+    if not listing or not reference:
+        return None
+    return _jaccard(
+        {_tag_token(t) for t in listing.get("tags") or []},
+        {_tag_token(t) for t in reference.get("tags") or []},
+    )
@@ -0,0 +1,133 @@
+"""Per-role image encoding for the vision call.
+
+Every image used to go to the model as a <=1024px JPEG with the provider's
+default ("auto") detail, whatever its role. Roles don't need the same
+resolution: a care label is small text that needs every pixel it can get,
+while a back or on-body shot only has to show silhouette and fit, which low
+detail (one 512px view, a flat 85 tokens) already does.
+
+A policy maps each role to a `RolePolicy`:
+
+  max_side   longest side of the JPEG sent (see preprocess.prepare_image)
+  detail     the image_url `detail` sent to the model: "low" | "high" | "auto"
+  crop_label crop to the text region first (preprocess.label_crop_box), so
+             the label's tiles are spent on the label, not the sleeve it
+             is sewn into
+
+Policies:
+
+  "uniform"    the previous behaviour: 1024px, "auto", no cropping
+  "role_aware" high detail (and cropping) for labels, high for front / detail
+               / damage, low at 512px for back and worn
+  "economy"    low detail at 512px everywhere except a cropped, high-detail
+               label
+
+LISTING_IMAGE_POLICY picks the default; an unknown name fails at import.
+`python -m listing_api.eval.run_eval --image-policies uniform role_aware
+economy` shows what each costs in accuracy, input tokens and latency.
+
+Token counts here are estimates from the provider's published tiling rule
+(`estimate_tokens`), per image, before the request is sent; the actual total
+is still `input_tokens` in the analyzer's `_meta`.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from dataclasses import dataclass
+
+from .preprocess import VISION_MAX_SIDE
+
+
+@dataclass(frozen=True)
+class RolePolicy:
+    max_side: int = VISION_MAX_SIDE
+    detail: str = "auto"
+    crop_label: bool = False
+
+
+_LOW = RolePolicy(max_side=512, detail="low")
+_HIGH = RolePolicy(max_side=VISION_MAX_SIDE, detail="high")
+_LABEL = RolePolicy(max_side=1536, detail="high", crop_label=True)
+
+# Roles not listed fall back to the policy's "*" entry.
+POLICIES: dict[str, dict[str, RolePolicy]] = {
+    "uniform": {"*": RolePolicy()},
+    "role_aware": {
+        "*": _HIGH,
+        "label": _LABEL,
+        "back": _LOW,
+        "worn": _LOW,
+    },
+    "economy": {
+        "*": _LOW,
+        "label": RolePolicy(max_side=VISION_MAX_SIDE, detail="high", crop_label=True),
+    },
+}
+
+IMAGE_POLICY = os.getenv("LISTING_IMAGE_POLICY", "uniform")
+# Checked here rather than per request, so a typo stops the worker from
+# booting instead of failing every analysis that uses the default.
+if IMAGE_POLICY not in POLICIES:
+    raise RuntimeError(
+        f"LISTING_IMAGE_POLICY='{IMAGE_POLICY}' is not an image policy (allowed: {', '.join(POLICIES)})"
+    )
+
+
+def get_policy(name: str | None = None) -> tuple[str, dict[str, RolePolicy]]:
+    """(name, role table) for `name`, default LISTING_IMAGE_POLICY."""
+    name = name or IMAGE_POLICY
+    if name not in POLICIES:
+        raise ValueError(f"unknown image policy '{name}' (allowed: {', '.join(POLICIES)})")
+    return name, POLICIES[name]
+
+
+def for_role(name: str | None, role: str | None) -> RolePolicy:
+    _, table = get_policy(name)
+    return table.get(role or "front", table["*"])
+
+
+# ---------------------------------------------------------------------------
+# Token estimates
+# ---------------------------------------------------------------------------
+LOW_DETAIL_TOKENS = 85
+TILE_TOKENS = 170
+TILE_SIDE = 512
+
+
+def estimate_tokens(size: tuple[int, int], detail: str) -> int:
+    """Input tokens for one image of `size` at `detail`.
+
+    Low detail is a flat 85. High detail fits the image in 2048x2048, scales
+    the shortest side down to 768, then charges 170 per 512px tile plus 85.
+    "auto" is counted as high: for images of the sizes we send, that is what
+    the provider picks.
+    """
+    if detail == "low":
+        return LOW_DETAIL_TOKENS
+    w, h = size
+    if not w or not h:
+        return 0
+    scale = min(1.0, 2048 / max(w, h))
+    w, h = w * scale, h * scale
+    scale = min(1.0, 768 / min(w, h))
+    w, h = w * scale, h * scale
+    tiles = math.ceil(w / TILE_SIDE) * math.ceil(h / TILE_SIDE)
+    return TILE_TOKENS * tiles + LOW_DETAIL_TOKENS
+
+
+def tokens_by_role(prepared) -> dict:
+    """Per-role image count, estimated image tokens and preprocess time.
+
+    Returns {"total_tokens": int, "by_role": {role: {"images", "tokens", "preprocess_ms"}}}.
+    """
+    by_role: dict[str, dict] = {}
+    for p in prepared:
+        entry = by_role.setdefault(p.role, {"images": 0, "tokens": 0, "preprocess_ms": 0.0})
+        entry["images"] += 1
+        entry["tokens"] += p.tokens
+        entry["preprocess_ms"] = round(
+            entry["preprocess_ms"] + sum(v for k, v in p.timings.items() if k.endswith("_ms")), 2
+        )
+    return {"total_tokens": sum(e["tokens"] for e in by_role.values()), "by_role": by_role}
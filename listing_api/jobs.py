@@ -0,0 +1,252 @@
+"""Background execution of asynchronous /jobs submissions.
+
+POST /api/v1/jobs/ persists the upload as an AnalysisJob and returns at once.
+The job id is handed to a small in-process worker pool which runs the
+pipeline, stores the client-facing result on the job, and — if the client
+gave a `webhook_url` — POSTs the result there, signed with the key's
+`webhook_secret`:
+
+  X-Listing-Signature: t=<unix ts>,v1=<hex HMAC-SHA256 of "<ts>.<body>">
+
+Clients can always fall back to polling GET /api/v1/jobs/{id}/.
+
+Webhook hosts must resolve only to public addresses (`webhook_url_error`),
+checked when the job is created and again before every delivery attempt, so
+an API key can't aim the server at its own loopback, link-local metadata
+endpoint or private network. Redirects are not followed.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from . import metrics
+from .analyzer import AnalyzerError, ImageInput
+from .models import AnalysisJob
+from .responses import analysis_body, job_body
+from .result_cache import run_pipeline_cached
+from .usage import log_request
+from .vector_index import index_result
+
+JOB_WORKERS = int(os.getenv("LISTING_JOB_WORKERS", "2"))
+WEBHOOK_TIMEOUT = 10
+WEBHOOK_MAX_ATTEMPTS = 3
+# A job still "running" after this long belonged to a worker that died.
+STALE_RUNNING_AFTER = timedelta(minutes=10)
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="listing-job")
+_resumed = False
+_resume_lock = threading.Lock()
+
+
+def enqueue(job_id) -> None:
+    """Hand a persisted job to the worker pool."""
+    _executor.submit(_run_job, job_id)
+
+
+def resume_pending_jobs() -> int:
+    """Re-enqueue jobs orphaned by a previous process (restart/deploy).
+
+    Called by each gunicorn worker at boot (gunicorn.conf.py post_worker_init)
+    and, as a fallback for other servers, by the first job submission. Runs at
+    most once per process, then keeps sweeping every STALE_RUNNING_AFTER in a
+    daemon thread: a job the dead process had only just started is not stale
+    yet at boot. Returns the number of jobs re-enqueued by the first sweep.
+    """
+    global _resumed
+    with _resume_lock:
+        if _resumed:
+            return 0
+        _resumed = True
+
+    threading.Thread(target=_sweep_forever, name="listing-job-sweep", daemon=True).start()
+    return _requeue_orphans()
+
+
+def _sweep_forever() -> None:
+    while True:
+        time.sleep(STALE_RUNNING_AFTER.total_seconds())
+        try:
+            _requeue_orphans()
+        except Exception as e:
+            print(f"[listing_api.jobs] orphan sweep failed: {e}")
+        finally:
+            close_old_connections()
+
+
+def _requeue_orphans() -> int:
+    stale = timezone.now() - STALE_RUNNING_AFTER
+    AnalysisJob.objects.filter(
+        status=AnalysisJob.STATUS_RUNNING, started_at__lt=stale
+    ).update(status=AnalysisJob.STATUS_QUEUED)
+    pending = list(
+        AnalysisJob.objects.filter(status=AnalysisJob.STATUS_QUEUED)
+        .order_by("created_at")
+        .values_list("pk", flat=True)
+    )
+    for job_id in pending:
+        enqueue(job_id)
+    return len(pending)
+
+
+def _run_job(job_id) -> None:
+    close_old_connections()
+    try:
+        # Claim the job; if another worker already took it, do nothing.
+        claimed = AnalysisJob.objects.filter(
+            pk=job_id, status=AnalysisJob.STATUS_QUEUED
+        ).update(status=AnalysisJob.STATUS_RUNNING, started_at=timezone.now())
+        if not claimed:
+            return
+        job = AnalysisJob.objects.select_related("api_key").get(pk=job_id)
+        images = [
+            # BinaryField comes back as bytes or a memoryview; both go
+            # straight to preprocess without another copy.
+            ImageInput(bytes_data=img.data, role=img.role, filename=img.filename)
+            for img in job.images.all()
+        ]
+        _execute(job, images)
+        if job.webhook_url:
+            deliver_webhook(job)
+    except Exception as e:
+        print(f"[listing_api.jobs] job {job_id} crashed: {e}")
+    finally:
+        close_old_connections()
+
+
+def _execute(job: AnalysisJob, images: list[ImageInput]) -> None:
+    try:
+        with metrics.bind(job.api_key):
+            result = run_pipeline_cached(
+                images,
+                hint=job.hint or None,
+                include_embeddings=job.include_embeddings,
+                include_copy=job.include_copy,
+                dedupe=job.dedupe,
+                owner_id=job.api_key_id,
+                copy_mode=job.copy_mode,
+            )
+    except AnalyzerError as e:
+        _finish(job, AnalysisJob.STATUS_FAILED, error_code="analysis_failed", error_message=str(e))
+        log_request(job.api_key, source="api", images=images, success=False, error=str(e))
+        return
+    except Exception as e:
+        _finish(job, AnalysisJob.STATUS_FAILED, error_code="internal_error", error_message="internal error")
+        log_request(job.api_key, source="api", images=images, success=False, error=str(e))
+        return
+
+    analysis_id = uuid.uuid4()
+    _finish(
+        job,
+        AnalysisJob.STATUS_SUCCEEDED,
+        result=analysis_body(
+            result, image_count=len(images), analysis_id=analysis_id, embedding_format=job.embedding_format
+        ),
+    )
+    log_request(
+        job.api_key,
+        source="api",
+        images=images,
+        success=True,
+        include_embeddings=job.include_embeddings,
+        result=result,
+        analysis_id=analysis_id,
+    )
+    index_result(analysis_id, job.api_key, result)
+
+
+def _finish(job: AnalysisJob, status: str, result=None, error_code: str = "", error_message: str = "") -> None:
+    job.status = status
+    job.result = result
+    job.error_code = error_code
+    job.error_message = error_message[:2000]
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "result", "error_code", "error_message", "finished_at"])
+    # The upload is no longer needed once the job has an outcome.
+    job.images.all().delete()
+
+
+# ---------------------------------------------------------------------------
+# Webhooks
+# ---------------------------------------------------------------------------
+def sign_payload(secret: str, body: bytes, timestamp: int) -> str:
+    """Return the X-Listing-Signature header value for a webhook body."""
+    mac = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256)
+    return f"t={timestamp},v1={mac.hexdigest()}"
+
+
+def webhook_url_error(url: str) -> str | None:
+    """Why `url` can't be used as a webhook, or None if it can."""
+    allowed = ("https", "http") if settings.DEBUG else ("https",)
+    parts = urlsplit(url)
+    if parts.scheme not in allowed or not parts.hostname or len(url) > 500:
+        return "webhook_url must be an https:// URL (max 500 chars)"
+    try:
+        infos = socket.getaddrinfo(parts.hostname, parts.port or 443, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError, ValueError):
+        return f"webhook_url host '{parts.hostname}' does not resolve"
+    for info in infos:
+        addr = ipaddress.ip_address(info[4][0].split("%", 1)[0])
+        if not addr.is_global or addr.is_multicast:
+            # loopback, link-local (cloud metadata), private, reserved ...
+            return "webhook_url must point at a public address"
+    return None
+
+
+def deliver_webhook(job: AnalysisJob) -> bool:
+    """POST the job outcome to its webhook_url, retrying with backoff.
+
+    Returns True if the receiver answered 2xx.
+    """
+    import requests
+
+    body = json.dumps({"event": "job.completed", "job": job_body(job)}).encode()
+    secret = job.api_key.webhook_secret if job.api_key else ""
+
+    for attempt in range(1, WEBHOOK_MAX_ATTEMPTS + 1):
+        ts = int(time.time())
+        try:
+            # Re-checked per attempt: DNS can change after the job was accepted.
+            error = webhook_url_error(job.webhook_url)
+            if error:
+                raise ValueError(error)
+            resp = requests.post(
+                job.webhook_url,
+                data=body,
+                headers={
+                    "Content-Type": "application/json",
+                    "X-Listing-Event": "job.completed",
+                    "X-Listing-Signature": sign_payload(secret, body, ts),
+                },
+                timeout=WEBHOOK_TIMEOUT,
+                allow_redirects=False,
+            )
+            ok = 200 <= resp.status_code < 300
+        except Exception as e:
+            print(f"[listing_api.jobs] webhook attempt {attempt} for {job.pk} failed: {e}")
+            ok = False
+
+        AnalysisJob.objects.filter(pk=job.pk).update(
+            webhook_attempts=attempt,
+            webhook_delivered_at=timezone.now() if ok else None,
+        )
+        if ok:
+            return True
+        if attempt < WEBHOOK_MAX_ATTEMPTS:
+            time.sleep(2 ** attempt)
+    return False
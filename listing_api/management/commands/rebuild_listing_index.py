@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from listing_api.models import AnalysisRequest
+from listing_api.vector_index import SPACES, get_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the listing similarity-search index files from stored AnalysisRequest embeddings"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--if-missing",
+            action="store_true",
+            help="Only rebuild spaces whose index file doesn't exist yet (run at container start)",
+        )
+
+    def handle(self, *args, **options):
+        for space in SPACES:
+            index = get_index(space)
+            if options["if_missing"] and index.path.exists():
+                self.stdout.write(f"rebuild_listing_index: {space} — {len(index)} vectors on disk, skipped")
+                continue
+            field = f"{space}_embedding"
+            rows = (
+                AnalysisRequest.objects.filter(**{f"{field}__isnull": False})
+                .order_by("created_at")
+                .values_list("analysis_id", "api_key_id", field)
+            )
+            records = [(analysis_id, owner_id, bytes(raw)) for analysis_id, owner_id, raw in rows.iterator() if raw]
+            count = index.write_all(records)
+            self.stdout.write(self.style.SUCCESS(f"rebuild_listing_index: {space} — {count} vectors"))
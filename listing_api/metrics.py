@@ -0,0 +1,197 @@
+"""In-process latency histograms and the Prometheus text exposition behind /metrics.
+
+Stages are timed with `trace()`:
+
+    with metrics.trace("normalize", model=chosen_model):
+        normalized = _normalize(parsed)
+
+or recorded directly with `observe()` when the duration is already known
+(per-image decode timings, the shared OpenAI client's queue/model split).
+Every observation lands in `listing_stage_duration_seconds{stage, model,
+api_key}`; a trace that raises also bumps `listing_stage_errors_total`.
+
+The `api_key` label comes from `bind()`, which the request entry points
+(/analyze, batch, jobs, demo) wrap around the pipeline. It is a context
+variable, so code submitted to a pool must be run in a copied context
+(`submit(contextvars.copy_context().run, fn, ...)`) to keep the label.
+
+Registries are per process. Under gunicorn each worker exposes its own
+numbers, so scrape every worker (or aggregate by `instance`) rather than
+reading one as the whole.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds. Covers sub-millisecond normalization up to a slow vision call.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0)
+
+_labels: contextvars.ContextVar[dict] = contextvars.ContextVar("listing_metrics_labels", default={})
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics)."""
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: dict[tuple[str, tuple], Histogram] = {}
+        self._counters: dict[tuple[str, tuple], float] = {}
+        self._help: dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+
+    def observe(self, name: str, value: float, labels: dict) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram()
+            hist.observe(value)
+
+    def inc(self, name: str, labels: dict, amount: float = 1) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            histograms = sorted(
+                (k, list(h.counts), h.count, h.sum, h.buckets) for k, h in self._histograms.items()
+            )
+            counters = sorted(self._counters.items())
+
+        lines: list[str] = []
+        seen: set[str] = set()
+
+        def _header(name: str, kind: str) -> None:
+            if name in seen:
+                return
+            seen.add(name)
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), counts, count, total, buckets in histograms:
+            _header(name, "histogram")
+            for bound, n in zip(buckets, counts):
+                lines.append(f"{name}_bucket{_fmt_labels(labels, ('le', _fmt_float(bound)))} {n}")
+            lines.append(f"{name}_bucket{_fmt_labels(labels, ('le', '+Inf'))} {count}")
+            lines.append(f"{name}_sum{_fmt_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_fmt_labels(labels)} {count}")
+        for (name, labels), value in counters:
+            _header(name, "counter")
+            lines.append(f"{name}{_fmt_labels(labels)} {_fmt_float(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _fmt_float(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(v)
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(labels: tuple, extra: tuple | None = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = "listing_stage_duration_seconds"
+STAGE_ERRORS = "listing_stage_errors_total"
+REGISTRY.describe(STAGE_SECONDS, "Wall time per pipeline stage.")
+REGISTRY.describe(STAGE_ERRORS, "Pipeline stages that raised.")
+
+
+# ---------------------------------------------------------------------------
+# Recording
+# ---------------------------------------------------------------------------
+def key_label(api_key) -> str:
+    """Label value for an APIKey (its pk) or a fixed source name."""
+    if api_key is None:
+        return ""
+    if isinstance(api_key, str):
+        return api_key
+    return str(getattr(api_key, "pk", api_key))
+
+
+@contextmanager
+def bind(api_key=None):
+    """Attach an api_key label to every stage recorded inside the block."""
+    token = _labels.set({**_labels.get(), "api_key": key_label(api_key)})
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+
+def _stage_labels(stage: str, model: str | None) -> dict:
+    return {"stage": stage, "model": model or "", "api_key": _labels.get().get("api_key", "")}
+
+
+def observe(stage: str, seconds: float, model: str | None = None) -> None:
+    REGISTRY.observe(STAGE_SECONDS, seconds, _stage_labels(stage, model))
+
+
+def observe_client_call(stage: str, call_metrics: dict, model: str | None = None) -> None:
+    """Split an OpenAI call into `<stage>_queue` and `<stage>_model` from
+    ai_config.last_call_metrics(): waiting for a slot vs. the model itself."""
+    if not call_metrics:
+        return
+    observe(f"{stage}_queue", call_metrics.get("queue_ms", 0) / 1000, model)
+    observe(f"{stage}_model", call_metrics.get("model_ms", 0) / 1000, model)
+
+
+@contextmanager
+def trace(stage: str, model: str | None = None):
+    """Time the block as `stage`; errors are counted and re-raised."""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        REGISTRY.inc(STAGE_ERRORS, _stage_labels(stage, model))
+        raise
+    finally:
+        observe(stage, time.perf_counter() - started, model)
+
+
+# ---------------------------------------------------------------------------
+# Exposition
+# ---------------------------------------------------------------------------
+# /metrics is disabled (404) until this is set; scrapers send it as a bearer token.
+METRICS_TOKEN = os.getenv("LISTING_METRICS_TOKEN", "")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def render() -> str:
+    return REGISTRY.render()
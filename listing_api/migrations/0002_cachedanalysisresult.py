@@ -0,0 +1,29 @@
+# Generated by Django 6.0.4 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listing_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CachedAnalysisResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('result', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('last_hit_at', models.DateTimeField(db_index=True)),
+                ('hit_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Cached Analysis Result',
+                'verbose_name_plural': 'Cached Analysis Results',
+            },
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 6.0.4 on 2026-10-18 10:41
+
+import django.db.models.deletion
+import listing_api.models
+import uuid
+from django.db import migrations, models
+
+
+def populate_webhook_secrets(apps, schema_editor):
+    # A callable default is evaluated once for AddField, so existing keys would
+    # all share one secret. Give each key its own.
+    APIKey = apps.get_model('listing_api', 'APIKey')
+    for api_key in APIKey.objects.all():
+        api_key.webhook_secret = listing_api.models.generate_webhook_secret()
+        api_key.save(update_fields=['webhook_secret'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listing_api', '0002_cachedanalysisresult'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apikey',
+            name='webhook_secret',
+            field=models.CharField(default=listing_api.models.generate_webhook_secret, max_length=80),
+        ),
+        migrations.RunPython(populate_webhook_secrets, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='AnalysisJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], db_index=True, default='queued', max_length=20)),
+                ('hint', models.TextField(blank=True, default='')),
+                ('include_embeddings', models.BooleanField(default=True)),
+                ('include_copy', models.BooleanField(default=True)),
+                ('webhook_url', models.URLField(blank=True, default='', max_length=500)),
+                ('webhook_attempts', models.IntegerField(default=0)),
+                ('webhook_delivered_at', models.DateTimeField(blank=True, null=True)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('error_code', models.CharField(blank=True, default='', max_length=40)),
+                ('error_message', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('api_key', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='listing_api.apikey')),
+            ],
+            options={
+                'verbose_name': 'Analysis Job',
+                'verbose_name_plural': 'Analysis Jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AnalysisJobImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.IntegerField(default=0)),
+                ('role', models.CharField(default='front', max_length=20)),
+                ('filename', models.CharField(blank=True, default='', max_length=255)),
+                ('data', models.BinaryField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='listing_api.analysisjob')),
+            ],
+            options={
+                'ordering': ['position'],
+            },
+        ),
+    ]
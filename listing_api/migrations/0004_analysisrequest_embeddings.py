@@ -0,0 +1,42 @@
+# Generated by Django 6.0.4 on 2026-10-18 13:27
+
+import uuid
+from django.db import migrations, models
+
+
+def populate_analysis_ids(apps, schema_editor):
+    AnalysisRequest = apps.get_model('listing_api', 'AnalysisRequest')
+    for row in AnalysisRequest.objects.filter(analysis_id__isnull=True).only('pk'):
+        row.analysis_id = uuid.uuid4()
+        row.save(update_fields=['analysis_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listing_api', '0003_analysisjob_apikey_webhook_secret'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisrequest',
+            name='analysis_id',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(populate_analysis_ids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='analysisrequest',
+            name='analysis_id',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AddField(
+            model_name='analysisrequest',
+            name='text_embedding',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='analysisrequest',
+            name='image_embedding',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.4 on 2026-10-18 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listing_api', '0004_analysisrequest_embeddings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisrequest',
+            name='cached_input_tokens',
+            field=models.IntegerField(default=0),
+        ),
+    ]
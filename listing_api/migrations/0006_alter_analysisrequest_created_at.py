@@ -0,0 +1,19 @@
+# Generated by Django 6.0.4 on 2026-10-18 16:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listing_api', '0005_analysisrequest_cached_input_tokens'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='analysisrequest',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.4 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listing_api', '0006_alter_analysisrequest_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisrequest',
+            name='perceptual_hash',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='analysisrequest',
+            name='result_key',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.4 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listing_api', '0007_analysisrequest_perceptual_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisjob',
+            name='copy_mode',
+            field=models.CharField(default='llm', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='analysisjob',
+            name='embedding_format',
+            field=models.CharField(default='float', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='analysisjob',
+            name='dedupe',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,11 +1,17 @@
 from django.db import models
+from django.utils import timezone
 import secrets
+import uuid
 
 
 def generate_api_key() -> str:
     return f"sk_live_{secrets.token_urlsafe(32)}"
 
 
+def generate_webhook_secret() -> str:
+    return f"whsec_{secrets.token_urlsafe(32)}"
+
+
 class APIKey(models.Model):
     """API key issued to a B2B customer (resale platform).
 
@@ -20,6 +26,7 @@ class APIKey(models.Model):
     is_active = models.BooleanField(default=True)
     rate_limit_per_minute = models.IntegerField(default=30)
     rate_limit_per_day = models.IntegerField(default=5000)
+    webhook_secret = models.CharField(max_length=80, default=generate_webhook_secret)
     created_at = models.DateTimeField(auto_now_add=True)
     last_used_at = models.DateTimeField(null=True, blank=True)
 
@@ -47,16 +54,30 @@ class AnalysisRequest(models.Model):
         blank=True,
         related_name="requests",
     )
+    # Public id returned to clients; used to search by a prior analysis.
+    analysis_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default="api")
     image_count = models.IntegerField(default=0)
     processing_time_ms = models.IntegerField(default=0)
     model_used = models.CharField(max_length=80, blank=True, default="")
     input_tokens = models.IntegerField(default=0)
+    # Part of input_tokens served from the provider's prompt prefix cache.
+    cached_input_tokens = models.IntegerField(default=0)
     output_tokens = models.IntegerField(default=0)
     embeddings_included = models.BooleanField(default=True)
     success = models.BooleanField(default=True)
     error_message = models.TextField(blank=True, default="")
-    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # float32 little-endian vectors (same layout as embeddings.embed_text_bytes);
+    # the source of truth the on-disk search index is rebuilt from.
+    text_embedding = models.BinaryField(null=True, blank=True)
+    image_embedding = models.BinaryField(null=True, blank=True)
+    # Front image pHash (unsigned 64-bit, stored signed) and the result cache
+    # key the result lives under; together they feed near_duplicates.py.
+    perceptual_hash = models.BigIntegerField(null=True, blank=True)
+    result_key = models.CharField(max_length=64, blank=True, default="")
+    # Set when the request happens, not when the buffered row is inserted
+    # (see usage.py).
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
 
     class Meta:
         verbose_name = "Analysis Request"
@@ -66,3 +87,91 @@ class AnalysisRequest(models.Model):
     def __str__(self) -> str:
         org = self.api_key.organization if self.api_key else "demo"
         return f"{org} — {self.image_count} imgs — {self.created_at:%Y-%m-%d %H:%M}"
+
+
+class CachedAnalysisResult(models.Model):
+    """Pipeline result stored by content digest (see result_cache.DatabaseBackend).
+
+    Lets retries of an identical submission skip the vision + copy calls.
+    """
+
+    key = models.CharField(max_length=64, unique=True)
+    result = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    last_hit_at = models.DateTimeField(db_index=True)
+    hit_count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Cached Analysis Result"
+        verbose_name_plural = "Cached Analysis Results"
+
+    def __str__(self) -> str:
+        return f"{self.key[:12]}… ({self.hit_count} hits)"
+
+
+class AnalysisJob(models.Model):
+    """An asynchronous /jobs submission.
+
+    The upload is persisted (AnalysisJobImage) so the request can return right
+    away; a background worker (see jobs.py) runs the pipeline and stores the
+    client-facing result here, optionally POSTing it to `webhook_url`.
+    """
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_SUCCEEDED, "Succeeded"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    api_key = models.ForeignKey(
+        APIKey,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="jobs",
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+    hint = models.TextField(blank=True, default="")
+    include_embeddings = models.BooleanField(default=True)
+    include_copy = models.BooleanField(default=True)
+    copy_mode = models.CharField(max_length=20, default="llm")
+    embedding_format = models.CharField(max_length=20, default="float")
+    dedupe = models.BooleanField(default=False)
+    webhook_url = models.URLField(max_length=500, blank=True, default="")
+    webhook_attempts = models.IntegerField(default=0)
+    webhook_delivered_at = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error_code = models.CharField(max_length=40, blank=True, default="")
+    error_message = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Analysis Job"
+        verbose_name_plural = "Analysis Jobs"
+        ordering = ["-created_at"]
+
+    def __str__(self) -> str:
+        org = self.api_key.organization if self.api_key else "unknown"
+        return f"{org} — {self.status} — {self.created_at:%Y-%m-%d %H:%M}"
+
+
+class AnalysisJobImage(models.Model):
+    """One uploaded image for a queued job. Deleted once the job finishes."""
+
+    job = models.ForeignKey(AnalysisJob, on_delete=models.CASCADE, related_name="images")
+    position = models.IntegerField(default=0)
+    role = models.CharField(max_length=20, default="front")
+    filename = models.CharField(max_length=255, blank=True, default="")
+    data = models.BinaryField()
+
+    class Meta:
+        ordering = ["position"]
@@ -0,0 +1,237 @@
+"""Near-duplicate lookup over front images: perceptual hashes, multi-index hashed.
+
+Resellers re-photograph the same garment, or re-upload a recompressed,
+resized or slightly cropped copy of the same photo. Those never hit the
+result cache (the bytes differ), but the front image's 64-bit pHash
+(preprocess.perceptual_hash) lands within a few bits of the original's.
+
+Every successful analysis records that hash and its result cache key on
+AnalysisRequest (`perceptual_hash`, `result_key`). Each process keeps one
+index per API key over the rows young enough for their cached result to
+still exist (the result cache TTL), topped up from the table every
+LISTING_DEDUPE_REFRESH seconds so analyses made by other workers show up
+shortly after their usage rows are flushed. Analyses made in this process
+are added immediately by `vector_index.index_result`.
+
+Lookups use multi-index hashing rather than a BK-tree: the 64 bits are cut
+into `max_distance + 1` substrings, each with its own exact-match table. Two
+hashes within `max_distance` bits must agree on at least one substring
+(pigeonhole), so a query only compares the handful of hashes sharing one.
+At 6 bits a BK-tree still visits most of its nodes (Hamming distances
+between unrelated hashes bunch around 32); this stays well under a
+millisecond at tens of thousands of hashes.
+
+`result_cache.run_pipeline_cached(dedupe=True)` uses this to reuse an earlier
+analysis when the distance is at most LISTING_DEDUPE_MAX_DISTANCE bits.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+DEDUPE_MAX_DISTANCE = int(os.getenv("LISTING_DEDUPE_MAX_DISTANCE", "6"))  # of 64 bits
+DEDUPE_REFRESH = float(os.getenv("LISTING_DEDUPE_REFRESH", "30"))  # seconds
+
+_SIGN = 1 << 63
+
+
+# ---------------------------------------------------------------------------
+# Hash representations
+# ---------------------------------------------------------------------------
+def format_hash(phash: int | None) -> str | None:
+    """16 hex digits, as stored in `_meta`."""
+    return None if phash is None else f"{phash:016x}"
+
+
+def parse_hash(value: str | None) -> int | None:
+    try:
+        return int(value, 16) if value else None
+    except ValueError:
+        return None
+
+
+def hash_to_db(phash: int | None) -> int | None:
+    """Unsigned 64-bit hash -> signed value for a BigIntegerField."""
+    if phash is None:
+        return None
+    return phash - (1 << 64) if phash >= _SIGN else phash
+
+
+def hash_from_db(value: int | None) -> int | None:
+    if value is None:
+        return None
+    return value + (1 << 64) if value < 0 else value
+
+
+def distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+# ---------------------------------------------------------------------------
+# Multi-index hash table
+# ---------------------------------------------------------------------------
+@dataclass(frozen=True)
+class Entry:
+    analysis_id: str
+    result_key: str
+    created: float  # unix time
+
+
+class MultiIndexHash:
+    """Exact-match tables over `max_distance + 1` substrings of a 64-bit hash."""
+
+    def __init__(self, max_distance: int = DEDUPE_MAX_DISTANCE):
+        self.max_distance = max_distance
+        parts = max_distance + 1
+        bounds = [round(64 * i / parts) for i in range(parts + 1)]
+        self._segments = [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(bounds, bounds[1:])]
+        self._tables: list[dict[int, list[int]]] = [{} for _ in self._segments]
+        self._entries: dict[int, list[Entry]] = {}
+        self.size = 0
+
+    def add(self, phash: int, entry: Entry) -> None:
+        self.size += 1
+        entries = self._entries.get(phash)
+        if entries is not None:
+            entries.append(entry)
+            return
+        self._entries[phash] = [entry]
+        for (shift, mask), table in zip(self._segments, self._tables):
+            table.setdefault((phash >> shift) & mask, []).append(phash)
+
+    def find(self, phash: int, max_distance: int | None = None) -> list[tuple[int, Entry]]:
+        """Every entry within `max_distance` bits of `phash`."""
+        if max_distance is None:
+            max_distance = self.max_distance
+        if max_distance > self.max_distance:
+            raise ValueError(f"index built for distances up to {self.max_distance}")
+        candidates: set[int] = set()
+        for (shift, mask), table in zip(self._segments, self._tables):
+            candidates.update(table.get((phash >> shift) & mask, ()))
+        found: list[tuple[int, Entry]] = []
+        for h in candidates:
+            d = distance(h, phash)
+            if d <= max_distance:
+                found.extend((d, e) for e in self._entries[h])
+        return found
+
+
+# ---------------------------------------------------------------------------
+# Index
+# ---------------------------------------------------------------------------
+class NearDuplicateIndex:
+    """Per-owner hash tables over recent analyses, refreshed from AnalysisRequest."""
+
+    def __init__(self, ttl: float, refresh_interval: float = DEDUPE_REFRESH):
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._tables: dict[int, MultiIndexHash] = {}
+        self._seen: set[str] = set()
+        self._result_keys: dict[int, set[str]] = {}
+        self._last_pk = 0
+        self._built_at = time.monotonic()
+        self._refreshed_at = float("-inf")
+
+    def add(self, owner_id: int | None, phash: int, analysis_id, result_key: str, created: float | None = None) -> None:
+        if phash is None or not result_key:
+            return
+        entry = Entry(str(analysis_id), result_key, created if created is not None else time.time())
+        owner = owner_id if owner_id is not None else -1
+        with self._lock:
+            if entry.analysis_id in self._seen:
+                return
+            self._seen.add(entry.analysis_id)
+            self._tables.setdefault(owner, MultiIndexHash()).add(phash, entry)
+            self._result_keys.setdefault(owner, set()).add(result_key)
+
+    def has_result(self, owner_id: int | None, result_key: str) -> bool:
+        """Whether one of `owner_id`'s recent analyses produced `result_key`."""
+        self.refresh()
+        with self._lock:
+            return result_key in self._result_keys.get(owner_id if owner_id is not None else -1, ())
+
+    def find(self, owner_id: int | None, phash: int, max_distance: int = DEDUPE_MAX_DISTANCE) -> tuple[int, Entry] | None:
+        """The closest (then most recent) live entry within `max_distance`."""
+        self.refresh()
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            table = self._tables.get(owner_id if owner_id is not None else -1)
+            found = table.find(phash, max_distance) if table else []
+        live = [(d, e) for d, e in found if e.created >= cutoff]
+        if not live:
+            return None
+        return min(live, key=lambda de: (de[0], -de[1].created))
+
+    def refresh(self, force: bool = False) -> None:
+        """Pull rows added since the last refresh; rebuild once per TTL so
+        expired entries don't accumulate."""
+        now = time.monotonic()
+        if not force and now - self._refreshed_at < self.refresh_interval:
+            return
+        # One thread refreshes; the others search what is already loaded.
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            if now - self._built_at > self.ttl:
+                with self._lock:
+                    self._tables, self._seen, self._result_keys, self._last_pk = {}, set(), {}, 0
+                self._built_at = now
+            self._load()
+            self._refreshed_at = now
+        except Exception as e:
+            print(f"[near_duplicates] refresh failed: {e}")
+        finally:
+            self._refresh_lock.release()
+
+    def _load(self) -> None:
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from .models import AnalysisRequest
+
+        rows = (
+            AnalysisRequest.objects.filter(
+                pk__gt=self._last_pk,
+                success=True,
+                perceptual_hash__isnull=False,
+                created_at__gte=timezone.now() - timedelta(seconds=self.ttl),
+            )
+            .exclude(result_key="")
+            .order_by("pk")
+            .values_list("pk", "api_key_id", "analysis_id", "perceptual_hash", "result_key", "created_at")
+        )
+        loaded = 0
+        for pk, owner_id, analysis_id, phash, result_key, created_at in rows.iterator(chunk_size=2000):
+            self.add(owner_id, hash_from_db(phash), analysis_id, result_key, created_at.timestamp())
+            self._last_pk = pk
+            loaded += 1
+        if loaded:
+            print(f"[near_duplicates] loaded {loaded} hashes")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(t.size for t in self._tables.values())
+
+
+_index: NearDuplicateIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> NearDuplicateIndex:
+    """Return the process-wide index (entries live as long as cached results)."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            from django.conf import settings
+
+            from .result_cache import DEFAULT_TTL
+
+            conf = getattr(settings, "LISTING_RESULT_CACHE", {}) or {}
+            _index = NearDuplicateIndex(ttl=int(conf.get("TTL", DEFAULT_TTL)))
+        return _index
@@ -2,11 +2,27 @@
 
 Wraps analyzer + copy_generator + embeddings into a single orchestration
 function used by both the demo view and the production /analyze endpoint.
+
+Each upload is decoded exactly once (see preprocess.py): the front image is
+prepared first, and its CLIP-sized copy goes straight to the embedding pool
+while the remaining images are decoded.
+
+Stages that don't depend on each other run concurrently on a shared thread
+pool: the CLIP image embedding only needs the decoded front image, so it
+overlaps the multi-second vision call; the BGE model is warmed in the
+background and copy generation overlaps it.
+
+With single_pass (or LISTING_SINGLE_PASS=1) the vision call also writes the
+listing copy, so there is no second chat completion; the copy generator only
+runs if that copy comes back incomplete.
 """
 
 from __future__ import annotations
 
+import contextvars
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 from oracle_frontend.embeddings import (
     BGE_DIM,
@@ -15,13 +31,52 @@ from oracle_frontend.embeddings import (
     CLIP_MODEL_NAME,
     embed_image,
     embed_text,
+    get_bge_model,
 )
 
-from .analyzer import ImageInput, analyze_garment
-from .copy_generator import generate_listing_copy
+from . import metrics
+from .analyzer import ImageInput, analyze_garment, prepare_image_at, validate_images
+from .copy_generator import COPY_MODE, generate_listing_copy
+from .near_duplicates import format_hash
+
+
+# Shared across requests. Each run_pipeline call uses at most two slots
+# (CLIP, BGE warm-up); the vision and copy calls run on the request thread.
+PIPELINE_WORKERS = int(os.getenv("LISTING_PIPELINE_WORKERS", "8"))
+_executor = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix="listing-pipeline")
+
+SINGLE_PASS = os.getenv("LISTING_SINGLE_PASS", "0") == "1"
+
+
+def _timed(fn, *args, **kwargs):
+    """Call fn and return (result, elapsed_ms)."""
+    started = time.time()
+    result = fn(*args, **kwargs)
+    return result, int((time.time() - started) * 1000)
 
 
-def _build_text_embedding_input(metadata: dict, listing: dict) -> str:
+def _traced(stage: str, model: str | None, fn, *args, **kwargs):
+    """_timed, also recorded as `stage` in the metrics histograms."""
+    with metrics.trace(stage, model=model):
+        return _timed(fn, *args, **kwargs)
+
+
+def _submit(fn, *args, **kwargs):
+    # Run in a copy of the caller's context so the metrics api_key label
+    # follows the work onto the pool thread.
+    return _executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def _warm_bge() -> bool:
+    try:
+        get_bge_model()
+        return True
+    except Exception as e:
+        print(f"[pipeline] BGE warm-up failed: {e}")
+        return False
+
+
+def build_text_embedding_input(metadata: dict, listing: dict) -> str:
     """The text we embed is intentionally the rich descriptors + the listing
     description — this is what makes semantic search across listings useful.
     """
@@ -35,19 +90,65 @@ def _build_text_embedding_input(metadata: dict, listing: dict) -> str:
     return " ".join(parts).strip()
 
 
+def front_image(images: list[ImageInput]) -> ImageInput | None:
+    """The image we embed with CLIP: the front shot, or the first image."""
+    return next((img for img in images if img.role == "front"), images[0] if images else None)
+
+
+def embeddings_block(
+    text_input: str,
+    text_vec: list[float],
+    image_vec: list[float],
+    image_role: str | None,
+) -> dict:
+    """Shape embedding vectors into the public `embeddings` payload."""
+    return {
+        "text": {
+            "model": BGE_MODEL_NAME,
+            "dim": BGE_DIM,
+            "vector": text_vec,
+            "source_text": text_input,
+        } if text_vec else None,
+        "image": {
+            "model": CLIP_MODEL_NAME,
+            "dim": CLIP_DIM,
+            "vector": image_vec,
+            "source_image_role": image_role,
+        } if image_vec else None,
+    }
+
+
+@metrics.trace("pipeline")
 def run_pipeline(
     images: list[ImageInput],
     hint: str | None = None,
     include_embeddings: bool = True,
     include_copy: bool = True,
     model: str | None = None,
+    on_field=None,
+    copy_mode: str | None = None,
+    single_pass: bool | None = None,
+    image_policy: str | None = None,
+    prepared_front=None,
 ) -> dict:
     """Run the full image-to-listing pipeline.
 
+    `on_field(name, value)` is passed through to `analyze_garment`, which then
+    streams the vision response and reports metadata fields as they complete.
+    `copy_mode` ("llm" | "template" | "auto") is passed to
+    `generate_listing_copy`. `single_pass` (default LISTING_SINGLE_PASS) has
+    the vision call write the copy too; it is ignored in "template" mode,
+    which makes no copy call to save.
+    `image_policy` (default LISTING_IMAGE_POLICY) sets per-role image size,
+    detail and label cropping; see image_policy.py.
+    `prepared_front` is the front image already prepared the same way (with
+    its hash, and CLIP input if embeddings are on) by a caller that needed
+    the hash first, so it isn't decoded twice.
+
     Returns a dict with shape:
     {
       "metadata":   <analyzer output (without _meta)>,
-      "listing":    {"title", "description", "tags"} | null,
+      "listing":    {"title", "description", "tags", "source"} | null,
       "embeddings": {
          "text":  {"model", "dim", "vector"} | null,
          "image": {"model", "dim", "vector"} | null,
@@ -57,44 +158,91 @@ def run_pipeline(
          "analyzer": {...},
          "copy_generator": {...} | null,
          "embeddings_included": bool,
+         "perceptual_hash": str | None,   # front image pHash, 16 hex digits
+         "stages": {"preprocess_ms", "analyzer_ms", "copy_generator_ms",
+                    "bge_warmup_ms", "text_embedding_ms", "image_embedding_ms"},
       }
     }
     """
     t0 = time.time()
+    validate_images(images)
+
+    # Kick off everything that only depends on the request itself before the
+    # (slow) vision call blocks this thread. The front image is decoded first
+    # so CLIP can start on it while the others are still being decoded; its
+    # perceptual hash is taken from the same decode.
+    front_img = front_image(images)
+    front_idx = next((i for i, img in enumerate(images) if img is front_img), None)
+    order = ([front_idx] if front_idx is not None else []) + [i for i in range(len(images)) if i != front_idx]
+
+    image_future = None
+    bge_future = None
+    if include_embeddings:
+        bge_future = _submit(_timed, _warm_bge)
+
+    prepared = [None] * len(images)
+    preprocess_started = time.time()
+    for i in order:
+        is_front = i == front_idx
+        if is_front and prepared_front is not None:
+            prepared[i] = prepared_front
+        else:
+            prepared[i] = prepare_image_at(
+                images, i, with_clip=include_embeddings and is_front, with_hash=is_front, policy=image_policy
+            )
+        if include_embeddings and is_front:
+            image_future = _submit(_traced, "embed_image", CLIP_MODEL_NAME, embed_image, prepared[i].clip_image)
+    preprocess_ms = int((time.time() - preprocess_started) * 1000)
+    front_hash = prepared[front_idx].perceptual_hash if front_idx is not None else None
 
-    metadata = analyze_garment(images, hint=hint, model=model)
+    if single_pass is None:
+        single_pass = SINGLE_PASS
+    single_pass = single_pass and include_copy and (copy_mode or COPY_MODE) != "template"
+
+    metadata, analyzer_ms = _timed(
+        analyze_garment, images, hint=hint, model=model, prepared=prepared, on_field=on_field,
+        single_pass=single_pass, image_policy=image_policy,
+    )
     analyzer_meta = metadata.pop("_meta", {})
+    listing = metadata.pop("_listing", None)
 
-    listing = None
     copy_meta = None
-    if include_copy:
-        copy_result = generate_listing_copy(metadata, model=model)
+    copy_ms = None
+    if listing is not None:
+        # Written by the vision call; its tokens are in analyzer_meta.
+        copy_meta = {
+            "model": analyzer_meta.get("model"),
+            "mode": "single_pass",
+            "elapsed_ms": 0,
+            "input_tokens": 0,
+            "cached_input_tokens": 0,
+            "output_tokens": 0,
+        }
+        copy_ms = 0
+    elif include_copy:
+        copy_result, copy_ms = _timed(generate_listing_copy, metadata, model=model, mode=copy_mode)
         copy_meta = copy_result.pop("_meta", {})
         listing = copy_result
 
     embeddings = None
+    bge_warmup_ms = None
+    text_embedding_ms = None
+    image_embedding_ms = None
     if include_embeddings:
-        text_input = _build_text_embedding_input(metadata, listing or {})
-        text_vec = embed_text(text_input) if text_input else []
-
-        # Front image (or first image) for CLIP
-        front_img = next((img for img in images if img.role == "front"), images[0])
-        image_vec = embed_image(front_img.bytes_data) if front_img else []
-
-        embeddings = {
-            "text": {
-                "model": BGE_MODEL_NAME,
-                "dim": BGE_DIM,
-                "vector": text_vec,
-                "source_text": text_input,
-            } if text_vec else None,
-            "image": {
-                "model": CLIP_MODEL_NAME,
-                "dim": CLIP_DIM,
-                "vector": image_vec,
-                "source_image_role": front_img.role if front_img else None,
-            } if image_vec else None,
-        }
+        _, bge_warmup_ms = bge_future.result()
+
+        text_input = build_text_embedding_input(metadata, listing or {})
+        text_vec, text_embedding_ms = (
+            _traced("embed_text", BGE_MODEL_NAME, embed_text, text_input) if text_input else ([], 0)
+        )
+
+        image_vec = []
+        if image_future is not None:
+            image_vec, image_embedding_ms = image_future.result()
+
+        embeddings = embeddings_block(
+            text_input, text_vec, image_vec, front_img.role if front_img else None
+        )
 
     return {
         "metadata": metadata,
@@ -105,5 +253,18 @@ def run_pipeline(
             "analyzer": analyzer_meta,
             "copy_generator": copy_meta,
             "embeddings_included": include_embeddings,
+            "perceptual_hash": format_hash(front_hash),
+            # Per-stage wall time. Background stages (image embedding, BGE
+            # warm-up) overlap preprocessing and the analyzer, so these don't
+            # sum to elapsed_ms. Per-image decode/resize/encode timings are
+            # in analyzer.preprocess.
+            "stages": {
+                "preprocess_ms": preprocess_ms,
+                "analyzer_ms": analyzer_ms,
+                "copy_generator_ms": copy_ms,
+                "bge_warmup_ms": bge_warmup_ms,
+                "text_embedding_ms": text_embedding_ms,
+                "image_embedding_ms": image_embedding_ms,
+            },
         },
     }
@@ -0,0 +1,275 @@
+"""Shared image preprocessing: decode each upload once, feed every consumer.
+
+Uploads can be up to 10MB each, six per request. Each one is decoded exactly
+once here and turned into:
+
+  - a <=1024px JPEG for the vision model
+  - a small RGB image (shortest side ~224px) ready for CLIP
+  - for the front image, a 64-bit perceptual hash (see near_duplicates.py)
+  - for label photos under a cropping image policy, the vision JPEG cut down
+    to the label's text region (see image_policy.py)
+
+JPEGs use PIL's `draft()` so libjpeg does DCT-domain downscaling while
+decoding (1/2, 1/4 or 1/8 scale) — a 4000px photo is never fully inflated
+just to be shrunk to 1024px. Resizing uses BICUBIC with a reducing gap, and
+the vision JPEG is encoded without `optimize=True` (an extra Huffman pass
+that saves a few percent of bytes we only base64 once).
+
+Per-image decode/resize/encode timings are returned for `_meta`.
+
+`raw` may be any bytes-like object. Uploads arrive as bytes (shared with the
+upload's BytesIO) or a memoryview over a spooled file read (see uploads.py);
+neither is copied again before decoding.
+"""
+
+from __future__ import annotations
+
+import io
+import math
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+from PIL import Image
+
+try:
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+except ImportError:
+    pass
+
+VISION_MAX_SIDE = 1024
+VISION_JPEG_QUALITY = 85
+CLIP_SIDE = 224
+HASH_SIDE = 32  # pHash: DCT of a 32x32 grayscale thumbnail, low 8x8 kept
+CROP_SIDE = 256  # label crop: text region found on a thumbnail this size
+
+
+@dataclass
+class PreparedImage:
+    """One decoded upload, ready for the vision model and CLIP."""
+    vision_jpeg: bytes
+    clip_image: Image.Image | None = None
+    perceptual_hash: int | None = None
+    role: str = "front"
+    source_size: tuple[int, int] = (0, 0)
+    vision_size: tuple[int, int] = (0, 0)
+    crop_box: tuple[int, int, int, int] | None = None  # in source pixels
+    detail: str = "auto"  # image_url detail, set by the image policy
+    tokens: int = 0  # estimated input tokens at that detail
+    timings: dict = field(default_factory=dict)
+
+    def meta(self) -> dict:
+        return {
+            "role": self.role,
+            "source_size": list(self.source_size),
+            "vision_size": list(self.vision_size),
+            **({"crop_box": list(self.crop_box)} if self.crop_box else {}),
+            "detail": self.detail,
+            "tokens": self.tokens,
+            **self.timings,
+        }
+
+
+class _BufferReader(io.RawIOBase):
+    """Seekable read-only file over a memoryview. io.BytesIO shares a bytes
+    object but copies anything else, which would double a 10MB upload."""
+
+    def __init__(self, data):
+        self._view = memoryview(data).cast("B")
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = max(0, min(len(b), len(self._view) - self._pos))
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+def open_buffer(raw) -> io.IOBase:
+    """A file object over `raw` without copying it."""
+    if isinstance(raw, bytes):
+        return io.BytesIO(raw)
+    return io.BufferedReader(_BufferReader(raw))
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    return np.cos(np.pi * (2 * i + 1) * k / (2 * n)).astype(np.float32)
+
+
+_DCT = _dct_matrix(HASH_SIDE)
+
+
+def perceptual_hash(img: Image.Image) -> int:
+    """64-bit pHash: which of the lowest 8x8 DCT frequencies of a 32x32
+    grayscale thumbnail lie above their median.
+
+    Survives recompression, resizing and small exposure changes; two photos
+    of the same garment usually land within a few bits of each other.
+    """
+    gray = np.asarray(img.convert("L").resize((HASH_SIDE, HASH_SIDE), Image.Resampling.BOX), dtype=np.float32)
+    low = (_DCT @ gray @ _DCT.T)[:8, :8]
+    bits = (low > np.median(low)).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def perceptual_hash_bytes(raw) -> int:
+    """perceptual_hash() of an encoded image, decoding only a thumbnail when
+    the format allows it (JPEG DCT scaling)."""
+    img = Image.open(open_buffer(raw))
+    img.draft("L", (HASH_SIDE * 4, HASH_SIDE * 4))
+    return perceptual_hash(img)
+
+
+def edge_box(gray: np.ndarray, mass: float = 0.9) -> tuple[int, int, int, int] | None:
+    """Bounding box (left, top, right, bottom) of the densest edges in a
+    grayscale array: the span holding the central `mass` of edge pixels
+    along each axis. Printed text is far busier than the fabric around it.
+    None if there are no edges to speak of."""
+    g = gray.astype(np.float32)
+    edges = np.abs(np.diff(g, axis=1))[:-1, :] + np.abs(np.diff(g, axis=0))[:, :-1]
+    mask = edges > max(float(np.percentile(edges, 90)), 24.0)
+    if mask.sum() < 0.002 * mask.size:
+        return None
+    tail = (1 - mass) / 2
+
+    def span(counts: np.ndarray) -> tuple[int, int]:
+        cum = np.cumsum(counts) / counts.sum()
+        return int(np.searchsorted(cum, tail)), int(np.searchsorted(cum, 1 - tail)) + 1
+
+    left, right = span(mask.sum(axis=0))
+    top, bottom = span(mask.sum(axis=1))
+    return left, top, right, bottom
+
+
+def label_crop_box(img: Image.Image, margin: float = 0.08) -> tuple[int, int, int, int] | None:
+    """Crop box for the text region of a label photo, in `img` pixels, or
+    None when cropping wouldn't save much (or finds nothing)."""
+    thumb = img.convert("L")
+    thumb.thumbnail((CROP_SIDE, CROP_SIDE), Image.Resampling.BOX)
+    box = edge_box(np.asarray(thumb))
+    if box is None:
+        return None
+    sx, sy = img.width / thumb.width, img.height / thumb.height
+    left, top, right, bottom = box
+    pad_x, pad_y = (right - left) * margin, (bottom - top) * margin
+    box = (
+        max(0, int((left - pad_x) * sx)),
+        max(0, int((top - pad_y) * sy)),
+        min(img.width, math.ceil((right + pad_x) * sx)),
+        min(img.height, math.ceil((bottom + pad_y) * sy)),
+    )
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    # Nearly the whole photo: nothing to gain. A sliver: probably noise.
+    if not 0.02 < area / (img.width * img.height) < 0.85:
+        return None
+    return box
+
+
+def _ms(since: float) -> float:
+    return round((time.perf_counter() - since) * 1000, 2)
+
+
+def prepare_image(
+    raw: bytes | memoryview,
+    role: str = "front",
+    max_side: int = VISION_MAX_SIDE,
+    quality: int = VISION_JPEG_QUALITY,
+    with_clip: bool = False,
+    with_hash: bool = False,
+    crop_label: bool = False,
+) -> PreparedImage:
+    """Decode `raw` once and produce the vision JPEG (and optionally CLIP
+    input and the perceptual hash).
+
+    `crop_label` cuts the vision JPEG down to the image's text region first.
+    It is ignored with CLIP or the hash, which need the whole photo.
+    """
+    crop_label = crop_label and not (with_clip or with_hash)
+    t = time.perf_counter()
+    img = Image.open(open_buffer(raw))
+    source_size = img.size
+    w, h = source_size
+    # Cropping keeps full resolution: the label may be a small part of the
+    # photo, and it is what gets scaled to max_side.
+    if img.format == "JPEG" and max(w, h) > max_side and not crop_label:
+        # Ask libjpeg for the smallest power-of-two reduction that still
+        # covers the target size; the exact resize happens below.
+        scale = max_side / max(w, h)
+        img.draft("RGB", (math.ceil(w * scale), math.ceil(h * scale)))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    else:
+        img.load()
+    decode_ms = _ms(t)
+
+    crop_box = None
+    timings = {}
+    if crop_label:
+        t = time.perf_counter()
+        crop_box = label_crop_box(img)
+        if crop_box is not None:
+            img = img.crop(crop_box)
+        timings["crop_ms"] = _ms(t)
+
+    t = time.perf_counter()
+    w, h = img.size
+    if max(w, h) > max_side:
+        scale = max_side / max(w, h)
+        img = img.resize(
+            (max(1, int(w * scale)), max(1, int(h * scale))),
+            Image.Resampling.BICUBIC,
+            reducing_gap=2.0,
+        )
+    clip_image = None
+    if with_clip:
+        cw, ch = img.size
+        short = min(cw, ch)
+        if short > CLIP_SIDE:
+            scale = CLIP_SIDE / short
+            clip_image = img.resize(
+                (max(CLIP_SIDE, round(cw * scale)), max(CLIP_SIDE, round(ch * scale))),
+                Image.Resampling.BICUBIC,
+                reducing_gap=2.0,
+            )
+        else:
+            clip_image = img
+    resize_ms = _ms(t)
+
+    phash = None
+    if with_hash:
+        t = time.perf_counter()
+        phash = perceptual_hash(img)
+        timings["hash_ms"] = _ms(t)
+
+    t = time.perf_counter()
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality)
+    encode_ms = _ms(t)
+
+    return PreparedImage(
+        vision_jpeg=buf.getvalue(),
+        clip_image=clip_image,
+        perceptual_hash=phash,
+        role=role,
+        source_size=source_size,
+        vision_size=img.size,
+        crop_box=crop_box,
+        timings={"decode_ms": decode_ms, "resize_ms": resize_ms, "encode_ms": encode_ms, **timings},
+    )
@@ -0,0 +1,54 @@
+"""Client-facing response bodies shared by the sync, job and webhook paths."""
+
+from __future__ import annotations
+
+from .vector_encoding import encode_embeddings
+
+
+def analysis_body(result: dict, image_count: int, analysis_id=None, embedding_format: str = "float") -> dict:
+    """Build the public /analyze response from a run_pipeline result.
+
+    Strips internal _meta bits we don't want to leak, keeping a `usage` block.
+    Vectors are encoded per `embedding_format` (see vector_encoding.py).
+    """
+    rmeta = result.get("_meta", {})
+    return {
+        "analysis_id": str(analysis_id) if analysis_id else None,
+        "metadata": result.get("metadata"),
+        "listing": result.get("listing"),
+        "embeddings": encode_embeddings(result.get("embeddings"), embedding_format),
+        "usage": {
+            "elapsed_ms": rmeta.get("elapsed_ms"),
+            "model": (rmeta.get("analyzer") or {}).get("model"),
+            "input_tokens": (rmeta.get("analyzer") or {}).get("input_tokens", 0)
+            + (rmeta.get("copy_generator") or {}).get("input_tokens", 0),
+            "cached_input_tokens": (rmeta.get("analyzer") or {}).get("cached_input_tokens", 0)
+            + (rmeta.get("copy_generator") or {}).get("cached_input_tokens", 0),
+            "output_tokens": (rmeta.get("analyzer") or {}).get("output_tokens", 0)
+            + (rmeta.get("copy_generator") or {}).get("output_tokens", 0),
+            "image_count": image_count,
+            "cache_hit": bool(rmeta.get("cache_hit")),
+        },
+        # Set when `dedupe` reused the analysis of a near-identical photo.
+        "near_duplicate": rmeta.get("near_duplicate"),
+    }
+
+
+def job_body(job) -> dict:
+    """Build the public representation of an AnalysisJob."""
+
+    def _ts(dt):
+        return dt.isoformat() if dt else None
+
+    body = {
+        "id": str(job.pk),
+        "status": job.status,
+        "created_at": _ts(job.created_at),
+        "started_at": _ts(job.started_at),
+        "finished_at": _ts(job.finished_at),
+        "result": job.result if job.status == job.STATUS_SUCCEEDED else None,
+        "error": None,
+    }
+    if job.status == job.STATUS_FAILED:
+        body["error"] = {"code": job.error_code or "internal_error", "message": job.error_message}
+    return body
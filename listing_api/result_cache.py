@@ -0,0 +1,413 @@
+"""Content-addressed cache for pipeline results.
+
+Resale partners often re-submit the exact same photo set after a timeout or
+retry. Rather than paying for another vision + copy run, the /analyze view
+looks up a digest of everything that determines the output:
+
+  - the bytes of every image, in order, plus its role
+  - the hint
+  - the model
+  - the include_copy / include_embeddings flags, the copy mode, single_pass
+    and the image policy
+  - the taxonomy version (editing taxonomy.py invalidates old results)
+
+Backends are pluggable via `settings.LISTING_RESULT_CACHE["BACKEND"]`:
+
+  "django" — a Django cache alias (LocMemCache locally; it evicts LRU once
+             MAX_ENTRIES is reached)
+  "db"     — the CachedAnalysisResult table, for multi-container prod
+  "off"    — disable caching
+
+Both real backends honour TTL (seconds) and MAX_ENTRIES (LRU bound).
+
+With `dedupe=True`, a miss falls back to a near-duplicate lookup on the front
+image's perceptual hash (see near_duplicates.py): a re-photographed or
+recompressed garment reuses the earlier analysis' cached result.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+
+from oracle_frontend.ai_config import OPENAI_MODEL
+
+from .copy_generator import COPY_MODE
+from .image_policy import IMAGE_POLICY
+from . import metrics
+from .analyzer import AnalyzerError, ImageInput, prepare_image_at
+from .near_duplicates import DEDUPE_MAX_DISTANCE, format_hash, get_index
+from .pipeline import SINGLE_PASS, front_image, run_pipeline
+from .taxonomy import TAXONOMY_VERSION
+
+# Bump to invalidate every cached result (e.g. when the output schema changes).
+CACHE_VERSION = 1
+
+DEFAULT_TTL = 24 * 3600
+DEFAULT_MAX_ENTRIES = 500
+
+
+def cache_key(
+    images: list[ImageInput],
+    hint: str | None = None,
+    model: str | None = None,
+    include_copy: bool = True,
+    include_embeddings: bool = True,
+    copy_mode: str | None = None,
+    single_pass: bool | None = None,
+    image_policy: str | None = None,
+) -> str:
+    """Return the hex digest identifying a pipeline run's inputs."""
+    h = hashlib.sha256()
+    h.update(f"listing-result:v{CACHE_VERSION}\0".encode())
+    for img in images:
+        h.update((img.role or "").encode())
+        h.update(b"\0")
+        h.update(hashlib.sha256(img.bytes_data).digest())
+    options = _options(hint, model, include_copy, include_embeddings, copy_mode, single_pass, image_policy)
+    h.update(json.dumps(options, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def options_key(
+    hint: str | None = None,
+    model: str | None = None,
+    include_copy: bool = True,
+    copy_mode: str | None = None,
+    single_pass: bool | None = None,
+    image_policy: str | None = None,
+) -> str:
+    """Digest of everything but the images and the include_* flags.
+
+    Stored in a result's `_meta` so a near-duplicate match is only reused by
+    a request that asked for the same hint, model, copy mode, single_pass
+    and image policy.
+    """
+    options = _options(hint, model, include_copy, True, copy_mode, single_pass, image_policy)
+    del options["include_copy"], options["include_embeddings"]
+    return hashlib.sha256(json.dumps(options, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def _options(hint, model, include_copy, include_embeddings, copy_mode, single_pass, image_policy) -> dict:
+    options = {
+        "hint": hint or "",
+        "model": model or OPENAI_MODEL,
+        "include_copy": bool(include_copy),
+        "include_embeddings": bool(include_embeddings),
+        "taxonomy": TAXONOMY_VERSION,
+    }
+    copy_mode = copy_mode or COPY_MODE
+    if include_copy and copy_mode != "llm":
+        # Only added when it matters, so "llm" keys match the ones cached
+        # before copy modes existed.
+        options["copy_mode"] = copy_mode
+    if single_pass is None:
+        single_pass = SINGLE_PASS
+    if single_pass and include_copy and copy_mode != "template":
+        # Different prompt (see run_pipeline), so the metadata can differ too.
+        options["single_pass"] = True
+    image_policy = image_policy or IMAGE_POLICY
+    if image_policy != "uniform":
+        options["image_policy"] = image_policy
+    return options
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+class NullBackend:
+    def get(self, key: str) -> dict | None:
+        return None
+
+    def set(self, key: str, result: dict) -> None:
+        pass
+
+
+class DjangoCacheBackend:
+    """Store results in a Django cache alias. LRU bound comes from the alias'
+    MAX_ENTRIES option (LocMemCache culls least-recently-used entries)."""
+
+    def __init__(self, alias: str, ttl: int):
+        from django.core.cache import caches
+        self.cache = caches[alias]
+        self.ttl = ttl
+
+    def get(self, key: str) -> dict | None:
+        return self.cache.get(self._k(key))
+
+    def set(self, key: str, result: dict) -> None:
+        self.cache.set(self._k(key), result, timeout=self.ttl)
+
+    @staticmethod
+    def _k(key: str) -> str:
+        return f"listing_result:{key}"
+
+
+class DatabaseBackend:
+    """Store results in CachedAnalysisResult.
+
+    Hits bump `last_hit_at`; once the table grows past `max_entries` the
+    least-recently-hit rows (and anything expired) are pruned. Pruning runs
+    every `prune_every` writes so inserts stay a single round-trip.
+    """
+
+    def __init__(self, ttl: int, max_entries: int, prune_every: int = 25):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self._writes = 0
+
+    def get(self, key: str) -> dict | None:
+        from django.db.models import F
+        from django.utils import timezone
+
+        from .models import CachedAnalysisResult
+
+        now = timezone.now()
+        row = (
+            CachedAnalysisResult.objects.filter(key=key, expires_at__gt=now)
+            .values_list("result", flat=True)
+            .first()
+        )
+        if row is None:
+            return None
+        CachedAnalysisResult.objects.filter(key=key).update(
+            last_hit_at=now, hit_count=F("hit_count") + 1
+        )
+        return row
+
+    def set(self, key: str, result: dict) -> None:
+        from django.utils import timezone
+
+        from .models import CachedAnalysisResult
+
+        now = timezone.now()
+        CachedAnalysisResult.objects.update_or_create(
+            key=key,
+            defaults={
+                "result": result,
+                "expires_at": now + timedelta(seconds=self.ttl),
+                "last_hit_at": now,
+            },
+        )
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self.prune()
+
+    def prune(self) -> None:
+        from django.utils import timezone
+
+        from .models import CachedAnalysisResult
+
+        CachedAnalysisResult.objects.filter(expires_at__lte=timezone.now()).delete()
+        stale_ids = list(
+            CachedAnalysisResult.objects.order_by("-last_hit_at")
+            .values_list("pk", flat=True)[self.max_entries:]
+        )
+        if stale_ids:
+            CachedAnalysisResult.objects.filter(pk__in=stale_ids).delete()
+
+
+_backend = None
+
+
+def get_backend():
+    """Return the configured backend (built once per process)."""
+    global _backend
+    if _backend is None:
+        conf = getattr(settings, "LISTING_RESULT_CACHE", {}) or {}
+        kind = (conf.get("BACKEND") or "django").lower()
+        ttl = int(conf.get("TTL", DEFAULT_TTL))
+        max_entries = int(conf.get("MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        if kind == "db":
+            _backend = DatabaseBackend(ttl=ttl, max_entries=max_entries)
+        elif kind == "django":
+            _backend = DjangoCacheBackend(conf.get("ALIAS", "listing_results"), ttl=ttl)
+        else:
+            _backend = NullBackend()
+    return _backend
+
+
+# ---------------------------------------------------------------------------
+# Public helpers
+# ---------------------------------------------------------------------------
+def lookup(key: str) -> dict | None:
+    """Return a cached pipeline result, or None on a miss.
+
+    The cached `_meta` is replaced with one describing the hit: zero tokens
+    were spent, and elapsed_ms is the lookup time, not the original run's.
+    """
+    started = time.time()
+    try:
+        cached = get_backend().get(key)
+    except Exception as e:
+        print(f"[result_cache] lookup failed: {e}")
+        return None
+    if cached is None:
+        return None
+
+    original = cached.get("_meta") or {}
+    original_analyzer = original.get("analyzer") or {}
+    cached["_meta"] = {
+        "elapsed_ms": int((time.time() - started) * 1000),
+        "cache_hit": True,
+        "analyzer": {
+            "model": original_analyzer.get("model", ""),
+            "taxonomy_version": original_analyzer.get("taxonomy_version"),
+        },
+        "copy_generator": None,
+        "embeddings_included": original.get("embeddings_included", False),
+        "original_elapsed_ms": original.get("elapsed_ms"),
+        "perceptual_hash": original.get("perceptual_hash"),
+        "options_key": original.get("options_key"),
+    }
+    return cached
+
+
+def store(key: str, result: dict) -> None:
+    """Cache a successful pipeline result.
+
+    Results whose copy fell back to the template (LLM outage) are not cached,
+    so the next retry gets a chance at real copy.
+    """
+    listing = result.get("listing") or {}
+    if listing.get("source") == "template_fallback":
+        return
+    try:
+        get_backend().set(key, result)
+    except Exception as e:
+        print(f"[result_cache] store failed: {e}")
+
+
+def find_near_duplicate(
+    phash: int | None,
+    owner_id: int | None,
+    include_copy: bool = True,
+    include_embeddings: bool = True,
+    max_distance: int = DEDUPE_MAX_DISTANCE,
+    options: str | None = None,
+) -> dict | None:
+    """An earlier cached result for a front image whose pHash is within
+    `max_distance` bits of `phash`, or None.
+
+    Only analyses made with the same API key are considered, and only ones
+    whose cached result has what this request asked for (copy, embeddings)
+    and was made with the same `options` (see options_key).
+    The result's `_meta.near_duplicate` names the analysis it came from.
+    """
+    if phash is None:
+        return None
+    with metrics.trace("dedupe_lookup"):
+        match = get_index().find(owner_id, phash, max_distance)
+        if match is None:
+            return None
+        dist, entry = match
+        result = lookup(entry.result_key)
+    if result is None:
+        return None
+    if result["_meta"].get("options_key") != options:
+        return None
+    if (include_copy and not result.get("listing")) or (include_embeddings and not result.get("embeddings")):
+        return None
+    if not include_copy:
+        result["listing"] = None
+    if not include_embeddings:
+        result["embeddings"] = None
+    result["_meta"].update({
+        "embeddings_included": include_embeddings,
+        "perceptual_hash": format_hash(phash),
+        "result_key": entry.result_key,
+        "near_duplicate": {"analysis_id": entry.analysis_id, "distance": dist},
+    })
+    return result
+
+
+def run_pipeline_cached(
+    images: list[ImageInput],
+    hint: str | None = None,
+    include_embeddings: bool = True,
+    include_copy: bool = True,
+    model: str | None = None,
+    on_field=None,
+    dedupe: bool = False,
+    owner_id: int | None = None,
+    copy_mode: str | None = None,
+    single_pass: bool | None = None,
+    image_policy: str | None = None,
+) -> dict:
+    """run_pipeline, served from the result cache when the inputs match.
+
+    With `dedupe`, a near-duplicate of an earlier analysis by `owner_id` is
+    served the same way (see find_near_duplicate).
+
+    `on_field` only fires on a miss; a cached result has no fields to stream.
+    `_meta.result_key` names the cache entry the result lives under, which
+    is what the near-duplicate index points at.
+    """
+    key = cache_key(
+        images,
+        hint=hint,
+        model=model,
+        include_copy=include_copy,
+        include_embeddings=include_embeddings,
+        copy_mode=copy_mode,
+        single_pass=single_pass,
+        image_policy=image_policy,
+    )
+    options = options_key(
+        hint=hint,
+        model=model,
+        include_copy=include_copy,
+        copy_mode=copy_mode,
+        single_pass=single_pass,
+        image_policy=image_policy,
+    )
+    result = lookup(key)
+    prepared_front = None
+    if result is not None:
+        result["_meta"]["result_key"] = key
+    elif dedupe:
+        # The front image is decoded here, exactly as run_pipeline would, and
+        # handed on to it on a miss: its hash comes from the same decode.
+        prepared_front = _prepare_front(images, include_embeddings, image_policy)
+        result = find_near_duplicate(
+            prepared_front.perceptual_hash if prepared_front else None,
+            owner_id, include_copy=include_copy, include_embeddings=include_embeddings,
+            options=options,
+        )
+    if result is None:
+        result = run_pipeline(
+            images,
+            hint=hint,
+            include_embeddings=include_embeddings,
+            include_copy=include_copy,
+            model=model,
+            on_field=on_field,
+            copy_mode=copy_mode,
+            single_pass=single_pass,
+            image_policy=image_policy,
+            prepared_front=prepared_front,
+        )
+        result["_meta"]["options_key"] = options
+        store(key, result)
+        result["_meta"]["result_key"] = key
+    return result
+
+
+def _prepare_front(images: list[ImageInput], include_embeddings: bool, image_policy: str | None):
+    """run_pipeline's preprocessing of the front image, or None if there is
+    none or it can't be decoded (run_pipeline then reports that)."""
+    front = front_image(images)
+    if front is None:
+        return None
+    index = next(i for i, img in enumerate(images) if img is front)
+    try:
+        return prepare_image_at(
+            images, index, with_clip=include_embeddings, with_hash=True, policy=image_policy
+        )
+    except AnalyzerError:
+        return None
@@ -0,0 +1,224 @@
+"""Server-Sent Events for /analyze: metadata fields as soon as the model writes them.
+
+The vision model streams its JSON answer token by token. `IncrementalJSONParser`
+watches that text and hands back each top-level member of the object the
+moment its value is complete, so `category`, `primary_color` or `brand` can
+be shown while the rest of the answer (and copy generation, embeddings) is
+still in flight.
+
+With `stream=true` (or `Accept: text/event-stream`) /analyze answers with:
+
+  event: field    data: {"field": "category", "value": "Outerwear"}
+  ...
+  event: result   data: <the normal /analyze response body>
+
+or, on failure, a single `event: error` with the usual error body. Field
+values are already normalized (canonical brand, enum spelling). On a
+result-cache hit every field arrives at once, just before `result`.
+"""
+
+from __future__ import annotations
+
+import json
+import queue
+import threading
+import uuid
+
+from django.db import close_old_connections
+
+from . import metrics
+from .analyzer import AnalyzerError
+
+
+class IncrementalJSONParser:
+    """Parse a JSON object fed in arbitrary chunks, member by member.
+
+    Only the root object is tracked; nested arrays/objects are emitted whole
+    once they close. Anything before the first "{" (a ```json fence, stray
+    prose) is skipped.
+    """
+
+    def __init__(self):
+        self.members: dict = {}
+        self._text = ""
+        self._pos = 0
+        self._state = "start"
+        self._key_start = 0
+        self._key = None
+        self._value_start = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> list[tuple[str, object]]:
+        """Add text; return the (key, value) members completed by it."""
+        self._text += chunk
+        done: list[tuple[str, object]] = []
+        text = self._text
+        while self._pos < len(text) and self._state != "done":
+            c = text[self._pos]
+            state = self._state
+
+            if state == "start":
+                if c == "{":
+                    self._state = "before_key"
+            elif state == "before_key":
+                if c == '"':
+                    self._key_start = self._pos
+                    self._state = "key"
+                elif c == "}":
+                    self._state = "done"
+            elif state == "key":
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._key = json.loads(text[self._key_start:self._pos + 1])
+                    self._state = "colon"
+            elif state == "colon":
+                if c == ":":
+                    self._state = "before_value"
+            elif state == "before_value":
+                if not c.isspace():
+                    self._value_start = self._pos
+                    self._depth = 1 if c in "{[" else 0
+                    self._in_string = c == '"'
+                    self._state = "value"
+            elif state == "value":
+                end = self._scan_value(c)
+                if end is not None:
+                    self._emit(text[self._value_start:end], done)
+                    self._state = "before_key"
+                    if end == self._pos:
+                        # A bare scalar ends at its delimiter; re-read it
+                        # in before_key so a closing "}" is seen.
+                        continue
+            self._pos += 1
+        return done
+
+    def _scan_value(self, c: str) -> int | None:
+        """Advance value scanning by one char; return the value's end index once complete."""
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif c == "\\":
+                self._escape = True
+            elif c == '"':
+                self._in_string = False
+                if self._depth == 0:
+                    return self._pos + 1
+            return None
+        if c == '"':
+            self._in_string = True
+        elif c in "{[":
+            self._depth += 1
+        elif c in "}]":
+            if self._depth == 0:
+                return self._pos  # scalar terminated by the root's "}"
+            self._depth -= 1
+            if self._depth == 0:
+                return self._pos + 1
+        elif self._depth == 0 and (c == "," or c.isspace()):
+            return self._pos
+        return None
+
+    def _emit(self, raw: str, done: list) -> None:
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            return  # malformed member; the final full parse decides
+        self.members[self._key] = value
+        done.append((self._key, value))
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def iter_pipeline(run, api_key=None, **kwargs):
+    """Run `run(on_field=..., **kwargs)` on a worker thread.
+
+    Yields ("field", name, value) as the analyzer reports fields, then
+    ("result", result). Exceptions from `run` are re-raised here. `api_key`
+    is the metrics label for the run (see metrics.bind).
+    """
+    events: queue.Queue = queue.Queue()
+
+    def _target():
+        close_old_connections()
+        try:
+            with metrics.bind(api_key):
+                result = run(on_field=lambda name, value: events.put(("field", name, value)), **kwargs)
+            events.put(("result", result))
+        except Exception as e:
+            events.put(("error", e))
+        finally:
+            close_old_connections()
+
+    threading.Thread(target=_target, name="listing-stream", daemon=True).start()
+    while True:
+        item = events.get()
+        if item[0] == "error":
+            raise item[1]
+        yield item
+        if item[0] == "result":
+            return
+
+
+def stream_analysis(
+    api_key, images, files, hint, include_embeddings, include_copy, embedding_format, dedupe=False, copy_mode=None,
+):
+    """SSE generator behind POST /analyze?stream=true."""
+    from .responses import analysis_body
+    from .result_cache import run_pipeline_cached
+    from .usage import log_request
+    from .vector_index import index_result
+
+    streamed: set[str] = set()
+    result = None
+    try:
+        for item in iter_pipeline(
+            run_pipeline_cached,
+            api_key=api_key,
+            images=images,
+            hint=hint,
+            include_embeddings=include_embeddings,
+            include_copy=include_copy,
+            dedupe=dedupe,
+            owner_id=getattr(api_key, "pk", None),
+            copy_mode=copy_mode,
+        ):
+            if item[0] == "field":
+                streamed.add(item[1])
+                yield sse_event("field", {"field": item[1], "value": item[2]})
+            else:
+                result = item[1]
+    except AnalyzerError as e:
+        log_request(api_key, source="api", images=files, success=False, error=str(e))
+        yield sse_event("error", {"error": {"code": "analysis_failed", "message": str(e)}})
+        return
+    except Exception as e:
+        log_request(api_key, source="api", images=files, success=False, error=str(e))
+        yield sse_event("error", {"error": {"code": "internal_error", "message": "internal error"}})
+        return
+
+    for name, value in (result.get("metadata") or {}).items():
+        if name not in streamed:
+            yield sse_event("field", {"field": name, "value": value})
+
+    analysis_id = uuid.uuid4()
+    log_request(
+        api_key,
+        source="api",
+        images=files,
+        success=True,
+        include_embeddings=include_embeddings,
+        result=result,
+        analysis_id=analysis_id,
+    )
+    index_result(analysis_id, api_key, result)
+    yield sse_event(
+        "result",
+        analysis_body(result, image_count=len(files), analysis_id=analysis_id, embedding_format=embedding_format),
+    )
@@ -5,10 +5,24 @@ The analyzer prompt injects these enum lists so GPT must pick from them
 filterable for downstream search/faceting.
 
 Edit this file to extend or refine the taxonomy. No code changes needed.
+
+At import the vocabularies are compiled once into `COMPILED` (see
+`CompiledTaxonomy`): the prompt vocabulary block, case-insensitive lookup
+tables for normalization, and a content hash, `TAXONOMY_VERSION`, that is
+recorded in analyzer `_meta` and folded into result-cache keys so editing
+this file invalidates cached results.
 """
 
 from __future__ import annotations
 
+import hashlib
+import json
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
+
+from .brand_index import BrandIndex
+
 # ---------------------------------------------------------------------------
 # Top-level garment category (broad)
 # ---------------------------------------------------------------------------
@@ -273,11 +287,12 @@ def all_known_brands() -> set[str]:
 def normalize_brand(raw: str | None) -> tuple[str, bool]:
     """Map a free-text brand string to its canonical name.
 
-    Match priority:
-      1. exact match on canonical name or any alias (case-insensitive)
-      2. substring/prefix match — if the raw string starts with or contains a
-         canonical name (e.g. "Christian Dior Monsieur" -> "Christian Dior"
-         when no exact alias was registered)
+    Match priority (see brand_index.BrandIndex):
+      1. exact match on canonical name or any alias (case/accent-insensitive)
+      2. longest whole-word match of a canonical name or multi-word alias
+         (e.g. "Christian Dior Monsieur jacket" -> "Christian Dior")
+      3. fuzzy match within a small edit distance, for misreads
+         (e.g. "Maison Margiella" -> "Maison Margiela")
 
     Returns (canonical_name, was_known). If the brand isn't matched,
     returns the raw string unchanged with was_known=False.
@@ -287,32 +302,9 @@ def normalize_brand(raw: str | None) -> tuple[str, bool]:
     raw_norm = raw.strip()
     if not raw_norm:
         return "", False
-    raw_lower = raw_norm.lower()
-
-    # Pass 1: exact match against canonical or any alias
-    for canonical, aliases in BRAND_ALIASES.items():
-        if raw_lower == canonical.lower():
-            return canonical, True
-        for a in aliases:
-            if raw_lower == a.lower():
-                return canonical, True
-
-    # Pass 2: substring/prefix match. Prefer the longest canonical name that
-    # appears as a whole-word match in the raw string (so "Christian Dior
-    # Monsieur" -> "Christian Dior", not "Dior").
-    best_canonical = None
-    best_len = 0
-    for canonical in BRAND_ALIASES.keys():
-        c_lower = canonical.lower()
-        # Whole-word boundary check (rough): wrap in spaces
-        if f" {c_lower} " in f" {raw_lower} " or raw_lower.startswith(c_lower + " ") \
-                or raw_lower.endswith(" " + c_lower):
-            if len(c_lower) > best_len:
-                best_canonical = canonical
-                best_len = len(c_lower)
-    if best_canonical:
-        return best_canonical, True
-
+    canonical, _ = COMPILED.brands.match(raw_norm)
+    if canonical:
+        return canonical, True
     return raw_norm, False
 
 
@@ -384,10 +376,10 @@ def normalize_material(raw: str | None) -> tuple[str, bool]:
     if not raw:
         return "other", False
     raw_norm = raw.strip().lower()
-    if raw_norm in MATERIAL_PRIMARY:
+    if raw_norm in COMPILED.material_primary:
         return raw_norm, True
-    if raw_norm in MATERIAL_SYNONYMS:
-        return MATERIAL_SYNONYMS[raw_norm], True
+    if raw_norm in COMPILED.material_synonyms:
+        return COMPILED.material_synonyms[raw_norm], True
     # Substring fallback — "cotton blend" -> "cotton", "wool blend" -> "wool"
     for primary in MATERIAL_PRIMARY:
         if primary in raw_norm:
@@ -418,3 +410,119 @@ def subcategories_for_prompt() -> str:
 
 def condition_grades_for_prompt() -> str:
     return "\n".join(f"  - {grade}: {desc}" for grade, desc in CONDITION_GRADES)
+
+
+# ---------------------------------------------------------------------------
+# Compiled form — built once at import, read-only afterwards
+# ---------------------------------------------------------------------------
+@dataclass(frozen=True)
+class CompiledTaxonomy:
+    """Read-only, precomputed view of the vocabularies above.
+
+    `enums` maps a field name to {lowercased value: canonical value}, so
+    normalization is one dict lookup instead of a list scan.
+    `subcategories` holds the same per category; `brands` is the
+    precomputed brand matcher.
+    """
+    version: str
+    prompt_vocabulary: str
+    enums: Mapping[str, Mapping[str, str]]
+    subcategories: Mapping[str, Mapping[str, str]]
+    material_primary: frozenset[str]
+    material_synonyms: Mapping[str, str]
+    image_roles: frozenset[str]
+    brands: BrandIndex
+
+
+def _lookup(values) -> Mapping[str, str]:
+    # First spelling wins if two values differ only by case.
+    table: dict[str, str] = {}
+    for v in values:
+        table.setdefault(v.lower(), v)
+    return MappingProxyType(table)
+
+
+def _prompt_vocabulary() -> str:
+    """The controlled-vocabulary section of the analyzer prompt."""
+    return f"""# CONTROLLED VOCABULARIES
+
+category (pick exactly one):
+  {enum_for_prompt(CATEGORIES)}
+
+subcategory (pick exactly one, scoped to your chosen category):
+{subcategories_for_prompt()}
+
+silhouette (pick 1-4 that best apply):
+  {enum_for_prompt(SILHOUETTES)}
+
+primary_color (pick exactly one):
+  {enum_for_prompt(COLORS_PRIMARY)}
+
+secondary_colors (pick 0-3, from the same primary_color list, excluding the primary)
+
+color_palette (pick exactly one):
+  {enum_for_prompt(COLOR_PALETTES)}
+
+pattern (pick exactly one):
+  {enum_for_prompt(PATTERNS)}
+
+primary_material (pick exactly one — your best inference of the dominant fabric):
+  {enum_for_prompt(MATERIAL_PRIMARY)}
+
+condition (pick exactly one grade key):
+{condition_grades_for_prompt()}
+
+era_estimate (pick exactly one or null):
+  {enum_for_prompt(ERA_ESTIMATES)}
+
+style_tags (pick 3-5 that best apply, from this canonical list ONLY):
+  {enum_for_prompt(STYLE_TAGS_CANONICAL)}
+"""
+
+
+def compile_taxonomy() -> CompiledTaxonomy:
+    """Build the compiled form from the module-level vocabularies."""
+    source = {
+        "categories": CATEGORIES,
+        "subcategories": SUBCATEGORIES,
+        "silhouettes": SILHOUETTES,
+        "colors_primary": COLORS_PRIMARY,
+        "color_palettes": COLOR_PALETTES,
+        "patterns": PATTERNS,
+        "condition_grades": CONDITION_GRADES,
+        "era_estimates": ERA_ESTIMATES,
+        "style_tags": STYLE_TAGS_CANONICAL,
+        "brand_aliases": BRAND_ALIASES,
+        "material_primary": MATERIAL_PRIMARY,
+        "material_synonyms": MATERIAL_SYNONYMS,
+        "image_roles": IMAGE_ROLES,
+    }
+    prompt_vocabulary = _prompt_vocabulary()
+    digest = hashlib.sha256(
+        json.dumps(source, ensure_ascii=False).encode() + prompt_vocabulary.encode()
+    ).hexdigest()
+
+    return CompiledTaxonomy(
+        version=digest[:12],
+        prompt_vocabulary=prompt_vocabulary,
+        enums=MappingProxyType({
+            "category": _lookup(CATEGORIES),
+            "silhouette": _lookup(SILHOUETTES),
+            "color": _lookup(COLORS_PRIMARY),
+            "color_palette": _lookup(COLOR_PALETTES),
+            "pattern": _lookup(PATTERNS),
+            "condition": _lookup(k for k, _ in CONDITION_GRADES),
+            "era_estimate": _lookup(ERA_ESTIMATES),
+            "style_tag": _lookup(STYLE_TAGS_CANONICAL),
+            "confidence": _lookup(["high", "medium", "low"]),
+        }),
+        subcategories=MappingProxyType({cat: _lookup(subs) for cat, subs in SUBCATEGORIES.items()}),
+        material_primary=frozenset(MATERIAL_PRIMARY),
+        material_synonyms=MappingProxyType(dict(MATERIAL_SYNONYMS)),
+        image_roles=frozenset(IMAGE_ROLES),
+        brands=BrandIndex(BRAND_ALIASES),
+    )
+
+
+COMPILED = compile_taxonomy()
+TAXONOMY_VERSION = COMPILED.version
@@ -0,0 +1,240 @@
+import random
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from .brand_index import BrandIndex
+from .image_policy import estimate_tokens, for_role
+from .models import APIKey
+from .near_duplicates import Entry, MultiIndexHash, NearDuplicateIndex, format_hash, hash_from_db, hash_to_db, parse_hash
+from .preprocess import edge_box
+from .result_cache import options_key
+from .throttling import PerKeyDayThrottle, PerKeyMinuteThrottle, charge, pace
+from .vector_index import VectorIndex
+
+
+class FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class PerKeyThrottleTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.api_key = APIKey(id=42, organization="test", rate_limit_per_minute=50, rate_limit_per_day=5000)
+        self.request = SimpleNamespace(auth=self.api_key)
+
+    def _throttle(self, cls=PerKeyMinuteThrottle, clock=None):
+        throttle = cls()
+        if clock is not None:
+            throttle.timer = clock
+        return throttle
+
+    def test_concurrent_requests_never_exceed_limit(self):
+        # Start of a window, no previous window: exactly `limit` may pass.
+        clock = FakeClock(600.0)
+        allowed = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(16)
+
+        def worker():
+            barrier.wait()
+            for _ in range(25):
+                ok = self._throttle(clock=clock).allow_request(self.request, None)
+                with lock:
+                    allowed.append(ok)
+
+        threads = [threading.Thread(target=worker) for _ in range(16)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(allowed), 400)
+        self.assertEqual(sum(allowed), 50)
+        # Rejected requests gave their increment back.
+        self.assertEqual(cache.get(f"throttle_listing_api_per_key_minute_42:{int(600 // 60)}"), 50)
+
+    def test_previous_window_is_weighted_by_overlap(self):
+        clock = FakeClock(600.0)
+        for _ in range(50):
+            self.assertTrue(self._throttle(clock=clock).allow_request(self.request, None))
+        self.assertFalse(self._throttle(clock=clock).allow_request(self.request, None))
+
+        # Halfway into the next window, half of the previous 50 still count.
+        clock.now = 690.0
+        passed = sum(self._throttle(clock=clock).allow_request(self.request, None) for _ in range(40))
+        self.assertEqual(passed, 25)
+
+    def test_wait_reports_time_until_a_slot_frees(self):
+        clock = FakeClock(600.0)
+        for _ in range(50):
+            self._throttle(clock=clock).allow_request(self.request, None)
+
+        # A quarter into the next window 37.5 of the previous 50 still count,
+        # leaving room for 12 more.
+        clock.now = 675.0
+        passed = sum(self._throttle(clock=clock).allow_request(self.request, None) for _ in range(12))
+        self.assertEqual(passed, 12)
+        throttle = self._throttle(clock=clock)
+        self.assertFalse(throttle.allow_request(self.request, None))
+        self.assertAlmostEqual(throttle.wait(), 0.6)
+
+        clock.now = 675.0 + throttle.wait() + 0.01
+        self.assertTrue(self._throttle(clock=clock).allow_request(self.request, None))
+
+    def test_limits_come_from_the_api_key(self):
+        self.api_key.rate_limit_per_day = 3
+        clock = FakeClock(86400.0 * 10)
+        results = [self._throttle(PerKeyDayThrottle, clock).allow_request(self.request, None) for _ in range(5)]
+        self.assertEqual(results, [True, True, True, False, False])
+
+    def test_charge_counts_every_item_against_both_limits(self):
+        self.api_key.rate_limit_per_day = 100
+        clock = FakeClock(86400.0 * 10)
+        throttles = []
+        for cls in (PerKeyMinuteThrottle, PerKeyDayThrottle):
+            throttles.append(type(cls.__name__, (cls,), {"timer": clock}))
+
+        self.assertIsNone(charge(self.request, 40, throttles))
+        # 40 + 40 passes the per-minute limit of 50: refused, and the day
+        # counter gets its 40 back.
+        self.assertIsNotNone(charge(self.request, 40, throttles))
+        self.assertIsNone(charge(self.request, 10, throttles))
+        self.assertFalse(self._throttle(clock=clock).allow_request(self.request, None))
+        day = self._throttle(PerKeyDayThrottle, clock)
+        self.assertTrue(day.allow_request(self.request, None, cost=50))
+        self.assertFalse(self._throttle(PerKeyDayThrottle, clock).allow_request(self.request, None))
+
+    def test_batch_larger_than_the_minute_limit_is_paced_not_refused(self):
+        clock = FakeClock(86400.0 * 10)
+        day = type("Day", (PerKeyDayThrottle,), {"timer": clock})
+        minute = type("Minute", (PerKeyMinuteThrottle,), {"timer": clock})
+
+        # 120 garments against a 50/minute key: the day takes the whole cost...
+        self.assertIsNone(charge(self.request, 120, (day,)))
+
+        # ...and each garment then waits for its minute slot.
+        def sleep(seconds):
+            clock.now += seconds
+
+        started = clock.now
+        for _ in range(120):
+            pace(self.request, minute, sleep=sleep)
+        self.assertGreater(clock.now - started, 60)
+        self.assertLess(clock.now - started, 180)
+
+    def test_requests_without_an_api_key_are_not_throttled(self):
+        request = SimpleNamespace(auth=None)
+        self.assertTrue(all(self._throttle().allow_request(request, None) for _ in range(100)))
+
+
+class BrandIndexTests(SimpleTestCase):
+    def test_short_words_need_more_than_one_edit_to_become_a_brand(self):
+        index = BrandIndex({"Salomon": [], "Sandro": [], "Chanel": [], "Maison Margiela": ["Margiela"]})
+        self.assertEqual(index.match("Salmon"), (None, None))
+        self.assertEqual(index.match("Sandra"), (None, None))
+        self.assertEqual(index.match("Chnael"), ("Chanel", "fuzzy"))
+        self.assertEqual(index.match("Maison Margiella"), ("Maison Margiela", "fuzzy"))
+
+    def test_long_names_match_two_substitutions_away(self):
+        index = BrandIndex({"Maison Margiela": [], "Comme des Garcons": []})
+        self.assertEqual(index.match("Maisen Margiala"), ("Maison Margiela", "fuzzy"))
+        self.assertEqual(index.match("Comme des Garcans coat"), ("Comme des Garcons", "fuzzy"))
+        self.assertEqual(index.match("Maisen Margiala Paris"), ("Maison Margiela", "fuzzy"))
+        self.assertEqual(index.match("Maisen Morgaila"), (None, None))
+
+    def test_equally_close_brands_do_not_match(self):
+        index = BrandIndex({"Marc Jacobs": [], "Marc Jacobi": []})
+        self.assertEqual(index.match("Marc Jacobx"), (None, None))
+
+
+class MultiIndexHashTests(SimpleTestCase):
+    def test_find_matches_brute_force(self):
+        rng = random.Random(7)
+        hashes = [rng.getrandbits(64) for _ in range(2000)]
+        # Near copies of a few of them, as a re-shot photo would produce.
+        for h in hashes[:50]:
+            hashes.append(h ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64)))
+        table = MultiIndexHash(max_distance=6)
+        for i, h in enumerate(hashes):
+            table.add(h, Entry(str(i), f"key{i}", 0.0))
+
+        for query in hashes[:60] + [rng.getrandbits(64) for _ in range(20)]:
+            expected = sorted(str(i) for i, h in enumerate(hashes) if (h ^ query).bit_count() <= 6)
+            found = sorted(e.analysis_id for _, e in table.find(query, 6))
+            self.assertEqual(found, expected)
+
+    def test_hash_round_trips_through_the_signed_column(self):
+        for h in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+            stored = hash_to_db(h)
+            self.assertTrue(-(1 << 63) <= stored < (1 << 63))
+            self.assertEqual(hash_from_db(stored), h)
+            self.assertEqual(parse_hash(format_hash(h)), h)
+
+    def test_result_keys_are_tracked_per_owner(self):
+        index = NearDuplicateIndex(ttl=3600, refresh_interval=float("inf"))
+        index._refreshed_at = time.monotonic()  # nothing to load from the DB
+        index.add(1, 0xABC, uuid.uuid4(), "key-a")
+        self.assertTrue(index.has_result(1, "key-a"))
+        # The result cache is shared, so another key reusing it is not indexed yet.
+        self.assertFalse(index.has_result(2, "key-a"))
+        self.assertFalse(index.has_result(1, "key-b"))
+
+    def test_options_key_separates_what_dedupe_must_not_share(self):
+        base = options_key(hint="wool coat", copy_mode="llm", image_policy="uniform")
+        self.assertEqual(base, options_key(hint="wool coat", copy_mode="llm", image_policy="uniform"))
+        self.assertNotEqual(base, options_key(hint="linen shirt", copy_mode="llm", image_policy="uniform"))
+        self.assertNotEqual(base, options_key(hint="wool coat", copy_mode="template", image_policy="uniform"))
+        self.assertNotEqual(base, options_key(hint="wool coat", copy_mode="llm", image_policy="economy"))
+        self.assertNotEqual(
+            base, options_key(hint="wool coat", copy_mode="llm", single_pass=True, image_policy="uniform")
+        )
+
+
+class ImagePolicyTests(SimpleTestCase):
+    def test_token_estimates_follow_the_tiling_rule(self):
+        self.assertEqual(estimate_tokens((4000, 3000), "low"), 85)
+        self.assertEqual(estimate_tokens((1024, 1024), "high"), 765)  # 768x768: 4 tiles
+        self.assertEqual(estimate_tokens((2048, 4096), "high"), 1105)  # 768x1536: 6 tiles
+        self.assertEqual(estimate_tokens((1024, 1024), "auto"), 765)
+
+    def test_roles_fall_back_to_the_default_entry(self):
+        self.assertEqual(for_role("role_aware", "worn").detail, "low")
+        self.assertEqual(for_role("role_aware", "damage").detail, "high")
+        self.assertTrue(for_role("role_aware", "label").crop_label)
+        self.assertFalse(for_role("uniform", "label").crop_label)
+        with self.assertRaises(ValueError):
+            for_role("no_such_policy", "front")
+
+    def test_edge_box_finds_the_text_region(self):
+        rng = np.random.default_rng(3)
+        gray = np.full((256, 192), 200.0) + rng.normal(0, 3, (256, 192))
+        gray[100:160, 40:150] = np.where(rng.random((60, 110)) > 0.6, 20, 235)
+        left, top, right, bottom = edge_box(gray)
+        self.assertTrue(35 <= left <= 50 and 140 <= right <= 155)
+        self.assertTrue(95 <= top <= 110 and 150 <= bottom <= 165)
+        self.assertIsNone(edge_box(np.full((100, 100), 128.0)))
+
+
+class VectorIndexTests(SimpleTestCase):
+    def test_ids_ending_in_nul_bytes_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            index = VectorIndex(Path(tmp) / "t.f32", 4)
+            ids = [uuid.UUID(bytes=bytes(range(1, 16)) + b"\0"), uuid.UUID(int=0), uuid.uuid4()]
+            for i, analysis_id in enumerate(ids):
+                index.append(analysis_id, 7, np.eye(4)[i])
+
+            found = index.search(np.eye(4)[0], k=3, owner_id=7, exclude_id=ids[2])
+            self.assertEqual([a for a, _ in found], [str(ids[0]), str(ids[1])])
+            self.assertEqual(index.get(ids[1], 7).tolist(), [0.0, 1.0, 0.0, 0.0])
@@ -1,11 +1,30 @@
 """Per-API-key throttling.
 
-Uses DRF's SimpleRateThrottle. Rate limits are read from the APIKey instance
-(so each customer can have different limits set in admin).
+Uses DRF's SimpleRateThrottle interface. Rate limits are read from the APIKey
+instance (so each customer can have different limits set in admin).
+
+Counting is a sliding-window counter rather than DRF's timestamp list: each
+key has one integer per fixed window, bumped with the cache's atomic
+add/incr, and a request is allowed when
+
+    previous_window_count * (1 - fraction_of_current_window_elapsed)
+    + current_window_count  <=  limit
+
+That weights the previous window by how much of it still overlaps the
+sliding window, which is within a request or two of an exact sliding log,
+and costs one get plus one incr per request at any limit (a 5000/day key no
+longer round-trips a 5000-float list). A rejected request gives its
+increment back, so bursts of rejects don't eat into the next window.
+
+Requests that do more than one analysis (the batch endpoint) are charged
+per garment against the daily limit up front with `charge(request, n)`, and
+spread over the per-minute limit as they run with `pace(request)`.
 """
 
 from __future__ import annotations
 
+import time
+
 from rest_framework.throttling import SimpleRateThrottle
 
 from .models import APIKey
@@ -31,23 +50,60 @@ class _PerKeyRateThrottle(SimpleRateThrottle):
     def get_rate(self):
         return self.default_rate
 
-    def allow_request(self, request, view):
+    def allow_request(self, request, view, cost: int = 1):
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.num_requests, self.duration = self.limit(request)
+
+        now = self.timer()
+        window = int(now // self.duration)
+        self._elapsed = (now % self.duration) / self.duration
+        current_key = f"{self.key}:{window}"
+        self._current_key, self._cost = current_key, cost
+
+        self._previous = self.cache.get(f"{self.key}:{window - 1}", 0)
+        # Two windows of TTL: this one is read as "previous" by the next.
+        self.cache.add(current_key, 0, timeout=self.duration * 2)
+        try:
+            self._current = self.cache.incr(current_key, cost)
+        except ValueError:
+            # Evicted between add and incr; start the window over.
+            self.cache.set(current_key, cost, timeout=self.duration * 2)
+            self._current = cost
+
+        if self._estimate() > self.num_requests:
+            self.refund()
+            return False
+        return True
+
+    def limit(self, request) -> tuple[int, int]:
+        """(requests, seconds) allowed for this request's API key."""
         # If the request is carrying an APIKey, use its per-key limit rather than the default.
-        if hasattr(request, "auth") and isinstance(request.auth, APIKey):
-            limit = getattr(request.auth, self.apikey_field, None)
-            if isinstance(limit, int) and limit > 0:
-                self.num_requests, self.duration = limit, self._duration_seconds()
-                self.key = self.get_cache_key(request, view)
-                if self.key is None:
-                    return True
-                self.history = self.cache.get(self.key, [])
-                self.now = self.timer()
-                while self.history and self.history[-1] <= self.now - self.duration:
-                    self.history.pop()
-                if len(self.history) >= self.num_requests:
-                    return self.throttle_failure()
-                return self.throttle_success()
-        return super().allow_request(request, view)
+        limit = getattr(request.auth, self.apikey_field, None)
+        if isinstance(limit, int) and limit > 0:
+            return limit, self._duration_seconds()
+        return self.parse_rate(self.get_rate())
+
+    def refund(self) -> None:
+        """Give back what the last allow_request() counted."""
+        try:
+            self.cache.decr(self._current_key, self._cost)
+        except ValueError:
+            pass
+
+    def _estimate(self) -> float:
+        return self._previous * (1 - self._elapsed) + self._current
+
+    def wait(self):
+        """Seconds until this request would fit (for Retry-After)."""
+        excess = self._estimate() - self.num_requests
+        decaying = self._previous * (1 - self._elapsed)
+        if self._previous and excess <= decaying:
+            # The previous window's weight alone drains the excess.
+            return excess / self._previous * self.duration
+        return (1 - self._elapsed) * self.duration
 
     def _duration_seconds(self) -> int:
         return {"sec": 1, "min": 60, "hour": 3600, "day": 86400}[self.period]
@@ -65,3 +121,36 @@ class PerKeyDayThrottle(_PerKeyRateThrottle):
     apikey_field = "rate_limit_per_day"
     period = "day"
     default_rate = "5000/day"
+
+
+def charge(request, cost: int, throttles=(PerKeyMinuteThrottle, PerKeyDayThrottle)) -> float | None:
+    """Count `cost` more requests against each of `throttles`, all or nothing.
+
+    Returns None if every limit allows it, else the refusing throttle's wait
+    in seconds (anything already counted is given back).
+    """
+    if cost <= 0:
+        return None
+    charged = []
+    for cls in throttles:
+        throttle = cls()
+        if not throttle.allow_request(request, None, cost=cost):
+            for t in charged:
+                t.refund()
+            return throttle.wait()
+        if throttle.key is not None:
+            charged.append(throttle)
+    return None
+
+
+def pace(request, throttle_class=PerKeyMinuteThrottle, sleep=time.sleep) -> None:
+    """Block until `throttle_class` admits one more request, then count it.
+
+    For work that is already paid for (charge) but must not run faster than
+    the key's rate: each garment of a batch waits for a per-minute slot.
+    """
+    while True:
+        throttle = throttle_class()
+        if throttle.allow_request(request, None):
+            return
+        sleep(max(throttle.wait(), 0.05))
@@ -0,0 +1,226 @@
+"""Reading uploaded images without buffering them more than once.
+
+Django hands multipart files to a view as an InMemoryUploadedFile (small
+files, already a BytesIO) or a TemporaryUploadedFile (spooled to disk past
+FILE_UPLOAD_MAX_MEMORY_SIZE). Calling `f.read()` and checking the length
+afterwards means an oversize upload is fully buffered before it is refused,
+and every read is another full copy.
+
+  - `limit_uploads(request)` puts `LimitedUploadHandler` in front of Django's
+    handlers. It counts bytes while the multipart body is parsed and drops a
+    file as soon as it passes the limit, so a 200MB upload never reaches
+    memory or disk; `check_rejected(request)` turns that into a client error.
+    `max_files` raises the number of file parts that request may carry
+    (`FileCountHandler`, installed site-wide at DEFAULT_MAX_FILES).
+  - `read_image(f)` returns the upload's bytes with no extra copy for
+    in-memory files (the BytesIO's own buffer) and exactly one read, into a
+    preallocated buffer, for spooled ones. The image type is sniffed from the
+    header bytes before anything is decoded; a header we don't recognise is
+    only refused if PIL can't identify the file either.
+
+The result is what ImageInput.bytes_data carries into preprocess, the result
+cache key and the job table; all of them accept any bytes-like object.
+"""
+
+from __future__ import annotations
+
+import io
+
+from django.core.exceptions import TooManyFilesSent
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+
+from .analyzer import AnalyzerError
+
+MAX_IMAGE_BYTES = 10 * 1024 * 1024  # 10MB per image
+DEFAULT_MAX_FILES = 100  # Django's own DATA_UPLOAD_MAX_NUMBER_FILES default
+
+SUPPORTED_TYPES = ("JPEG", "PNG", "WebP", "GIF", "HEIC", "AVIF")
+
+# ISO-BMFF brands for HEIC/HEIF stills (what iPhones upload).
+_HEIF_BRANDS = {b"heic", b"heix", b"heim", b"heis", b"hevc", b"hevx", b"hevm", b"hevs", b"mif1", b"msf1"}
+# ...and for AVIF stills and sequences (what recent Android phones upload).
+_AVIF_BRANDS = {b"avif", b"avis"}
+
+
+def sniff_image_type(header: bytes) -> str | None:
+    """Image type from the first bytes of a file, or None if unrecognised."""
+    header = bytes(header[:16])
+    if header.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if header[4:8] == b"ftyp" and header[8:12] in _HEIF_BRANDS:
+        return "heic"
+    if header[4:8] == b"ftyp" and header[8:12] in _AVIF_BRANDS:
+        return "avif"
+    if header[:4] in (b"II*\x00", b"MM\x00*"):
+        return "tiff"
+    if header[:2] == b"BM":
+        return "bmp"
+    return None
+
+
+def _too_large(name: str, max_bytes: int) -> str:
+    return f"image '{name}' exceeds {max_bytes // (1024 * 1024)}MB limit"
+
+
+# ---------------------------------------------------------------------------
+# Limit enforced while the multipart body is parsed
+# ---------------------------------------------------------------------------
+class LimitedUploadHandler(FileUploadHandler):
+    """Drops any uploaded file larger than `max_bytes` mid-stream.
+
+    Chunks are passed through untouched to the next handler (memory or
+    temporary file) until the limit is crossed; the file is then skipped and
+    its name kept in `rejected`.
+    """
+
+    def __init__(self, request=None, max_bytes: int = MAX_IMAGE_BYTES):
+        super().__init__(request)
+        self.max_bytes = max_bytes
+        self.rejected: list[str] = []
+        self._received = 0
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self._received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self._received += len(raw_data)
+        if self._received > self.max_bytes:
+            self.rejected.append(self.file_name or self.field_name or "upload")
+            raise SkipFile()
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+class FileCountHandler(FileUploadHandler):
+    """Refuses a request with more than `max_files` file parts.
+
+    First in FILE_UPLOAD_HANDLERS, so every endpoint gets Django's usual
+    limit; DATA_UPLOAD_MAX_NUMBER_FILES is set higher only so that
+    limit_uploads(max_files=...) can lift it for the batch endpoint.
+    """
+
+    def __init__(self, request=None, max_files: int = DEFAULT_MAX_FILES):
+        super().__init__(request)
+        self.max_files = max_files
+        self._count = 0
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self._count += 1
+        if self._count > self.max_files:
+            # What Django raises for DATA_UPLOAD_MAX_NUMBER_FILES: a 400.
+            raise TooManyFilesSent(f"The number of files exceeded {self.max_files}.")
+
+    def receive_data_chunk(self, raw_data, start):
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+def _django_request(request):
+    # DRF wraps the HttpRequest; upload handlers live on the inner one.
+    return getattr(request, "_request", request)
+
+
+def limit_uploads(request, max_bytes: int = MAX_IMAGE_BYTES, max_files: int | None = None) -> None:
+    """Enforce `max_bytes` per file while parsing, and allow up to
+    `max_files` files if given. Call before touching request.FILES /
+    request.POST / request.data."""
+    raw = _django_request(request)
+    if max_files is not None:
+        for handler in raw.upload_handlers:
+            if isinstance(handler, FileCountHandler):
+                handler.max_files = max_files
+    raw.upload_handlers.insert(0, LimitedUploadHandler(raw, max_bytes))
+
+
+def check_rejected(request) -> None:
+    """Raise AnalyzerError if limit_uploads() dropped a file."""
+    for handler in _django_request(request).upload_handlers:
+        if isinstance(handler, LimitedUploadHandler) and handler.rejected:
+            raise AnalyzerError(_too_large(handler.rejected[0], handler.max_bytes))
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+def read_image(f, max_bytes: int = MAX_IMAGE_BYTES) -> bytes | memoryview:
+    """Return the upload's contents as a bytes-like object, checked against
+    `max_bytes` and sniffed as an image. Raises AnalyzerError otherwise."""
+    name = getattr(f, "name", "") or "upload"
+    size = getattr(f, "size", None)
+    if size is not None and size > max_bytes:
+        raise AnalyzerError(_too_large(name, max_bytes))
+
+    inner = getattr(f, "file", None)
+    if isinstance(inner, io.BytesIO):
+        # getvalue() hands back the BytesIO's own bytes object (no copy),
+        # which io.BytesIO() in preprocess shares again.
+        data = inner.getvalue()
+    elif size is not None:
+        data = _read_into(f, size)
+    else:
+        data = _read_chunks(f, max_bytes, name)
+
+    if len(data) > max_bytes:
+        raise AnalyzerError(_too_large(name, max_bytes))
+    if not data:
+        raise AnalyzerError(f"image '{name}' is empty")
+    if sniff_image_type(data[:16]) is None and not _pil_identifies(data):
+        raise AnalyzerError(
+            f"image '{name}' is not a supported image type ({', '.join(SUPPORTED_TYPES)})"
+        )
+    return data
+
+
+def _pil_identifies(data) -> bool:
+    """Whether PIL (with whatever plugins are installed) recognises `data`.
+
+    Only reached for headers sniff_image_type doesn't know. Image.open reads
+    the header, not the pixels, so this stays cheap.
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.verify()
+    except Exception:
+        return False
+    return True
+
+
+def _read_into(f, size: int) -> memoryview:
+    """One read of a spooled upload into a buffer sized up front."""
+    f.seek(0)
+    buf = bytearray(size)
+    view = memoryview(buf)
+    filled = 0
+    while filled < size:
+        n = f.readinto(view[filled:])
+        if not n:
+            break
+        filled += n
+    return view[:filled]
+
+
+def _read_chunks(f, max_bytes: int, name: str) -> memoryview:
+    """Read an upload of unknown size, refusing it once it passes `max_bytes`."""
+    if hasattr(f, "seek"):
+        f.seek(0)
+    buf = bytearray()
+    chunks = f.chunks() if hasattr(f, "chunks") else iter(lambda: f.read(64 * 1024), b"")
+    for chunk in chunks:
+        buf += chunk  # bytearray grows in place (amortized), unlike bytes +=
+        if len(buf) > max_bytes:
+            raise AnalyzerError(_too_large(name, max_bytes))
+    return memoryview(buf)
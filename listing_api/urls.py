@@ -9,7 +9,12 @@ urlpatterns = [
     path("demo/", views.demo, name="demo"),
     path("docs/", views.docs, name="docs"),
     path("api/v1/health/", views.health, name="health"),
+    path("metrics/", views.metrics_view, name="metrics"),
     path("api/v1/analyze/", views.analyze, name="analyze"),
+    path("api/v1/analyze/batch/", views.analyze_batch, name="analyze_batch"),
+    path("api/v1/search/", views.search, name="search"),
+    path("api/v1/jobs/", views.create_job, name="create_job"),
+    path("api/v1/jobs/<uuid:job_id>/", views.job_detail, name="job_detail"),
 
     # Eval / ground-truth labeling (dev + staff only; gated inside the views)
     path("eval/", eval_views.label_index, name="label_index"),
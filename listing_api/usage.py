@@ -0,0 +1,260 @@
+"""Usage logging for the Listing API.
+
+Every analysis (sync, async job, batch item, or demo) is recorded as one
+AnalysisRequest row for usage reporting and billing.
+
+Rows are not inserted on the request path. `log_request` / `log_requests`
+hand them to a process-wide `UsageRecorder`, which inserts them with
+`bulk_create` from a background thread once LISTING_USAGE_FLUSH_SIZE rows are
+queued or LISTING_USAGE_FLUSH_INTERVAL seconds have passed. If the insert
+fails (database unreachable), the rows are appended to a local JSON-lines
+spill file instead and replayed on a later successful flush, so a DB blip
+costs latency for nobody and loses no usage.
+
+LISTING_USAGE_BUFFERED=0 writes synchronously (management commands, tests).
+"""
+
+from __future__ import annotations
+
+import atexit
+import base64
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AnalysisRequest, APIKey
+from .near_duplicates import hash_to_db, parse_hash
+from .vector_index import vector_to_bytes
+
+USAGE_BUFFERED = os.getenv("LISTING_USAGE_BUFFERED", "1") == "1"
+USAGE_FLUSH_SIZE = int(os.getenv("LISTING_USAGE_FLUSH_SIZE", "50"))
+USAGE_FLUSH_INTERVAL = float(os.getenv("LISTING_USAGE_FLUSH_INTERVAL", "2"))
+
+
+def build_usage_row(
+    api_key, source, images, success, error="", include_embeddings=True, result=None, analysis_id=None,
+) -> AnalysisRequest:
+    """Return an unsaved AnalysisRequest describing one analysis."""
+    meta = (result or {}).get("_meta", {}) if result else {}
+    analyzer_meta = meta.get("analyzer", {}) or {}
+    copy_meta = meta.get("copy_generator", {}) or {}
+    embeddings = (result or {}).get("embeddings") or {}
+    extra = {"analysis_id": analysis_id} if analysis_id else {}
+    return AnalysisRequest(
+        **extra,
+        api_key=api_key if isinstance(api_key, APIKey) else None,
+        source=source,
+        image_count=len(images) if images else 0,
+        processing_time_ms=meta.get("elapsed_ms", 0),
+        model_used=analyzer_meta.get("model", ""),
+        input_tokens=analyzer_meta.get("input_tokens", 0) + copy_meta.get("input_tokens", 0),
+        cached_input_tokens=analyzer_meta.get("cached_input_tokens", 0) + copy_meta.get("cached_input_tokens", 0),
+        output_tokens=analyzer_meta.get("output_tokens", 0) + copy_meta.get("output_tokens", 0),
+        embeddings_included=include_embeddings,
+        success=success,
+        error_message=(error or "")[:2000],
+        text_embedding=vector_to_bytes((embeddings.get("text") or {}).get("vector")) or None,
+        image_embedding=vector_to_bytes((embeddings.get("image") or {}).get("vector")) or None,
+        perceptual_hash=hash_to_db(parse_hash(meta.get("perceptual_hash"))),
+        result_key=meta.get("result_key") or "",
+        created_at=timezone.now(),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Spill file (JSON lines, one row per line)
+# ---------------------------------------------------------------------------
+def row_to_json(row: AnalysisRequest) -> str:
+    data = {}
+    for f in AnalysisRequest._meta.concrete_fields:
+        if f.primary_key:
+            continue
+        value = getattr(row, f.attname)
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            value = {"b64": base64.b64encode(bytes(value)).decode("ascii")}
+        elif isinstance(value, uuid.UUID):
+            value = str(value)
+        elif hasattr(value, "isoformat"):
+            value = value.isoformat()
+        data[f.attname] = value
+    return json.dumps(data)
+
+
+def row_from_json(line: str) -> AnalysisRequest:
+    data = json.loads(line)
+    for name, value in data.items():
+        if isinstance(value, dict) and "b64" in value:
+            data[name] = base64.b64decode(value["b64"])
+    data["created_at"] = parse_datetime(data["created_at"]) if data.get("created_at") else timezone.now()
+    data["analysis_id"] = uuid.UUID(data["analysis_id"])
+    return AnalysisRequest(**data)
+
+
+def _spill_path() -> Path:
+    default = settings.BASE_DIR / "var" / "usage_spill.jsonl"
+    return Path(getattr(settings, "LISTING_USAGE_SPILL_PATH", default))
+
+
+# ---------------------------------------------------------------------------
+# Recorder
+# ---------------------------------------------------------------------------
+class UsageRecorder:
+    """Buffers usage rows in memory and inserts them in batches off the request path."""
+
+    def __init__(self, flush_size: int = USAGE_FLUSH_SIZE, flush_interval: float = USAGE_FLUSH_INTERVAL):
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_interval
+        self._queue: list[AnalysisRequest] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one flush (and replay) at a time
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def record(self, rows: list[AnalysisRequest]) -> None:
+        if not rows:
+            return
+        with self._lock:
+            self._queue.extend(rows)
+            pending = len(self._queue)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="listing-usage", daemon=True)
+                self._thread.start()
+        if pending >= self.flush_size:
+            self._wake.set()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._queue)
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[listing_api] usage flush crashed: {e}")
+            finally:
+                close_old_connections()
+
+    def flush(self) -> int:
+        """Insert everything queued (spilling on DB failure); returns rows inserted."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._queue = self._queue, []
+            if not rows:
+                # Quiet period: a good time to retry anything spilled earlier.
+                return self._replay_spill()
+            if not self._insert(rows):
+                self._spill(rows)
+                return 0
+            return len(rows) + self._replay_spill()
+
+    @staticmethod
+    def _insert(rows: list[AnalysisRequest]) -> bool:
+        try:
+            # All-or-nothing, so a failed batch can be spilled and replayed
+            # without duplicating the rows that made it in.
+            with transaction.atomic():
+                AnalysisRequest.objects.bulk_create(rows, batch_size=500)
+            return True
+        except Exception as e:
+            print(f"[listing_api] usage insert failed ({len(rows)} rows), spilling: {e}")
+            return False
+
+    @staticmethod
+    def _spill(rows: list[AnalysisRequest]) -> None:
+        path = _spill_path()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("".join(row_to_json(r) + "\n" for r in rows))
+        except Exception as e:
+            print(f"[listing_api] usage spill failed, {len(rows)} rows lost: {e}")
+
+    def _replay_spill(self) -> int:
+        path = _spill_path()
+        if not path.exists():
+            return 0
+        # Claim the file by renaming it, so two workers never replay the same rows.
+        claimed = path.with_name(f"{path.name}.{os.getpid()}.replay")
+        try:
+            os.replace(path, claimed)
+        except FileNotFoundError:
+            return 0
+
+        rows, bad = [], 0
+        with open(claimed, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(row_from_json(line))
+                except Exception:
+                    bad += 1
+        if bad:
+            print(f"[listing_api] usage replay skipped {bad} unreadable spill lines")
+
+        try:
+            # A key deleted since the spill would fail the whole batch on its FK.
+            key_ids = {r.api_key_id for r in rows if r.api_key_id is not None}
+            live = set(APIKey.objects.filter(pk__in=key_ids).values_list("pk", flat=True))
+            for r in rows:
+                if r.api_key_id is not None and r.api_key_id not in live:
+                    r.api_key_id = None
+            with transaction.atomic():
+                # analysis_id is unique: a row replayed twice is a no-op.
+                AnalysisRequest.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+        except Exception as e:
+            print(f"[listing_api] usage replay failed, keeping {len(rows)} spilled rows: {e}")
+            self._spill(rows)
+            claimed.unlink(missing_ok=True)
+            return 0
+        claimed.unlink(missing_ok=True)
+        print(f"[listing_api] replayed {len(rows)} spilled usage rows")
+        return len(rows)
+
+
+recorder = UsageRecorder()
+
+
+@atexit.register
+def _flush_at_exit() -> None:
+    if recorder.pending():
+        try:
+            recorder.flush()
+        except Exception as e:
+            print(f"[listing_api] usage flush at exit failed: {e}")
+
+
+def _record(rows: list[AnalysisRequest]) -> None:
+    if USAGE_BUFFERED:
+        recorder.record(rows)
+    elif not UsageRecorder._insert(rows):
+        UsageRecorder._spill(rows)
+
+
+def log_request(api_key, source, images, success, error="", include_embeddings=True, result=None, analysis_id=None):
+    try:
+        row = build_usage_row(
+            api_key, source, images, success,
+            error=error, include_embeddings=include_embeddings, result=result, analysis_id=analysis_id,
+        )
+    except Exception as e:
+        print(f"[listing_api] usage log skipped: {e}")
+        return
+    _record([row])
+
+
+def log_requests(rows: list[AnalysisRequest]) -> None:
+    """Record many usage rows at once (batch endpoint)."""
+    if rows:
+        _record(rows)
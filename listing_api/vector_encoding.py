@@ -0,0 +1,72 @@
+"""Wire encodings for embedding vectors in API responses.
+
+A 768 + 512 float response as JSON decimal text is ~25KB and a noticeable
+chunk of serialization time. Clients pick a compact form with
+`embedding_format`:
+
+  float       JSON list of floats (default, unchanged)
+  base64_f32  base64 of little-endian float32 — the same layout as
+              embeddings.embed_text_bytes / AnalysisRequest.*_embedding
+  base64_f16  base64 of little-endian float16 (half the size, ~1e-3 error)
+  int8        base64 of int8 values; multiply by `scale` to recover floats
+
+Every embedding payload carries `encoding` so clients can branch on it.
+"""
+
+from __future__ import annotations
+
+import base64
+
+import numpy as np
+
+EMBEDDING_FORMATS = ("float", "base64_f32", "base64_f16", "int8")
+
+
+def encode_vector(vec, fmt: str) -> dict:
+    """Return the `vector` (+ `scale` for int8) fields for one vector in `fmt`."""
+    if fmt == "float":
+        return {"vector": list(vec)}
+    arr = np.asarray(vec, dtype="<f4")
+    if fmt == "base64_f32":
+        return {"vector": base64.b64encode(arr.tobytes()).decode("ascii")}
+    if fmt == "base64_f16":
+        return {"vector": base64.b64encode(arr.astype("<f2").tobytes()).decode("ascii")}
+    if fmt == "int8":
+        # Symmetric per-vector quantization: the largest component maps to 127.
+        peak = float(np.abs(arr).max()) if arr.size else 0.0
+        scale = peak / 127.0 if peak else 1.0
+        q = np.clip(np.rint(arr / scale), -127, 127).astype("i1")
+        return {"vector": base64.b64encode(q.tobytes()).decode("ascii"), "scale": scale}
+    raise ValueError(f"unknown embedding_format '{fmt}' (allowed: {EMBEDDING_FORMATS})")
+
+
+def decode_vector(payload: dict) -> np.ndarray:
+    """Inverse of `encode_vector` for a payload carrying `encoding`."""
+    fmt = payload.get("encoding", "float")
+    vec = payload.get("vector")
+    if fmt == "float":
+        return np.asarray(vec, dtype="<f4")
+    raw = base64.b64decode(vec)
+    if fmt == "base64_f32":
+        return np.frombuffer(raw, dtype="<f4")
+    if fmt == "base64_f16":
+        return np.frombuffer(raw, dtype="<f2").astype("<f4")
+    if fmt == "int8":
+        return np.frombuffer(raw, dtype="i1").astype("<f4") * float(payload["scale"])
+    raise ValueError(f"unknown embedding encoding '{fmt}'")
+
+
+def encode_embeddings(embeddings: dict | None, fmt: str = "float") -> dict | None:
+    """Return a copy of a pipeline `embeddings` block with vectors in `fmt`."""
+    if not embeddings:
+        return embeddings
+    out = {}
+    for space, payload in embeddings.items():
+        if not payload or payload.get("vector") is None:
+            out[space] = payload
+            continue
+        encoded = {k: v for k, v in payload.items() if k != "vector"}
+        encoded["encoding"] = fmt
+        encoded.update(encode_vector(payload["vector"], fmt))
+        out[space] = encoded
+    return out
@@ -0,0 +1,214 @@
+"""Memory-mapped float32 vector index for similarity search over analyses.
+
+Each embedding space (BGE text, CLIP image) is one append-only file of
+fixed-size records:
+
+  analysis_id  16 bytes (UUID)
+  owner        int64    (APIKey pk, -1 for demo/none)
+  vector       float32[dim], L2-normalized
+
+New analyses are appended with a single write, so every process (gunicorn
+workers, job threads) can share the files. Readers memory-map them and
+re-map when the file grows; search is a single matrix-vector product, so
+cosine similarity reduces to a dot product. Results are scoped to the
+caller's API key.
+
+The files are a derived cache: AnalysisRequest.text_embedding /
+image_embedding hold the same vectors, and
+`python manage.py rebuild_listing_index` regenerates the files from them.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import uuid
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from oracle_frontend.embeddings import BGE_DIM, CLIP_DIM
+
+SPACES = {"text": BGE_DIM, "image": CLIP_DIM}
+
+
+def vector_to_bytes(vec) -> bytes:
+    """float32 little-endian bytes (same layout as embeddings.embed_text_bytes)."""
+    if vec is None or len(vec) == 0:
+        return b""
+    return np.asarray(vec, dtype="<f4").tobytes()
+
+
+def bytes_to_vector(raw) -> np.ndarray | None:
+    if not raw:
+        return None
+    return np.frombuffer(bytes(raw), dtype="<f4")
+
+
+class VectorIndex:
+    """One append-only, memory-mapped record file for a single embedding space."""
+
+    def __init__(self, path: Path, dim: int):
+        self.path = Path(path)
+        self.dim = dim
+        # Raw bytes, not "S16": numpy strips trailing NULs from S fields, so
+        # about 1 in 256 UUIDs would read back short. Same on-disk layout.
+        self.dtype = np.dtype([("id", "V16"), ("owner", "<i8"), ("vec", "<f4", (dim,))])
+        self._lock = threading.Lock()
+        self._mmap = None
+        self._mapped_size = -1
+
+    # -- writes ---------------------------------------------------------------
+    def append(self, analysis_id: uuid.UUID, owner_id: int | None, vec) -> None:
+        record = np.zeros(1, dtype=self.dtype)
+        record["id"] = analysis_id.bytes
+        record["owner"] = owner_id if owner_id is not None else -1
+        record["vec"] = np.asarray(vec, dtype="<f4")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # One O_APPEND write per record keeps concurrent writers from interleaving.
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, record.tobytes())
+        finally:
+            os.close(fd)
+
+    def write_all(self, records: list[tuple[uuid.UUID, int | None, bytes]]) -> int:
+        """Replace the file with `records` (used by the rebuild command)."""
+        arr = np.zeros(len(records), dtype=self.dtype)
+        for i, (analysis_id, owner_id, raw) in enumerate(records):
+            arr["id"][i] = analysis_id.bytes
+            arr["owner"][i] = owner_id if owner_id is not None else -1
+            arr["vec"][i] = bytes_to_vector(raw)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        arr.tofile(tmp)
+        os.replace(tmp, self.path)
+        with self._lock:
+            self._mmap, self._mapped_size = None, -1
+        return len(records)
+
+    # -- reads ----------------------------------------------------------------
+    def _records(self):
+        """Return the current memory map, re-mapping if the file grew."""
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            return None
+        n = size // self.dtype.itemsize
+        if n == 0:
+            return None
+        with self._lock:
+            if self._mmap is None or size != self._mapped_size:
+                self._mmap = np.memmap(self.path, dtype=self.dtype, mode="r", shape=(n,))
+                self._mapped_size = size
+            return self._mmap
+
+    def __len__(self) -> int:
+        records = self._records()
+        return 0 if records is None else len(records)
+
+    def get(self, analysis_id: uuid.UUID, owner_id: int | None) -> np.ndarray | None:
+        """Return the vector for an analysis, if it belongs to `owner_id`."""
+        records = self._records()
+        if records is None:
+            return None
+        owner = owner_id if owner_id is not None else -1
+        hits = np.flatnonzero((records["id"] == np.void(analysis_id.bytes)) & (records["owner"] == owner))
+        if not len(hits):
+            return None
+        return np.array(records["vec"][hits[-1]])
+
+    def search(
+        self,
+        query,
+        k: int = 10,
+        owner_id: int | None = None,
+        exclude_id: uuid.UUID | None = None,
+    ) -> list[tuple[str, float]]:
+        """Top-k cosine search. Returns [(analysis_id, score)], best first."""
+        records = self._records()
+        if records is None:
+            return []
+        q = np.asarray(query, dtype="<f4")
+        scores = records["vec"] @ q
+        mask = records["owner"] != (owner_id if owner_id is not None else -1)
+        if exclude_id is not None:
+            mask |= records["id"] == np.void(exclude_id.bytes)
+        scores = np.where(mask, -np.inf, scores)
+
+        k = min(k, int((~mask).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(str(uuid.UUID(bytes=bytes(records["id"][i]))), float(scores[i])) for i in top]
+
+
+_indexes: dict[str, VectorIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(space: str) -> VectorIndex:
+    """Return the process-wide index for "text" or "image"."""
+    with _indexes_lock:
+        if space not in _indexes:
+            directory = Path(getattr(settings, "LISTING_VECTOR_DIR", settings.BASE_DIR / "var" / "listing_vectors"))
+            _indexes[space] = VectorIndex(directory / f"{space}.f32", SPACES[space])
+        return _indexes[space]
+
+
+def index_result(analysis_id: uuid.UUID, api_key, result: dict) -> None:
+    """Append a pipeline result's embeddings to the search indexes, and its
+    front image hash to the near-duplicate index.
+
+    Results served from the result cache are indexed under the new id too:
+    the cache is shared across API keys, so the analysis they came from may
+    belong to another key's index. Only when the same key already has that
+    cached result indexed are the vectors skipped (listing the garment once
+    per upload in /search); the front image hash is still recorded, since a
+    re-photographed garment's hash differs from the original's.
+    """
+    from .near_duplicates import get_index as get_near_duplicate_index, parse_hash
+
+    meta = result.get("_meta") or {}
+    owner_id = getattr(api_key, "pk", None)
+    result_key = meta.get("result_key")
+    near_duplicates = get_near_duplicate_index()
+    already_indexed = bool(
+        meta.get("cache_hit") and result_key and near_duplicates.has_result(owner_id, result_key)
+    )
+    phash = parse_hash(meta.get("perceptual_hash"))
+    if phash is not None and result_key:
+        near_duplicates.add(owner_id, phash, analysis_id, result_key)
+    if already_indexed:
+        return
+    embeddings = result.get("embeddings") or {}
+    for space in SPACES:
+        payload = embeddings.get(space) or {}
+        vec = payload.get("vector")
+        if not vec:
+            continue
+        try:
+            get_index(space).append(analysis_id, owner_id, vec)
+        except Exception as e:
+            print(f"[vector_index] append to {space} index failed: {e}")
+
+
+def vector_for_analysis(analysis_id: uuid.UUID, space: str, owner_id: int | None) -> np.ndarray | None:
+    """Look up a prior analysis' vector: the index first, then the DB row.
+
+    Only analyses made with `owner_id`'s key are visible.
+    """
+    vec = get_index(space).get(analysis_id, owner_id)
+    if vec is not None:
+        return vec
+
+    from .models import AnalysisRequest
+
+    raw = (
+        AnalysisRequest.objects.filter(analysis_id=analysis_id, api_key_id=owner_id)
+        .values_list(f"{space}_embedding", flat=True)
+        .first()
+    )
+    return bytes_to_vector(raw)
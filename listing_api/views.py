@@ -1,10 +1,16 @@
 from __future__ import annotations
 
+import hmac
 import json
+import math
+import time
+import uuid
 
-from django.conf import settings
-from django.http import JsonResponse
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
@@ -15,23 +21,73 @@ from rest_framework.decorators import (
     permission_classes,
     throttle_classes,
 )
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from .analyzer import AnalyzerError, ImageInput
+from .batch import MAX_BATCH_ITEMS, MAX_IMAGES_PER_ITEM, parse_manifest, stream_batch
+from .copy_generator import COPY_MODE, COPY_MODES
 from .auth import APIKeyAuthentication
-from .models import AnalysisRequest, APIKey
+from . import jobs, metrics
+from .models import AnalysisJob, AnalysisJobImage, APIKey
 from .pipeline import run_pipeline
+from .responses import analysis_body, job_body
+from .result_cache import run_pipeline_cached
+from .streaming import iter_pipeline, sse_event, stream_analysis
 from .taxonomy import IMAGE_ROLES
-from .throttling import PerKeyDayThrottle, PerKeyMinuteThrottle
+from .throttling import PerKeyDayThrottle, PerKeyMinuteThrottle, charge
+from .uploads import MAX_IMAGE_BYTES, check_rejected, limit_uploads, read_image
+from .usage import log_request
+from .vector_encoding import EMBEDDING_FORMATS, encode_embeddings
+from .vector_index import get_index, index_result, vector_for_analysis
 
 
 # ---------------------------------------------------------------------------
 # Health
 # ---------------------------------------------------------------------------
 def health(request):
-    return JsonResponse({"status": "ok", "service": "listing_api"})
+    """Liveness by default; with ?ready=1, a readiness probe that answers 503
+    until this worker has BGE + CLIP loaded.
+
+    The endpoint is unauthenticated, so it only says whether each model is
+    loaded; the pid, backend, timings and load errors go to the log.
+    """
+    from oracle_frontend.embeddings import model_status
+
+    status = model_status()
+    body = {
+        "status": "ok",
+        "service": "listing_api",
+        "ready": status["ready"],
+        "models": {
+            name: {"loaded": m["loaded"], "loading": m["loading"]}
+            for name, m in status["models"].items()
+        },
+    }
+    if _parse_bool(request.GET.get("ready"), default=False) and not status["ready"]:
+        print(f"[listing_api] not ready (pid {status['pid']}): {status['models']}")
+        body["status"] = "starting"
+        return JsonResponse(body, status=503)
+    return JsonResponse(body)
+
+
+# ---------------------------------------------------------------------------
+# Metrics — Prometheus text format
+# ---------------------------------------------------------------------------
+def metrics_view(request):
+    """Per-stage latency histograms for this worker process (see metrics.py).
+
+    Series are labelled by API key, so this is never public: it 404s unless
+    LISTING_METRICS_TOKEN is set, and then requires
+    `Authorization: Bearer <token>`.
+    """
+    if not metrics.METRICS_TOKEN:
+        return HttpResponse("not found\n", status=404, content_type="text/plain")
+    supplied = request.META.get("HTTP_AUTHORIZATION", "")
+    if not hmac.compare_digest(supplied, f"Bearer {metrics.METRICS_TOKEN}"):
+        return HttpResponse("unauthorized\n", status=401, content_type="text/plain")
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
 
 
 # ---------------------------------------------------------------------------
@@ -68,11 +124,11 @@ def docs(request):
 # ---------------------------------------------------------------------------
 # Demo (browser-friendly: HTML form, runs the same pipeline as the API)
 # ---------------------------------------------------------------------------
-MAX_IMAGE_BYTES = 10 * 1024 * 1024  # 10MB per image
 MAX_IMAGES = 6
 
 
 def _parse_uploaded_images(request) -> list[ImageInput]:
+    check_rejected(request)
     files = request.FILES.getlist("images")
     if not files:
         raise AnalyzerError("at least one image is required (field: 'images')")
@@ -86,11 +142,7 @@ def _parse_uploaded_images(request) -> list[ImageInput]:
 
     images: list[ImageInput] = []
     for f, role in zip(files, roles):
-        data = f.read()
-        if len(data) > MAX_IMAGE_BYTES:
-            raise AnalyzerError(
-                f"image '{f.name}' exceeds {MAX_IMAGE_BYTES // (1024 * 1024)}MB limit"
-            )
+        data = read_image(f, MAX_IMAGE_BYTES)
         if role not in IMAGE_ROLES:
             role = "front" if not images else "detail"
         images.append(ImageInput(bytes_data=data, role=role, filename=f.name))
@@ -107,6 +159,7 @@ def demo(request):
             "max_images": MAX_IMAGES,
         })
 
+    limit_uploads(request, MAX_IMAGE_BYTES)
     hint = (request.POST.get("hint") or "").strip() or None
     include_embeddings = request.POST.get("include_embeddings", "true").lower() != "false"
 
@@ -115,36 +168,71 @@ def demo(request):
     except AnalyzerError as e:
         return _demo_error(request, str(e))
 
+    # The page's script posts with ?stream=1 so fields show up while the
+    # model is still writing; without JS this is a plain form post.
+    if _parse_bool(request.GET.get("stream"), default=False):
+        response = StreamingHttpResponse(
+            _demo_stream(request, images, hint, include_embeddings),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
     try:
-        result = run_pipeline(images, hint=hint, include_embeddings=include_embeddings)
+        with metrics.bind("demo"):
+            result = run_pipeline(images, hint=hint, include_embeddings=include_embeddings)
     except AnalyzerError as e:
         return _demo_error(request, str(e))
     except Exception as e:
         return _demo_error(request, f"unexpected error: {e}")
 
-    # Log the demo request (non-blocking — silent fail if migrations not yet applied)
+    _log_demo_request(result, images, include_embeddings)
+    return render(request, "listing_api/demo.html", _demo_result_context(result, hint, include_embeddings))
+
+
+def _demo_stream(request, images, hint, include_embeddings):
+    """SSE for the demo: `field` events, then the rendered page as `page`."""
+    result = None
+    error = None
     try:
-        from .models import AnalysisRequest
-        meta = result.get("_meta", {})
-        analyzer_meta = meta.get("analyzer", {}) or {}
-        copy_meta = meta.get("copy_generator", {}) or {}
-        AnalysisRequest.objects.create(
-            api_key=None,
-            source="demo",
-            image_count=len(images),
-            processing_time_ms=meta.get("elapsed_ms", 0),
-            model_used=analyzer_meta.get("model", ""),
-            input_tokens=(analyzer_meta.get("input_tokens", 0) + copy_meta.get("input_tokens", 0)),
-            output_tokens=(analyzer_meta.get("output_tokens", 0) + copy_meta.get("output_tokens", 0)),
-            embeddings_included=include_embeddings,
-            success=True,
-        )
+        for item in iter_pipeline(
+            run_pipeline, api_key="demo", images=images, hint=hint, include_embeddings=include_embeddings
+        ):
+            if item[0] == "field":
+                yield sse_event("field", {"field": item[1], "value": item[2]})
+            else:
+                result = item[1]
+    except AnalyzerError as e:
+        error = str(e)
     except Exception as e:
-        print(f"[listing_api.demo] usage log skipped: {e}")
+        error = f"unexpected error: {e}"
+
+    if error:
+        context = {"image_roles": IMAGE_ROLES, "max_images": MAX_IMAGES, "error": error}
+    else:
+        _log_demo_request(result, images, include_embeddings)
+        context = _demo_result_context(result, hint, include_embeddings)
+    yield sse_event("page", {"html": render_to_string("listing_api/demo.html", context, request=request)})
+
 
-    # Truncated copy of embeddings for display (full vectors are huge)
+def _log_demo_request(result: dict, images: list[ImageInput], include_embeddings: bool) -> None:
+    log_request(
+        None,
+        source="demo",
+        images=images,
+        success=True,
+        include_embeddings=include_embeddings,
+        result=result,
+    )
+
+
+def _demo_result_context(result: dict, hint: str | None, include_embeddings: bool) -> dict:
+    # Truncated copy of embeddings for display. Full vectors are shown as
+    # base64 float32 — as decimal JSON they'd dwarf the rest of the page.
     display_embeddings = None
     embeddings = result.get("embeddings")
+    encoded = encode_embeddings(embeddings, "base64_f32")
     if embeddings:
         display_embeddings = {}
         for kind, payload in embeddings.items():
@@ -156,27 +244,23 @@ def demo(request):
                 "model": payload.get("model"),
                 "dim": payload.get("dim"),
                 "preview": vec[:8],
-                "vector_full_json": json.dumps(vec),
+                "vector_base64_f32": encoded[kind]["vector"],
             }
 
     run_meta = result.get("_meta", {})
-    return render(
-        request,
-        "listing_api/demo.html",
-        {
-            "image_roles": IMAGE_ROLES,
-            "max_images": MAX_IMAGES,
-            "metadata": result.get("metadata"),
-            "listing": result.get("listing"),
-            "run_meta": run_meta,
-            "analyzer_meta": run_meta.get("analyzer") or {},
-            "copy_meta": run_meta.get("copy_generator") or {},
-            "result_json": json.dumps(result, indent=2),
-            "display_embeddings": display_embeddings,
-            "submitted_hint": hint or "",
-            "submitted_include_embeddings": include_embeddings,
-        },
-    )
+    return {
+        "image_roles": IMAGE_ROLES,
+        "max_images": MAX_IMAGES,
+        "metadata": result.get("metadata"),
+        "listing": result.get("listing"),
+        "run_meta": run_meta,
+        "analyzer_meta": run_meta.get("analyzer") or {},
+        "copy_meta": run_meta.get("copy_generator") or {},
+        "result_json": json.dumps({**result, "embeddings": encoded}, indent=2),
+        "display_embeddings": display_embeddings,
+        "submitted_hint": hint or "",
+        "submitted_include_embeddings": include_embeddings,
+    }
 
 
 def _demo_error(request, message: str):
@@ -207,11 +291,7 @@ def _parse_api_images(files, roles_raw: str) -> list[ImageInput]:
 
     images: list[ImageInput] = []
     for f, role in zip(files, roles):
-        data = f.read()
-        if len(data) > MAX_IMAGE_BYTES:
-            raise AnalyzerError(
-                f"image '{f.name}' exceeds {MAX_IMAGE_BYTES // (1024 * 1024)}MB limit"
-            )
+        data = read_image(f, MAX_IMAGE_BYTES)
         if role not in IMAGE_ROLES:
             role = "front" if not images else "detail"
         images.append(ImageInput(bytes_data=data, role=role, filename=f.name))
@@ -232,98 +312,363 @@ def analyze(request):
       - hint:                free-text hint (optional)
       - include_embeddings:  "true"|"false" — default "true"
       - include_copy:        "true"|"false" — default "true"
+      - embedding_format:    float | base64_f32 | base64_f16 | int8 — default "float"
+      - stream:              "true"|"false" — default "false". When true (or
+                             with `Accept: text/event-stream`) the response is
+                             Server-Sent Events; see streaming.py.
+      - copy_mode:           llm | template | auto — default "llm" (see
+                             copy_generator.py)
+      - dedupe:              "true"|"false" — default "false". Reuse this key's
+                             earlier analysis of a near-identical front image
+                             (see near_duplicates.py).
     """
     api_key = request.auth  # APIKey instance (guaranteed by APIKeyAuthentication)
 
+    limit_uploads(request, MAX_IMAGE_BYTES)
     files = request.FILES.getlist("images")
     roles_raw = (request.data.get("roles") or "").strip() if hasattr(request.data, "get") else ""
     hint = (request.data.get("hint") or "").strip() or None
     include_embeddings = _parse_bool(request.data.get("include_embeddings"), default=True)
     include_copy = _parse_bool(request.data.get("include_copy"), default=True)
+    dedupe = _parse_bool(request.data.get("dedupe"), default=False)
+    copy_mode = (request.data.get("copy_mode") or COPY_MODE).strip().lower()
+    embedding_format = (request.data.get("embedding_format") or "float").strip().lower()
+    stream = _parse_bool(request.data.get("stream") or request.query_params.get("stream"), default=False) or (
+        "text/event-stream" in request.META.get("HTTP_ACCEPT", "")
+    )
 
     try:
+        if embedding_format not in EMBEDDING_FORMATS:
+            raise AnalyzerError(f"invalid embedding_format '{embedding_format}' (allowed: {EMBEDDING_FORMATS})")
+        if copy_mode not in COPY_MODES:
+            raise AnalyzerError(f"invalid copy_mode '{copy_mode}' (allowed: {COPY_MODES})")
+        check_rejected(request)
         images = _parse_api_images(files, roles_raw)
     except AnalyzerError as e:
-        _log_request(api_key, source="api", images=files, success=False, error=str(e))
+        log_request(api_key, source="api", images=files, success=False, error=str(e))
         return Response(
             {"error": {"code": "invalid_request", "message": str(e)}},
             status=400,
         )
 
-    try:
-        result = run_pipeline(
-            images,
-            hint=hint,
-            include_embeddings=include_embeddings,
-            include_copy=include_copy,
+    if stream:
+        response = StreamingHttpResponse(
+            stream_analysis(
+                api_key,
+                images,
+                files,
+                hint=hint,
+                include_embeddings=include_embeddings,
+                include_copy=include_copy,
+                embedding_format=embedding_format,
+                dedupe=dedupe,
+                copy_mode=copy_mode,
+            ),
+            content_type="text/event-stream",
         )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    # Identical re-submissions (client retries after a timeout) are served from
+    # the result cache instead of paying for another vision + copy run; with
+    # `dedupe`, so are re-photographed ones.
+    try:
+        with metrics.bind(api_key):
+            result = run_pipeline_cached(
+                images,
+                hint=hint,
+                include_embeddings=include_embeddings,
+                include_copy=include_copy,
+                dedupe=dedupe,
+                owner_id=getattr(api_key, "pk", None),
+                copy_mode=copy_mode,
+            )
     except AnalyzerError as e:
-        _log_request(api_key, source="api", images=files, success=False, error=str(e))
+        log_request(api_key, source="api", images=files, success=False, error=str(e))
         return Response(
             {"error": {"code": "analysis_failed", "message": str(e)}},
             status=422,
         )
     except Exception as e:
-        _log_request(api_key, source="api", images=files, success=False, error=str(e))
+        log_request(api_key, source="api", images=files, success=False, error=str(e))
         return Response(
             {"error": {"code": "internal_error", "message": "internal error"}},
             status=500,
         )
 
-    _log_request(
+    analysis_id = uuid.uuid4()
+    log_request(
         api_key,
         source="api",
         images=files,
         success=True,
         include_embeddings=include_embeddings,
         result=result,
+        analysis_id=analysis_id,
     )
+    index_result(analysis_id, api_key, result)
 
-    # Build a clean client-facing response (strip internal _meta bits we don't want to leak).
-    rmeta = result.get("_meta", {})
+    return Response(
+        analysis_body(result, image_count=len(files), analysis_id=analysis_id, embedding_format=embedding_format),
+        status=200,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Batch — POST /listing/api/v1/analyze/batch/ (NDJSON stream)
+# ---------------------------------------------------------------------------
+@api_view(["POST"])
+@authentication_classes([APIKeyAuthentication])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser, FormParser])
+@throttle_classes([PerKeyMinuteThrottle, PerKeyDayThrottle])
+def analyze_batch(request):
+    """Analyze many garments in one request; results stream back as NDJSON.
+
+    Multipart form fields:
+      - manifest:  JSON describing the garments (see batch.py)
+      - <field>:   the image files referenced by the manifest
+
+    Each garment counts as one request against the key's daily limit, all
+    charged before any work starts. The per-minute limit paces the batch
+    instead of refusing it: garments beyond it wait for a slot, so a large
+    consignment streams back at the key's per-minute rate.
+
+    A manifest holds at most MAX_BATCH_ITEMS (500) garments, so larger
+    consignments are sent as several batches. Every image of a request is
+    uploaded and spooled before the first line streams back, and a dropped
+    connection loses whatever had not been written yet; at the default
+    30/minute, 500 garments already stream for over a quarter of an hour.
+    """
+    api_key = request.auth
+    limit_uploads(request, MAX_IMAGE_BYTES, max_files=MAX_BATCH_ITEMS * MAX_IMAGES_PER_ITEM)
+    manifest_raw = request.data.get("manifest") if hasattr(request.data, "get") else None
+
+    try:
+        check_rejected(request)
+        items, include_copy, include_embeddings = parse_manifest(
+            manifest_raw, request.FILES, max_image_bytes=MAX_IMAGE_BYTES
+        )
+    except AnalyzerError as e:
+        return Response(
+            {"error": {"code": "invalid_request", "message": str(e)}},
+            status=400,
+        )
+
+    day_limit, _ = PerKeyDayThrottle().limit(request)
+    if len(items) > day_limit:
+        return Response(
+            {"error": {
+                "code": "invalid_request",
+                "message": f"a batch of {len(items)} items exceeds this key's limit of {day_limit} per day",
+            }},
+            status=400,
+        )
+    # The throttle decorator counted this request once; charge the rest of
+    # the garments against the day before any work starts.
+    wait = charge(request, len(items) - 1, throttles=(PerKeyDayThrottle,))
+    if wait is not None:
+        response = Response(
+            {"error": {
+                "code": "rate_limited",
+                "message": f"a batch of {len(items)} items exceeds this key's remaining daily limit",
+            }},
+            status=429,
+        )
+        response["Retry-After"] = str(math.ceil(wait))
+        return response
+
+    response = StreamingHttpResponse(
+        stream_batch(api_key, items, include_copy=include_copy, include_embeddings=include_embeddings),
+        content_type="application/x-ndjson",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+# ---------------------------------------------------------------------------
+# Similarity search — POST /listing/api/v1/search/
+# ---------------------------------------------------------------------------
+MAX_SEARCH_K = 100
+
+
+@api_view(["POST"])
+@authentication_classes([APIKeyAuthentication])
+@permission_classes([IsAuthenticated])
+@parser_classes([JSONParser, MultiPartParser, FormParser])
+@throttle_classes([PerKeyMinuteThrottle])
+def search(request):
+    """Top-k cosine search over this key's previous analyses.
+
+    Exactly one of:
+      - query:        free text, searched in the BGE text space
+      - image:        an uploaded image, searched in the CLIP image space
+      - analysis_id:  a previous analysis; searched in `space` (default "image")
+    Optional:
+      - k:            number of results (default 10, max 100)
+    """
+    from oracle_frontend.embeddings import embed_image, embed_text
+
+    started = time.time()
+    owner_id = request.auth.pk
+    limit_uploads(request, MAX_IMAGE_BYTES)
+    query = (request.data.get("query") or "").strip()
+    image = request.FILES.get("image")
+    analysis_id_raw = (request.data.get("analysis_id") or "").strip()
+    try:
+        k = max(1, min(int(request.data.get("k") or 10), MAX_SEARCH_K))
+    except (TypeError, ValueError):
+        k = 10
+
+    try:
+        check_rejected(request)
+    except AnalyzerError as e:
+        return Response({"error": {"code": "invalid_request", "message": str(e)}}, status=400)
+    if sum(bool(x) for x in (query, image, analysis_id_raw)) != 1:
+        return Response(
+            {"error": {"code": "invalid_request", "message": "provide exactly one of 'query', 'image', 'analysis_id'"}},
+            status=400,
+        )
+
+    exclude_id = None
+    if query:
+        space, vec = "text", embed_text(query)
+    elif image:
+        try:
+            data = read_image(image, MAX_IMAGE_BYTES)
+        except AnalyzerError as e:
+            return Response({"error": {"code": "invalid_request", "message": str(e)}}, status=400)
+        space, vec = "image", embed_image(data)
+    else:
+        space = (request.data.get("space") or "image").strip()
+        try:
+            exclude_id = uuid.UUID(analysis_id_raw)
+        except ValueError:
+            exclude_id = None
+        if space not in ("text", "image") or exclude_id is None:
+            return Response(
+                {"error": {"code": "invalid_request", "message": "invalid analysis_id or space"}},
+                status=400,
+            )
+        vec = vector_for_analysis(exclude_id, space, owner_id)
+        if vec is None:
+            return Response(
+                {"error": {"code": "not_found", "message": f"no {space} embedding for that analysis_id"}},
+                status=404,
+            )
+
+    if vec is None or len(vec) == 0:
+        return Response(
+            {"error": {"code": "analysis_failed", "message": "could not embed the query"}},
+            status=422,
+        )
+
+    hits = get_index(space).search(vec, k=k, owner_id=owner_id, exclude_id=exclude_id)
     return Response(
         {
-            "metadata": result.get("metadata"),
-            "listing": result.get("listing"),
-            "embeddings": result.get("embeddings"),
-            "usage": {
-                "elapsed_ms": rmeta.get("elapsed_ms"),
-                "model": (rmeta.get("analyzer") or {}).get("model"),
-                "input_tokens": (rmeta.get("analyzer") or {}).get("input_tokens", 0)
-                + (rmeta.get("copy_generator") or {}).get("input_tokens", 0),
-                "output_tokens": (rmeta.get("analyzer") or {}).get("output_tokens", 0)
-                + (rmeta.get("copy_generator") or {}).get("output_tokens", 0),
-                "image_count": len(files),
-            },
+            "space": space,
+            "results": [{"analysis_id": aid, "score": round(score, 6)} for aid, score in hits],
+            "elapsed_ms": int((time.time() - started) * 1000),
         },
         status=200,
     )
 
 
+# ---------------------------------------------------------------------------
+# Async jobs — POST /listing/api/v1/jobs/, GET /listing/api/v1/jobs/{id}/
+# ---------------------------------------------------------------------------
+@api_view(["POST"])
+@authentication_classes([APIKeyAuthentication])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser, FormParser])
+@throttle_classes([PerKeyMinuteThrottle, PerKeyDayThrottle])
+def create_job(request):
+    """Queue an analysis and return its job id immediately (202).
+
+    Takes the same multipart fields as /analyze except `stream`, plus:
+      - webhook_url:  optional https URL to POST the result to when done
+    The options are stored on the job, so a job resumed after a restart runs
+    with the same ones.
+    """
+    api_key = request.auth
+
+    limit_uploads(request, MAX_IMAGE_BYTES)
+    files = request.FILES.getlist("images")
+    roles_raw = (request.data.get("roles") or "").strip() if hasattr(request.data, "get") else ""
+    hint = (request.data.get("hint") or "").strip()
+    include_embeddings = _parse_bool(request.data.get("include_embeddings"), default=True)
+    include_copy = _parse_bool(request.data.get("include_copy"), default=True)
+    dedupe = _parse_bool(request.data.get("dedupe"), default=False)
+    copy_mode = (request.data.get("copy_mode") or COPY_MODE).strip().lower()
+    embedding_format = (request.data.get("embedding_format") or "float").strip().lower()
+    webhook_url = (request.data.get("webhook_url") or "").strip()
+
+    try:
+        if embedding_format not in EMBEDDING_FORMATS:
+            raise AnalyzerError(f"invalid embedding_format '{embedding_format}' (allowed: {EMBEDDING_FORMATS})")
+        if copy_mode not in COPY_MODES:
+            raise AnalyzerError(f"invalid copy_mode '{copy_mode}' (allowed: {COPY_MODES})")
+        check_rejected(request)
+        images = _parse_api_images(files, roles_raw)
+        _validate_webhook_url(webhook_url)
+    except AnalyzerError as e:
+        log_request(api_key, source="api", images=files, success=False, error=str(e))
+        return Response(
+            {"error": {"code": "invalid_request", "message": str(e)}},
+            status=400,
+        )
+
+    jobs.resume_pending_jobs()
+
+    with transaction.atomic():
+        job = AnalysisJob.objects.create(
+            api_key=api_key if isinstance(api_key, APIKey) else None,
+            hint=hint,
+            include_embeddings=include_embeddings,
+            include_copy=include_copy,
+            copy_mode=copy_mode,
+            embedding_format=embedding_format,
+            dedupe=dedupe,
+            webhook_url=webhook_url,
+        )
+        AnalysisJobImage.objects.bulk_create([
+            AnalysisJobImage(job=job, position=i, role=img.role, filename=img.filename, data=img.bytes_data)
+            for i, img in enumerate(images)
+        ])
+        transaction.on_commit(lambda: jobs.enqueue(job.pk))
+
+    body = job_body(job)
+    body["status_url"] = request.build_absolute_uri(reverse("listing_api:job_detail", args=[job.pk]))
+    return Response(body, status=202)
+
+
+@api_view(["GET"])
+@authentication_classes([APIKeyAuthentication])
+@permission_classes([IsAuthenticated])
+def job_detail(request, job_id):
+    """Poll a job. `result` has the same shape as the /analyze response."""
+    job = AnalysisJob.objects.filter(pk=job_id, api_key=request.auth).first()
+    if job is None:
+        return Response(
+            {"error": {"code": "not_found", "message": "job not found"}},
+            status=404,
+        )
+    return Response(job_body(job), status=200)
+
+
+def _validate_webhook_url(url: str) -> None:
+    if not url:
+        return
+    error = jobs.webhook_url_error(url)
+    if error:
+        raise AnalyzerError(error)
+
+
 def _parse_bool(val, default: bool = True) -> bool:
     if val is None:
         return default
     if isinstance(val, bool):
         return val
     return str(val).strip().lower() not in ("false", "0", "no", "off", "")
-
-
-def _log_request(api_key, source, images, success, error="", include_embeddings=True, result=None):
-    try:
-        meta = (result or {}).get("_meta", {}) if result else {}
-        analyzer_meta = meta.get("analyzer", {}) or {}
-        copy_meta = meta.get("copy_generator", {}) or {}
-        AnalysisRequest.objects.create(
-            api_key=api_key if isinstance(api_key, APIKey) else None,
-            source=source,
-            image_count=len(images) if images else 0,
-            processing_time_ms=meta.get("elapsed_ms", 0),
-            model_used=analyzer_meta.get("model", ""),
-            input_tokens=analyzer_meta.get("input_tokens", 0) + copy_meta.get("input_tokens", 0),
-            output_tokens=analyzer_meta.get("output_tokens", 0) + copy_meta.get("output_tokens", 0),
-            embeddings_included=include_embeddings,
-            success=success,
-            error_message=(error or "")[:2000],
-        )
-    except Exception as e:
-        print(f"[listing_api] usage log skipped: {e}")
@@ -304,32 +304,28 @@ def shopping_buddy_start(request):
                 img_resp.raise_for_status()
                 raw_bytes = img_resp.content
         else:
-            raw_bytes = b""
-            for chunk in image_file.chunks():
-                raw_bytes += chunk
-            if not raw_bytes:
-                raw_bytes = image_file.read()
+            from listing_api.analyzer import AnalyzerError
+            from listing_api.uploads import read_image
+            try:
+                # One read, size-checked and sniffed; no `raw += chunk` copies.
+                # Photos over MAX_IMAGE_BYTES (10MB) are refused here, as on
+                # the listing API.
+                raw_bytes = read_image(image_file)
+            except AnalyzerError as e:
+                return Response({"error": f"{e}. Try taking a new photo."}, status=400)
 
         import io, sys
         from PIL import Image as PILImage
+        from listing_api.preprocess import open_buffer
 
-        print(f"[SHOPPING BUDDY] Image received: size={len(raw_bytes)}, content_type={getattr(image_file, 'content_type', 'unknown')}, name={getattr(image_file, 'name', 'unknown')}, first_bytes={raw_bytes[:16]}", file=sys.stderr, flush=True)
+        print(f"[SHOPPING BUDDY] Image received: size={len(raw_bytes)}, content_type={getattr(image_file, 'content_type', 'unknown')}, name={getattr(image_file, 'name', 'unknown')}, first_bytes={bytes(raw_bytes[:16])}", file=sys.stderr, flush=True)
 
         try:
-            pil_img = PILImage.open(io.BytesIO(raw_bytes))
+            pil_img = PILImage.open(open_buffer(raw_bytes))
             pil_img.load()
         except Exception as e1:
             print(f"[SHOPPING BUDDY] PIL open failed: {e1}", file=sys.stderr, flush=True)
-            # The file might be empty or have a wrapper — try re-reading
-            try:
-                image_file.seek(0)
-                raw_bytes = image_file.read()
-                print(f"[SHOPPING BUDDY] Re-read: size={len(raw_bytes)}, first_bytes={raw_bytes[:16]}", file=sys.stderr, flush=True)
-                pil_img = PILImage.open(io.BytesIO(raw_bytes))
-                pil_img.load()
-            except Exception as e2:
-                print(f"[SHOPPING BUDDY] Second attempt failed: {e2}", file=sys.stderr, flush=True)
-                return Response({"error": f"Could not read that image ({getattr(image_file, 'content_type', 'unknown')}, {len(raw_bytes)} bytes). Try taking a new photo."}, status=400)
+            return Response({"error": f"Could not read that image ({getattr(image_file, 'content_type', 'unknown')}, {len(raw_bytes)} bytes). Try taking a new photo."}, status=400)
 
         # Re-encode as JPEG to normalize format
         buf = io.BytesIO()
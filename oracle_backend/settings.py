@@ -22,6 +22,16 @@ CSRF_TRUSTED_ORIGINS = config(
 # Allow larger POST data (for base64 images)
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 
+# File parts per request. FileCountHandler keeps every endpoint at Django's
+# usual 100; only /listing/api/v1/analyze/batch/ raises its own request's
+# allowance (500 garments x 6 images). This setting is the ceiling above both.
+DATA_UPLOAD_MAX_NUMBER_FILES = config('DATA_UPLOAD_MAX_NUMBER_FILES', default=3000, cast=int)
+FILE_UPLOAD_HANDLERS = [
+    'listing_api.uploads.FileCountHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
 
 # Application definition
 INSTALLED_APPS = [
@@ -124,6 +134,42 @@ else:
         }
 
 
+# Caches
+# `listing_results` backs the /listing/api/v1/analyze result cache when
+# LISTING_RESULT_CACHE_BACKEND=django (LocMemCache evicts LRU past MAX_ENTRIES).
+LISTING_RESULT_CACHE = {
+    "BACKEND": config('LISTING_RESULT_CACHE_BACKEND', default='django'),  # django | db | off
+    "ALIAS": "listing_results",
+    "TTL": config('LISTING_RESULT_CACHE_TTL', default=86400, cast=int),
+    "MAX_ENTRIES": config('LISTING_RESULT_CACHE_MAX_ENTRIES', default=500, cast=int),
+}
+
+# Validated API keys are cached for TTL seconds so auth doesn't hit the DB on
+# every request; saving or deleting a key invalidates it. The default alias is
+# per-process (LocMemCache), so that invalidation only reaches the worker that
+# saved the key: elsewhere a revoked key keeps working for up to TTL seconds
+# (stated in the API docs). Point ALIAS at a shared cache to make it
+# immediate. last_used_at is written at most once per TOUCH_INTERVAL seconds
+# per worker.
+LISTING_API_KEY_CACHE = {
+    "ALIAS": config('LISTING_API_KEY_CACHE_ALIAS', default='default'),
+    "TTL": config('LISTING_API_KEY_CACHE_TTL', default=60, cast=int),
+    "TOUCH_INTERVAL": config('LISTING_API_KEY_TOUCH_INTERVAL', default=60, cast=int),
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'listing_results': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'listing-results',
+        'TIMEOUT': LISTING_RESULT_CACHE["TTL"],
+        'OPTIONS': {'MAX_ENTRIES': LISTING_RESULT_CACHE["MAX_ENTRIES"]},
+    },
+}
+
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -160,6 +206,13 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
 
+# Listing API similarity-search index (memory-mapped float32 files; rebuildable
+# from the database with `manage.py rebuild_listing_index`, which the Dockerfile
+# runs with --if-missing at container start). Point it at a persistent volume
+# to skip that rebuild.
+LISTING_VECTOR_DIR = Path(config('LISTING_VECTOR_DIR', default=str(BASE_DIR / 'var' / 'listing_vectors')))
+
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
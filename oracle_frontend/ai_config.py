@@ -1,4 +1,29 @@
+"""Shared OpenAI client for every model call in the project.
+
+`get_openai_client()` returns one process-wide client. Callers use it exactly
+like `openai.OpenAI` (`client.chat.completions.create(...)`), but every chat
+completion goes through the same gate:
+
+  - one pooled, keep-alive httpx connection pool with explicit timeouts
+  - a per-process semaphore (OPENAI_MAX_CONCURRENCY in-flight calls)
+  - a token bucket pacing request starts to OPENAI_RPM (0 disables it)
+  - jittered exponential retry on 429 / 5xx / connection errors, honouring
+    Retry-After, until OPENAI_RETRY_DEADLINE seconds have passed
+
+`last_call_metrics()` reports, for the calling thread's most recent
+completion, how long it waited for a slot (`queue_ms`), how long the model
+calls themselves took (`model_ms`, including streamed output), time spent
+backing off between attempts (`retry_wait_ms`) and the number of `retries`.
+"""
+
 import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
 from dotenv import load_dotenv
 from openai import OpenAI
 
@@ -6,10 +31,218 @@ load_dotenv()
 
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-5.4")
 
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+OPENAI_RPM = float(os.getenv("OPENAI_RPM", "0"))            # request starts per minute; 0 = unpaced
+OPENAI_BURST = int(os.getenv("OPENAI_BURST", str(OPENAI_MAX_CONCURRENCY)))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))  # per attempt, seconds
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+OPENAI_RETRY_DEADLINE = float(os.getenv("OPENAI_RETRY_DEADLINE", "60"))
+OPENAI_BACKOFF_BASE = 0.5
+OPENAI_BACKOFF_CAP = 8.0
+
+_RETRYABLE = (
+    openai.RateLimitError,
+    openai.APIConnectionError,  # includes APITimeoutError
+    openai.InternalServerError,
+)
+
+
+# ---------------------------------------------------------------------------
+# Pacing
+# ---------------------------------------------------------------------------
+class TokenBucket:
+    """Classic token bucket: `rate` tokens/second, up to `capacity` banked."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+_semaphore = threading.BoundedSemaphore(OPENAI_MAX_CONCURRENCY)
+_bucket = TokenBucket(OPENAI_RPM / 60.0, OPENAI_BURST)
+_local = threading.local()
+
+
+def last_call_metrics() -> dict:
+    """Timing for this thread's most recent chat completion (empty if none)."""
+    return dict(getattr(_local, "metrics", None) or {})
+
+
+def _retry_after(exc) -> float | None:
+    """Server-suggested wait in seconds, from Retry-After(-Ms) headers."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def _backoff(attempt: int, exc) -> float:
+    # Full jitter keeps a burst of 429s from retrying in lockstep.
+    delay = random.uniform(0, min(OPENAI_BACKOFF_CAP, OPENAI_BACKOFF_BASE * 2 ** attempt))
+    suggested = _retry_after(exc)
+    return max(delay, suggested) if suggested is not None else delay
+
+
+# ---------------------------------------------------------------------------
+# Client
+# ---------------------------------------------------------------------------
+class _PacedCompletions:
+    def __init__(self, raw):
+        self._raw = raw
+
+    def create(self, **kwargs):
+        metrics = {"queue_ms": 0, "model_ms": 0, "retry_wait_ms": 0, "retries": 0}
+        _local.metrics = metrics
+
+        queued = time.monotonic()
+        _semaphore.acquire()
+        released = False
+        try:
+            _bucket.acquire()
+            metrics["queue_ms"] = int((time.monotonic() - queued) * 1000)
+            started = time.monotonic()
+            attempt = 0
+            while True:
+                call_started = time.monotonic()
+                try:
+                    resp = self._raw.create(**kwargs)
+                    break
+                except _RETRYABLE as e:
+                    metrics["model_ms"] += int((time.monotonic() - call_started) * 1000)
+                    delay = _backoff(attempt, e)
+                    elapsed = time.monotonic() - started
+                    if attempt >= OPENAI_MAX_RETRIES or elapsed + delay > OPENAI_RETRY_DEADLINE:
+                        raise
+                    print(f"[ai_config] {type(e).__name__}, retry {attempt + 1} in {delay:.1f}s")
+                    # The slot is kept while backing off so a burst of 429s
+                    # doesn't let queued callers pile onto the rate limit.
+                    time.sleep(delay)
+                    metrics["retry_wait_ms"] += int(delay * 1000)
+                    metrics["retries"] += 1
+                    attempt += 1
+                    # Re-pace the retry like any other request start.
+                    _bucket.acquire()
+
+            if kwargs.get("stream"):
+                # The slot stays taken until the stream is drained or closed.
+                released = True
+                return _GuardedStream(resp, metrics, call_started)
+            metrics["model_ms"] += int((time.monotonic() - call_started) * 1000)
+            return resp
+        finally:
+            if not released:
+                _semaphore.release()
+
+
+class _GuardedStream:
+    """Iterates a streamed completion and frees its slot exactly once, on
+    exhaustion, error, close() or garbage collection."""
+
+    def __init__(self, stream, metrics: dict, call_started: float):
+        self._stream = stream
+        self._it = iter(stream)
+        self._metrics = metrics
+        self._call_started = call_started
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._it)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._metrics["model_ms"] += int((time.monotonic() - self._call_started) * 1000)
+        _semaphore.release()
+        close = getattr(self._stream, "close", None)
+        if close:
+            close()
+
+    def __del__(self):
+        self.close()
+
+
+class _PacedClient:
+    """An OpenAI client whose chat completions go through the shared gate.
+
+    Anything other than `chat.completions.create` is passed straight through.
+    """
+
+    def __init__(self, raw: OpenAI):
+        self._raw = raw
+        self.chat = SimpleNamespace(completions=_PacedCompletions(raw.chat.completions))
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
 _client = None
+_client_lock = threading.Lock()
+
 
 def get_openai_client():
     global _client
     if _client is None:
-        _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        with _client_lock:
+            if _client is None:
+                http_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=OPENAI_MAX_CONCURRENCY * 2,
+                        max_keepalive_connections=OPENAI_MAX_CONCURRENCY,
+                        keepalive_expiry=60,
+                    ),
+                    timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=10.0),
+                )
+                raw = OpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    http_client=http_client,
+                    max_retries=0,  # retries happen here, under the deadline
+                    timeout=OPENAI_TIMEOUT,
+                )
+                _client = _PacedClient(raw)
     return _client
+
+
+def usage_counts(resp) -> dict:
+    """Token counts from a chat completion's usage block.
+
+    `cached_input_tokens` is the part of the prompt served from the
+    provider's prefix cache (billed at a discount, and faster to first token).
+    """
+    usage = getattr(resp, "usage", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "input_tokens": getattr(usage, "prompt_tokens", None) or 0,
+        "cached_input_tokens": getattr(details, "cached_tokens", None) or 0,
+        "output_tokens": getattr(usage, "completion_tokens", None) or 0,
+    }
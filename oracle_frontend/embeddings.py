@@ -6,12 +6,40 @@ Models:
 
 Both models are loaded lazily on first use and kept in module-level singletons
 so subsequent calls are fast. First call incurs model download + load (~10s on
-cold start). In production, consider preloading at server boot.
+cold start). In production each gunicorn worker preloads them in a background
+thread right after fork (see gunicorn.conf.py); `model_status()` reports
+progress for the /listing/api/v1/health/ readiness probe.
+
+Inference backend is chosen with EMBEDDING_BACKEND:
+
+  torch       fp32 PyTorch (default)
+  torch-int8  PyTorch with dynamic int8 quantization of Linear layers
+  onnx        ONNX Runtime export (needs requirements-onnx.txt)
+  onnx-int8   ONNX Runtime, dynamically int8-quantized export (cached on disk
+              under EMBEDDING_ONNX_CACHE)
+
+sentence-transformers only has ONNX support for transformer text models, so
+CLIP falls back from onnx -> torch and onnx-int8 -> torch-int8. The backend
+actually used is reported by `model_status()`. Check parity and measure
+throughput/RSS with `python -m listing_api.bench.embeddings`.
+
+Single-image CLIP calls (`embed_image`) from concurrent requests are gathered
+by a micro-batcher for a few milliseconds and run as one `encode` batch — on
+CPU-only containers batching is the main lever on CLIP throughput. Tune with
+CLIP_BATCH_WINDOW_MS (0 disables) and CLIP_MAX_BATCH. Images are fully decoded
+by the caller before they are queued, a failed batch is retried item by item
+so one bad input only fails its own caller, and callers give up after
+CLIP_BATCH_TIMEOUT_S.
 """
 
 from __future__ import annotations
 
 import io
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
 from typing import Iterable
 
 from PIL import Image
@@ -19,6 +47,12 @@ from PIL import Image
 # Module-level singletons (lazy loaded)
 _bge_text_model = None
 _clip_image_model = None
+_model_lock = threading.Lock()
+# Per-model load state, reported by model_status().
+_load_state: dict[str, dict] = {
+    "bge": {"loaded": False, "loading": False, "load_ms": None, "error": None, "backend": None},
+    "clip": {"loaded": False, "loading": False, "load_ms": None, "error": None, "backend": None},
+}
 
 BGE_MODEL_NAME = "BAAI/bge-base-en-v1.5"
 BGE_DIM = 768
@@ -26,13 +60,88 @@ BGE_DIM = 768
 CLIP_MODEL_NAME = "clip-ViT-B-32"
 CLIP_DIM = 512
 
+EMBEDDING_BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").strip().lower()
+EMBEDDING_ONNX_CACHE = os.getenv(
+    "EMBEDDING_ONNX_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "oracle-onnx")
+)
+# Target for onnx-int8 dynamic quantization: "avx2", "avx512" or "avx512_vnni".
+EMBEDDING_ONNX_QCONFIG = os.getenv("EMBEDDING_ONNX_QCONFIG", "avx2")
+
+CLIP_BATCH_WINDOW_MS = float(os.getenv("CLIP_BATCH_WINDOW_MS", "5"))
+CLIP_MAX_BATCH = int(os.getenv("CLIP_MAX_BATCH", "32"))
+CLIP_BATCH_TIMEOUT_S = float(os.getenv("CLIP_BATCH_TIMEOUT_S", "30"))
+
+
+def _quantize_int8(model):
+    """Dynamic int8 quantization of every nn.Linear (weights int8, activations fp32)."""
+    import torch
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _onnx_int8_model(model_name: str):
+    """Load (exporting + quantizing on first use) an int8 ONNX copy of model_name."""
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    local_dir = os.path.join(EMBEDDING_ONNX_CACHE, model_name.replace("/", "__"))
+    file_name = f"onnx/model_qint8_{EMBEDDING_ONNX_QCONFIG}.onnx"
+    if not os.path.exists(os.path.join(local_dir, file_name)):
+        fp32 = SentenceTransformer(model_name, backend="onnx")
+        fp32.save(local_dir)
+        export_dynamic_quantized_onnx_model(fp32, EMBEDDING_ONNX_QCONFIG, local_dir)
+    return SentenceTransformer(local_dir, backend="onnx", model_kwargs={"file_name": file_name})
+
+
+def build_model(name: str, backend: str | None = None):
+    """Build a fresh model ("bge" or "clip") on `backend`.
+
+    Returns (model, backend_used). Doesn't touch the module singletons, so
+    the benchmark can load several variants side by side.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"unknown EMBEDDING_BACKEND '{backend}' (allowed: {EMBEDDING_BACKENDS})")
+    model_name = BGE_MODEL_NAME if name == "bge" else CLIP_MODEL_NAME
+    if name == "clip" and backend.startswith("onnx"):
+        backend = "torch-int8" if backend == "onnx-int8" else "torch"
+
+    if backend == "onnx":
+        return SentenceTransformer(model_name, backend="onnx"), backend
+    if backend == "onnx-int8":
+        return _onnx_int8_model(model_name), backend
+    model = SentenceTransformer(model_name)
+    if backend == "torch-int8":
+        model = _quantize_int8(model)
+    return model, backend
+
+
+def _load(name: str):
+    """Load a model once, recording backend/timing/errors in _load_state."""
+    state = _load_state[name]
+    state["loading"] = True
+    started = time.time()
+    try:
+        model, backend = build_model(name)
+    except Exception as e:
+        state["error"] = str(e)
+        raise
+    finally:
+        state["loading"] = False
+    state.update(loaded=True, load_ms=int((time.time() - started) * 1000), error=None, backend=backend)
+    return model
+
 
 def get_bge_model():
     """Return the BGE text embedding model (loaded once, cached)."""
     global _bge_text_model
     if _bge_text_model is None:
-        from sentence_transformers import SentenceTransformer
-        _bge_text_model = SentenceTransformer(BGE_MODEL_NAME)
+        # Serialize loads so a preload thread and a first request don't both
+        # pull the model into memory.
+        with _model_lock:
+            if _bge_text_model is None:
+                _bge_text_model = _load("bge")
     return _bge_text_model
 
 
@@ -40,11 +149,22 @@ def get_clip_model():
     """Return the CLIP image embedding model (loaded once, cached)."""
     global _clip_image_model
     if _clip_image_model is None:
-        from sentence_transformers import SentenceTransformer
-        _clip_image_model = SentenceTransformer(CLIP_MODEL_NAME)
+        with _model_lock:
+            if _clip_image_model is None:
+                _clip_image_model = _load("clip")
     return _clip_image_model
 
 
+def model_status() -> dict:
+    """Load state of both models: {"ready": bool, "pid": int, "models": {...}}."""
+    models = {name: dict(state) for name, state in _load_state.items()}
+    return {
+        "ready": all(m["loaded"] for m in models.values()),
+        "pid": os.getpid(),
+        "models": models,
+    }
+
+
 def embed_text(text: str) -> list[float]:
     """Return a normalized BGE embedding for the given text.
 
@@ -92,29 +212,158 @@ def embed_text_bytes(text: str) -> bytes:
         return b""
 
 
-def embed_image(image_bytes: bytes) -> list[float]:
-    """Return a normalized CLIP image embedding for the given image bytes.
+class _MicroBatcher:
+    """Coalesce concurrent single-item encode calls into batched ones.
+
+    Callers `submit()` an item and block on the returned Future. A worker
+    thread takes the first queued item, waits up to `window_s` for more (or
+    until `max_batch` is reached), runs `encode_batch` once and hands each
+    caller its own result.
+    """
+
+    def __init__(self, encode_batch, window_s: float, max_batch: int):
+        self._encode_batch = encode_batch
+        self._window_s = window_s
+        self._max_batch = max_batch
+        self._lock = threading.Lock()
+        self._queue: queue.Queue | None = None
+        self._pid: int | None = None
+
+    def submit(self, item) -> Future:
+        fut: Future = Future()
+        self._ensure_worker().put((item, fut))
+        return fut
+
+    def _ensure_worker(self) -> queue.Queue:
+        # Threads don't survive fork (gunicorn preload_app), so track the pid
+        # and start a fresh worker in each process.
+        with self._lock:
+            if self._queue is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                threading.Thread(
+                    target=self._run, args=(self._queue,), name="clip-microbatch", daemon=True
+                ).start()
+            return self._queue
+
+    def _run(self, q: queue.Queue) -> None:
+        while True:
+            batch = [q.get()]
+            deadline = time.monotonic() + self._window_s
+            while len(batch) < self._max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._resolve(batch)
+
+    def _resolve(self, batch: list) -> None:
+        """Encode a batch and settle every future in it, whatever happens."""
+        try:
+            results = list(self._encode_batch([item for item, _ in batch]))
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            # Retry one by one so a single bad input only fails its own caller.
+            print(f"[embeddings] batch of {len(batch)} failed, retrying individually: {e}")
+            for entry in batch:
+                self._resolve([entry])
+            return
+        for (_, fut), result in zip(batch, results):
+            fut.set_result(result)
+        for _, fut in batch[len(results):]:
+            fut.set_exception(RuntimeError(f"encode returned {len(results)} results for {len(batch)} inputs"))
+
+
+def _clip_encode_batch(images: list) -> list:
+    return list(get_clip_model().encode(images, normalize_embeddings=True, batch_size=CLIP_MAX_BATCH))
+
+
+_clip_batcher = _MicroBatcher(_clip_encode_batch, CLIP_BATCH_WINDOW_MS / 1000.0, CLIP_MAX_BATCH)
+
+
+def _as_rgb(image) -> Image.Image:
+    """Accept raw bytes or an already-decoded PIL image; return RGB."""
+    img = image if isinstance(image, Image.Image) else Image.open(io.BytesIO(image))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    else:
+        # Image.open is lazy; decode here, on the caller's thread, so a corrupt
+        # file fails its own request rather than a shared encode batch.
+        img.load()
+    return img
+
+
+def embed_image(image: bytes | Image.Image) -> list[float]:
+    """Return a normalized CLIP image embedding for the given image.
+
+    `image` is raw bytes or a PIL image that was already decoded (e.g. by
+    listing_api.preprocess, which hands over a CLIP-sized copy so the upload
+    isn't decoded twice). Decoding happens on the calling thread; the encode
+    goes through the micro-batcher so concurrent callers share one model call.
 
     Returns an empty list on failure (corrupt image, missing model, etc.).
     """
-    if not image_bytes:
+    if image is None or (not isinstance(image, Image.Image) and not image):
         return []
     try:
-        img = Image.open(io.BytesIO(image_bytes))
-        if img.mode != "RGB":
-            img = img.convert("RGB")
-        vec = get_clip_model().encode(img, normalize_embeddings=True)
+        img = _as_rgb(image)
+        if CLIP_BATCH_WINDOW_MS <= 0:
+            vec = get_clip_model().encode(img, normalize_embeddings=True)
+        else:
+            vec = _clip_batcher.submit(img).result(timeout=CLIP_BATCH_TIMEOUT_S)
         return vec.tolist()
     except Exception as e:
         print(f"[embeddings] CLIP failed: {e}")
         return []
 
 
-def preload_models() -> dict[str, bool]:
+def embed_images(images: list, batch_size: int = 32) -> list[list[float]]:
+    """Batch-embed multiple images (bytes or PIL images) with CLIP in one encode call.
+
+    Unlike `embed_texts`, the output is aligned with the input: one vector per
+    image, in order, with an empty list for any image that failed to decode.
+    """
+    out: list[list[float]] = [[] for _ in images]
+    decoded = []
+    positions: list[int] = []
+    for i, image in enumerate(images):
+        if image is None or (not isinstance(image, Image.Image) and not image):
+            continue
+        try:
+            img = _as_rgb(image)
+        except Exception as e:
+            print(f"[embeddings] CLIP decode failed for image {i}: {e}")
+            continue
+        decoded.append(img)
+        positions.append(i)
+    if not decoded:
+        return out
+    try:
+        vecs = get_clip_model().encode(decoded, normalize_embeddings=True, batch_size=batch_size)
+    except Exception as e:
+        print(f"[embeddings] CLIP batch failed: {e}")
+        return out
+    for pos, vec in zip(positions, vecs):
+        out[pos] = vec.tolist()
+    return out
+
+
+def preload_models(background: bool = False) -> dict[str, bool] | None:
     """Eagerly load both models. Call from server boot to avoid cold-start latency.
 
-    Returns a dict like {"bge": True, "clip": True} indicating success.
+    Returns a dict like {"bge": True, "clip": True} indicating success. With
+    `background=True` the loads run on a daemon thread and this returns None
+    immediately; poll `model_status()` for progress.
     """
+    if background:
+        threading.Thread(target=preload_models, name="model-preload", daemon=True).start()
+        return None
+
     result = {"bge": False, "clip": False}
     try:
         get_bge_model()